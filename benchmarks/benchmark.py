@@ -0,0 +1,331 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# Runs Chisel's commands against synthetic view hierarchies in a fake process,
+# and reports how many expressions each one evaluated and how long it would
+# have taken with the given latency per evaluation. A command that evaluates
+# more expressions than its budget fails the run. If NumPy is installed, the
+# run also checks that fblldbgeometry's NumPy and pure-Python paths agree.
+#
+#   python benchmarks/benchmark.py [--sizes 1000,10000] [--latency 50] [--only pviews,pvc]
+
+import math
+import optparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from StringIO import StringIO
+
+benchmarksDirectory = os.path.dirname(os.path.abspath(__file__))
+repositoryDirectory = os.path.dirname(benchmarksDirectory)
+sys.path.insert(0, benchmarksDirectory)
+sys.path.insert(1, repositoryDirectory)
+
+temporaryDirectory = tempfile.mkdtemp(prefix='chisel-benchmarks-')
+os.environ.setdefault('CHISEL_CACHE_PATH', os.path.join(temporaryDirectory, 'cache'))
+# The fake process is much slower than a real one, so chunks are sized by count
+# rather than by how long they take, to keep the evaluations predictable.
+os.environ.setdefault('CHISEL_TRAVERSAL_CHUNK_SIZE', '2500')
+
+import lldb
+import fblldb
+import fblldbgeometry as geometry
+import fblldbviewsnapshot as viewSnapshot
+import hierarchies
+from lldb.fakeruntime import FBFakeRuntime, makeStruct, rectValues
+
+class FBBenchmark:
+  # command and budget are functions of the synthetic application. budget
+  # returns the most evaluations (expressions and object descriptions) the
+  # command may use, and check, if any, returns an error for bad output.
+  def __init__(self, name, command, budget, check=None):
+    self.name = name
+    self.command = command
+    self.budget = budget
+    self.check = check
+
+def _lineCount(count):
+  def check(app, output):
+    lines = len(output.strip().splitlines())
+    if lines != count(app):
+      return 'printed %d lines, expected %d' % (lines, count(app))
+  return check
+
+def _contains(text):
+  def check(app, output):
+    if text(app) not in output:
+      return 'output does not contain %r' % text(app)
+  return check
+
+def _bordered(views, width):
+  def check(app, output):
+    wrong = [view for view in views(app) if view['layer']['borderWidth'] != width]
+    if wrong:
+      return '%d views have a border width other than %g' % (len(wrong), width)
+  return check
+
+def _text(views, predicate, text):
+  def check(app, output):
+    for view in views(app):
+      if bool(predicate(view)) != (view['text'] == text):
+        return 'the text of 0x%x is %r' % (view.address, view['text'])
+  return check
+
+def _masked(view):
+  def check(app, output):
+    masks = [mask for mask in app.window['subviews'] if mask['tag'] == view(app).address]
+    if len(masks) != 1:
+      return '%d masks for 0x%x' % (len(masks), view(app).address)
+    expected = app.runtime.send(view(app), 'convertRect:toView:', app.runtime.send(view(app), 'bounds'), None)
+    if rectValues(masks[0]['frame']) != rectValues(expected):
+      return 'the mask is at %r, not %r' % (rectValues(masks[0]['frame']), rectValues(expected))
+  return check
+
+def _center(app, view):
+  x, y, width, height = rectValues(app.runtime.send(view, 'convertRect:toView:', app.runtime.send(view, 'bounds'), None))
+  return (x + width / 2, y + height / 2)
+
+def _hit(point):
+  def check(app, output):
+    hit = app.runtime.send(app.window, 'hitTest:withEvent:', makeStruct('CGPoint', point(app)), None)
+    line = '0x%x %s: receives the touch' % (hit.address, hit.cls.name)
+    if line not in output:
+      return 'output does not contain %r' % line
+  return check
+
+# The extra calls a walk of count nodes takes, one per chunk after the first.
+def _chunks(count):
+  return count // int(os.environ['CHISEL_TRAVERSAL_CHUNK_SIZE'])
+
+benchmarks = [
+  FBBenchmark('pviews',
+    lambda app: 'pviews',
+    lambda app: 5 + _chunks(len(app.views)),
+    _lineCount(lambda app: len(app.views))),
+  FBBenchmark('pviews -u',
+    lambda app: 'pviews -u %s' % app.address(app.deepestView()),
+    lambda app: 3 * app.depths[app.deepestView().address] + 6,
+    _lineCount(lambda app: app.depths[app.deepestView().address] + 1)),
+  FBBenchmark('pviews -d',
+    lambda app: 'pviews -d 3',
+    lambda app: 5 + _chunks(len(app.viewsUpToDepth(3))),
+    _lineCount(lambda app: len(app.viewsUpToDepth(3)))),
+  FBBenchmark('pviews -c',
+    lambda app: 'pviews -c label',
+    lambda app: 5 + _chunks(len(app.views)),
+    _lineCount(lambda app: len(app.viewsOfClass('UILabel')))),
+  FBBenchmark('pviews -H',
+    lambda app: 'pviews -H',
+    lambda app: 5 + _chunks(len(app.views)),
+    _lineCount(lambda app: len([view for view in app.views if view['hidden']]))),
+  FBBenchmark('pvc',
+    lambda app: 'pvc',
+    lambda app: 6 * len(app.viewControllers) + 5,
+    _lineCount(lambda app: len(app.viewControllers))),
+  FBBenchmark('fv',
+    lambda app: 'fv UILabel',
+    lambda app: 5 + _chunks(len(app.views)),
+    _lineCount(lambda app: len(app.viewsOfClass('UILabel')))),
+  FBBenchmark('fv -k',
+    lambda app: 'fv -k UIControl',
+    lambda app: 5 + _chunks(len(app.views)),
+    _lineCount(lambda app: len(app.viewsOfClass('UIControl')))),
+  FBBenchmark('fa11y',
+    lambda app: 'fa11y "Button 1"',
+    lambda app: 8 + _chunks(len(app.views)),
+    _lineCount(lambda app: len([element for element in app.viewsOfClass('UIButton') + app.accessibilityElements
+      if 'Button 1' in element['accessibilityLabel'] and not app.hasLabelledSuperview(element)]))),
+  FBBenchmark('pa11y',
+    lambda app: 'pa11y',
+    lambda app: 8 + _chunks(len(app.views)),
+    _lineCount(lambda app: len([element for element in app.views + app.accessibilityElements if not app.hasLabelledSuperview(element)]))),
+  FBBenchmark('settext',
+    lambda app: 'settext label-2 Tapped',
+    lambda app: 8 + _chunks(len(app.views)),
+    _text(lambda app: app.viewsOfClass('UILabel'), lambda view: view['accessibilityIdentifier'] == 'label-2', 'Tapped')),
+  FBBenchmark('setinput',
+    lambda app: 'setinput Typed',
+    lambda app: 8 + _chunks(len(app.views)),
+    _text(lambda app: app.viewsOfClass('UILabel'), lambda view: view['firstResponder'], 'Typed')),
+  FBBenchmark('border -d',
+    lambda app: 'border -d 3 %s' % app.address(app.window),
+    lambda app: 2 * len(app.viewsUpToDepth(3)) // 256 + 10 + _chunks(len(app.viewsUpToDepth(3))),
+    _bordered(lambda app: app.viewsUpToDepth(3), 2)),
+  FBBenchmark('unborder -d',
+    lambda app: 'unborder -d 3 %s' % app.address(app.window),
+    lambda app: len(app.viewsUpToDepth(3)) // 256 + 10 + _chunks(len(app.viewsUpToDepth(3))),
+    _bordered(lambda app: app.viewsUpToDepth(3), 0)),
+  FBBenchmark('alamborder',
+    lambda app: 'alamborder',
+    lambda app: 2 * len(app.views) // 23 // 256 + 8 + _chunks(len(app.views)),
+    _bordered(lambda app: [view for view in app.views if view['ambiguousLayout']], 2)),
+  FBBenchmark('mask',
+    lambda app: 'mask %s' % app.address(app.deepestView()),
+    lambda app: 14 + _chunks(len(app.views)),
+    _masked(lambda app: app.deepestView())),
+  FBBenchmark('hittest',
+    lambda app: 'hittest %r %r' % _center(app, app.deepestView()),
+    lambda app: 4 + _chunks(len(app.views)),
+    _hit(lambda app: _center(app, app.deepestView()))),
+  FBBenchmark('pmethods',
+    lambda app: 'pmethods %s' % app.address(app.views[-1]),
+    lambda app: 8,
+    _contains(lambda app: 'Instance Methods:')),
+  FBBenchmark('pclass',
+    lambda app: 'pclass %s' % app.address(app.views[-1]),
+    lambda app: 3,
+    _contains(lambda app: 'NSObject')),
+  FBBenchmark('pactions',
+    lambda app: 'pactions %s' % app.address(app.viewsOfClass('UIButton')[0]),
+    lambda app: 6,
+    _contains(lambda app: 'didTapButton:')),
+  FBBenchmark('xtree',
+    lambda app: 'xtree',
+    lambda app: 5 + _chunks(len(app.views) + 1),
+    _lineCount(lambda app: len(app.views) + 1)),
+]
+
+class FBBenchmarkResult:
+  def __init__(self, benchmark, size, statistics, simulatedTime, hostTime, errors):
+    self.benchmark = benchmark
+    self.size = size
+    self.statistics = statistics
+    self.simulatedTime = simulatedTime
+    self.hostTime = hostTime
+    self.errors = errors
+
+def runBenchmark(benchmark, size, options):
+  runtime = FBFakeRuntime()
+  app = hierarchies.buildApplication(runtime, size)
+  debugger = lldb.debugger
+  debugger.attach(runtime)
+  debugger.evaluationLatency = options.latency / 1000.0
+  debugger.memoryReadLatency = options.readLatency / 1000.0
+
+  result = lldb.SBCommandReturnObject()
+  stdout = sys.stdout
+  sys.stdout = StringIO()
+  start = time.time()
+  try:
+    debugger.GetCommandInterpreter().HandleCommand(benchmark.command(app), result)
+  finally:
+    output, sys.stdout = sys.stdout.getvalue(), stdout
+  hostTime = time.time() - start
+  output += result.GetOutput()
+
+  errors = []
+  if result.GetError():
+    errors.append(result.GetError().strip())
+  statistics = dict(runtime.statistics)
+  evaluations = statistics['evaluations'] + statistics['descriptions']
+  budget = benchmark.budget(app)
+  if evaluations > budget:
+    errors.append('%d evaluations, over the budget of %d' % (evaluations, budget))
+  if benchmark.check and not result.GetError():
+    error = benchmark.check(app, output)
+    if error:
+      errors.append(error)
+  if options.verbose:
+    print output
+  return FBBenchmarkResult(benchmark, size, statistics, runtime.simulatedTime, hostTime, errors)
+
+def printResult(result):
+  statistics = result.statistics
+  print '%-12s %6d %8d %8d %8d %10.2fs %8.2fs  %s' % (
+    result.benchmark.name,
+    result.size,
+    statistics['evaluations'],
+    statistics['descriptions'],
+    statistics['memoryReads'],
+    result.simulatedTime,
+    result.hostTime,
+    'FAIL' if result.errors else 'ok')
+  for error in result.errors:
+    for line in error.splitlines():
+      print '    ' + line
+
+# The NumPy and pure-Python paths of fblldbgeometry must agree. Some layers
+# are rotated and scaled, and some scaled to nothing, so that the check covers
+# more than offsets. Returns None if NumPy isn't installed, or the errors.
+def checkGeometry(size):
+  if geometry.numpy is None:
+    return None
+
+  runtime = FBFakeRuntime()
+  app = hierarchies.buildApplication(runtime, size)
+  for index, view in enumerate(app.views):
+    if index % 7 == 3:
+      angle = math.radians(index % 90)
+      scale = 1 + index % 3 * 0.5
+      view['layer'].values['transform'] = (scale * math.cos(angle), scale * math.sin(angle),
+        -scale * math.sin(angle), scale * math.cos(angle), index % 5, -(index % 4))
+    elif index % 97 == 5:
+      view['layer'].values['transform'] = (0, 0, 0, 0, 0, 0)
+  lldb.debugger.attach(runtime)
+  snapshot = viewSnapshot.snapshotView(app.address(app.window), refresh=True)
+
+  errors = []
+  for name, expected, actual in zip(('transform', 'rect'), geometry._compose(snapshot.nodes), geometry._composeArrays(snapshot.nodes)):
+    for node, expectedValue, actualValue in zip(snapshot.nodes, expected, actual):
+      if (expectedValue is None) != (actualValue is None) or (expectedValue is not None and
+          any(abs(a - b) > 1e-9 * max(1, abs(a)) for a, b in zip(expectedValue, actualValue))):
+        errors.append('the %s of node %d is %r with NumPy, not %r' % (name, node.index, actualValue, expectedValue))
+  return errors[:5]
+
+# Commands copy what they find to the clipboard, which the benchmarks have no
+# use for, so pbcopy is replaced with one that discards its input.
+def installPasteboard():
+  binDirectory = os.path.join(temporaryDirectory, 'bin')
+  os.mkdir(binDirectory)
+  path = os.path.join(binDirectory, 'pbcopy')
+  with open(path, 'w') as pbcopy:
+    pbcopy.write('#!/bin/sh\ncat > /dev/null\n')
+  os.chmod(path, stat.S_IRWXU)
+  os.environ['PATH'] = binDirectory + os.pathsep + os.environ.get('PATH', '')
+
+def main():
+  parser = optparse.OptionParser()
+  parser.add_option('--sizes', default='1000,10000', help='Comma separated numbers of views in the synthetic hierarchies.')
+  parser.add_option('--latency', type='float', default=50.0, help='Simulated milliseconds per expression evaluation.')
+  parser.add_option('--read-latency', dest='readLatency', type='float', default=1.0, help='Simulated milliseconds per memory read.')
+  parser.add_option('--only', help='Comma separated names of the benchmarks to run.')
+  parser.add_option('--verbose', action='store_true', default=False, help='Print the output of each command.')
+  options, _ = parser.parse_args()
+
+  selected = benchmarks
+  if options.only:
+    names = [name.strip() for name in options.only.split(',')]
+    selected = [benchmark for benchmark in benchmarks if benchmark.name in names]
+
+  installPasteboard()
+  fblldb.loadCommandsInDirectory(os.path.join(repositoryDirectory, 'commands'))
+
+  print '%-12s %6s %8s %8s %8s %11s %9s' % ('command', 'views', 'evals', 'po', 'reads', 'simulated', 'host')
+  failed = False
+  try:
+    for size in [int(size) for size in options.sizes.split(',')]:
+      if not options.only or 'geometry' in names:
+        errors = checkGeometry(size)
+        print '%-12s %6d  %s' % ('geometry', size, 'skipped, NumPy is not installed' if errors is None else 'FAIL' if errors else 'ok')
+        for error in errors or []:
+          print '    ' + error
+        failed = failed or bool(errors)
+      for benchmark in selected:
+        result = runBenchmark(benchmark, size, options)
+        printResult(result)
+        failed = failed or bool(result.errors)
+  finally:
+    shutil.rmtree(temporaryDirectory, ignore_errors=True)
+  return 1 if failed else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
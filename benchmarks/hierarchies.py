@@ -0,0 +1,174 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# Builds synthetic applications in a fake process: a key window with a view
+# tree of a given size, view controllers that own parts of it, and the
+# XCElementSnapshot tree XCTest would see. They're built from a seeded random
+# number generator, so a given size always gives the same hierarchy.
+
+import random
+
+from lldb.fakeruntime import FBFakeObject, rect
+
+_viewClasses = ['UIView', 'UIView', 'UILabel', 'UIButton', 'UIImageView', 'UITableViewCell', 'FBBenchmarkCardView']
+
+_elementTypes = {
+  'UIWindow': 4,
+  'UIButton': 9,
+  'UILabel': 48,
+  'UIImageView': 43,
+  'UITableViewCell': 75,
+}
+
+class FBSyntheticApplication:
+  def __init__(self, runtime, window, views, accessibilityElements, viewControllers, depths):
+    self.runtime = runtime
+    self.window = window
+    self.views = views
+    # The UIAccessibilityElements that some views expose instead of subviews.
+    self.accessibilityElements = accessibilityElements
+    self.viewControllers = viewControllers
+    self.depths = depths
+
+  def address(self, obj):
+    return '0x%x' % obj.address
+
+  def viewsOfClass(self, className):
+    cls = self.runtime.classes[className]
+    return [view for view in self.views if view.isKindOfClass(cls)]
+
+  def deepestView(self):
+    return max(self.views, key=lambda view: self.depths[view.address])
+
+  # Whether a superview of the view, or the container of an accessibility
+  # element, has an accessibility label.
+  def hasLabelledSuperview(self, view):
+    superview = view['accessibilityContainer'] or view['superview']
+    while superview is not None:
+      if superview['accessibilityLabel'] is not None:
+        return True
+      superview = superview['superview']
+    return False
+
+  def viewsUpToDepth(self, depth):
+    return [view for view in self.views if self.depths[view.address] <= depth]
+
+def buildApplication(runtime, viewCount, seed=0):
+  generator = random.Random(seed)
+  classes = runtime.classes
+  if 'FBBenchmarkCardView' not in classes:
+    runtime.defineClass('FBBenchmarkCardView', 'UIView', properties=[
+      ('title', 'T@"NSString",C,N,V_title'),
+      ('highlighted', 'TB,N,GisHighlighted,V_highlighted'),
+      ('delegate', 'T@"<FBBenchmarkCardViewDelegate>",W,N,V_delegate'),
+    ])
+
+  runtime.application = runtime.new('UIApplication')
+  window = _view(runtime, 'UIWindow', rect(0, 0, 375, 667), 0)
+  runtime.keyWindow = window
+
+  views = [window]
+  depths = {window.address: 0}
+  queue = [window]
+  while len(views) < viewCount:
+    parent = queue.pop(0)
+    for index in xrange(generator.randint(2, 6)):
+      if len(views) >= viewCount:
+        break
+      className = _viewClasses[generator.randint(0, len(_viewClasses) - 1)]
+      width, height = parent['frame']['size']['width'], parent['frame']['size']['height']
+      view = _view(runtime, className, rect(4 + index * 8, 4 + index * 44, max(width / 2, 10), max(height / 3, 10)), len(views))
+      parent['subviews'].append(view)
+      view['superview'] = parent
+      views.append(view)
+      depths[view.address] = depths[parent.address] + 1
+      queue.append(view)
+
+  # Some cards that have no subviews expose accessibility elements instead, like
+  # a view that draws its own content.
+  accessibilityElements = []
+  for index, view in enumerate(views):
+    if view.cls.name == 'FBBenchmarkCardView' and not view['subviews'] and index % 5 == 0:
+      elements = [runtime.new('UIAccessibilityElement', accessibilityContainer=view,
+        accessibilityLabel='Button %d element %d' % (index, element), accessibilityIdentifier='element-%d-%d' % (index, element))
+        for element in xrange(2)]
+      view['accessibilityElements'] = runtime.array(elements)
+      accessibilityElements.extend(elements)
+
+  # The last label is being edited.
+  [label for label in views if label.cls.name == 'UILabel'][-1]['firstResponder'] = True
+
+  viewControllers = _buildViewControllers(runtime, window, views, generator)
+  for view in views:
+    if view.cls.name == 'UIButton':
+      view['actions'] = [(viewControllers[view.address % len(viewControllers)], 'didTapButton:', 1 << 6)]
+
+  runtime.xcSnapshot = _snapshot(runtime, 2, rect(0, 0, 375, 667), 'Benchmark', [_snapshotTree(runtime, window)])
+  return FBSyntheticApplication(runtime, window, views, accessibilityElements, viewControllers, depths)
+
+def _view(runtime, className, frame, index):
+  view = runtime.send(runtime.send(runtime.classes[className], 'alloc'), 'initWithFrame:', frame)
+  if className == 'UILabel':
+    view['text'] = 'Label %d' % index
+    view['accessibilityLabel'] = 'Label %d' % index
+    view['accessibilityIdentifier'] = 'label-%d' % index
+  elif className == 'UIButton':
+    view['accessibilityLabel'] = 'Button %d' % index
+    view['accessibilityIdentifier'] = 'button-%d' % index if index % 3 else None
+  view['isAccessibilityElement'] = className in ('UILabel', 'UIButton')
+  view['hidden'] = index % 17 == 16
+  view['ambiguousLayout'] = index % 23 == 22
+  view['userInteractionEnabled'] = index % 11 != 10
+  view['clipsToBounds'] = index % 13 == 12
+  return view
+
+# Every 25th view is the view of a view controller. The controllers form a tree
+# under a navigation controller, each with up to 4 children.
+def _buildViewControllers(runtime, window, views, generator):
+  root = runtime.new('UINavigationController', view=window, childViewControllers=[], title='Root')
+  window['rootViewController'] = root
+  window['viewController'] = None
+
+  viewControllers = [root]
+  for index in xrange(25, len(views), 25):
+    parent = viewControllers[(len(viewControllers) - 1) // 4]
+    className = 'UITabBarController' if generator.randint(0, 9) == 0 else 'UIViewController'
+    view = views[index] if generator.randint(0, 4) else None
+    viewController = runtime.new(className, view=view, childViewControllers=[], parentViewController=parent, title='Screen %d' % index)
+    if view is not None:
+      view['viewController'] = viewController
+    parent['childViewControllers'].append(viewController)
+    viewControllers.append(viewController)
+  return viewControllers
+
+def _snapshot(runtime, elementType, frame, label, children):
+  return FBFakeObject(runtime, runtime.classes['XCElementSnapshot'], **{
+    '_elementType': elementType,
+    '_traits': 0,
+    '_frame': frame,
+    '_identifier': runtime.string(''),
+    '_value': runtime.string(''),
+    '_placeholderValue': runtime.string(''),
+    '_label': runtime.string(label),
+    '_title': runtime.string(''),
+    '_children': runtime.array(children),
+    '_enabled': 1,
+    '_selected': 0,
+    '_isMainWindow': int(elementType == 4),
+    '_hasKeyboardFocus': 0,
+    '_hasFocus': 0,
+    '_generation': 1,
+    '_horizontalSizeClass': 1,
+    '_verticalSizeClass': 2,
+  })
+
+def _snapshotTree(runtime, view):
+  children = [_snapshotTree(runtime, subview) for subview in view['subviews']]
+  elementType = _elementTypes.get(view.cls.name, 1)
+  return _snapshot(runtime, elementType, view['frame'], view['accessibilityLabel'] or '', children)
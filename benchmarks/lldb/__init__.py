@@ -0,0 +1,617 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# A pure-Python stand-in for LLDB's `lldb` module, so Chisel's commands can run
+# without a debugger. Put the benchmarks directory at the front of sys.path and
+# `import lldb` gets this package. Expressions are evaluated against a
+# fakeruntime.FBFakeRuntime, which the process is attached to with:
+#   lldb.debugger.attach(runtime)
+#
+# Nothing sleeps: each expression evaluation and memory read adds its latency to
+# the process's simulatedTime instead, so a benchmark can model a slow device
+# and still run quickly.
+
+import re
+import struct
+import sys
+import traceback
+
+import fakeexpressions
+import fakeruntime
+
+eLanguageTypeUnknown = 0x0000
+eLanguageTypeC = 0x000c
+eLanguageTypeC_plus_plus = 0x0004
+eLanguageTypeObjC = 0x0010
+eLanguageTypeObjC_plus_plus = 0x0011
+eLanguageTypeSwift = 0x001e
+
+eExpressionCompleted = 0
+eExpressionSetupError = 1
+eExpressionParseError = 2
+eExpressionDiscarded = 3
+eExpressionInterrupted = 4
+eExpressionHitBreakpoint = 5
+eExpressionTimedOut = 6
+
+eValueTypeConstResult = 7
+
+LLDB_INVALID_ADDRESS = 0xffffffffffffffff
+
+# UINT32_MAX, what GetIndexOfChildWithName returns for a missing child.
+_NOT_FOUND = 0xffffffff
+
+# See fblldbbase.kNoResult.
+_kNoResult = 0x1001
+
+class SBError(object):
+  def __init__(self, message=None, code=0):
+    self.message = message
+    self.code = code
+
+  def Success(self):
+    return self.message is None
+
+  def Fail(self):
+    return self.message is not None
+
+  def GetError(self):
+    return self.code
+
+  def GetCString(self):
+    return self.message
+
+  def SetErrorString(self, message):
+    self.message = message
+    self.code = self.code or 1
+
+  def __str__(self):
+    return 'success' if self.message is None else 'error: ' + self.message
+
+class SBExpressionOptions(object):
+  def __init__(self):
+    self.language = eLanguageTypeUnknown
+    self.trapExceptions = True
+    self.timeout = 0
+    self.tryAllThreads = True
+
+  def SetLanguage(self, language):
+    self.language = language
+
+  def SetTrapExceptions(self, trapExceptions):
+    self.trapExceptions = trapExceptions
+
+  def SetTimeoutInMicroSeconds(self, timeout):
+    self.timeout = timeout
+
+  def SetTryAllThreads(self, tryAllThreads):
+    self.tryAllThreads = tryAllThreads
+
+  def SetSuppressPersistentResult(self, suppress):
+    pass
+
+  def SetIgnoreBreakpoints(self, ignore):
+    pass
+
+  def SetUnwindOnError(self, unwind):
+    pass
+
+class SBData(object):
+  def __init__(self, data=''):
+    self.data = data
+
+  def GetByteSize(self):
+    return len(self.data)
+
+  def _unpack(self, error, offset, format):
+    size = struct.calcsize(format)
+    if offset + size > len(self.data):
+      error.SetErrorString('offset %d out of range' % offset)
+      return 0
+    return struct.unpack_from(format, self.data, offset)[0]
+
+  def GetFloat(self, error, offset):
+    return self._unpack(error, offset, '<f')
+
+  def GetDouble(self, error, offset):
+    return self._unpack(error, offset, '<d')
+
+  def GetUnsignedInt64(self, error, offset):
+    return self._unpack(error, offset, '<Q')
+
+  def GetSignedInt64(self, error, offset):
+    return self._unpack(error, offset, '<q')
+
+def _formatFloat(value):
+  text = repr(float(value))
+  return text[:-2] if text.endswith('.0') else text
+
+_integerSizes = {'char': 1, 'BOOL': 1, 'bool': 1, 'short': 2, 'int': 4, 'unsigned int': 4, 'float': 4, 'uint32_t': 4, 'int32_t': 4}
+
+class SBValue(object):
+  def __init__(self, process=None, value=None, typeName=None, error=None, name=None):
+    self.process = process
+    self.value = value
+    self.typeName = typeName
+    self.error = error
+    self.name = name
+    self._children = None
+
+  @property
+  def runtime(self):
+    return self.process.runtime
+
+  def _kind(self):
+    return fakeexpressions.typeKind(self.typeName)
+
+  def _address(self):
+    value = self.value
+    if value is None:
+      return 0
+    if isinstance(value, fakeruntime.FBFakeObject):
+      return value.address
+    if isinstance(value, fakeruntime.FBFakeSelector):
+      return fakeexpressions._scalar(value)
+    return int(value) & 0xffffffffffffffff
+
+  def _object(self):
+    value = self.value
+    if isinstance(value, (int, long)) and value:
+      value = self.runtime.objects.get(value)
+    return value if isinstance(value, fakeruntime.FBFakeObject) else None
+
+  def IsValid(self):
+    return self.process is not None or self.error is not None
+
+  def GetError(self):
+    return self.error or SBError()
+
+  def GetName(self):
+    return self.name
+
+  def GetTypeName(self):
+    return self.typeName
+
+  def GetValueType(self):
+    return eValueTypeConstResult
+
+  def GetValue(self):
+    if self.error is not None or self.process is None:
+      return None
+    kind = self._kind()
+    if kind in ('object', 'pointer', 'selector'):
+      return '0x%016x' % self._address()
+    if kind == 'float':
+      return _formatFloat(self.value)
+    if kind == 'bool':
+      return 'YES' if self.value else 'NO'
+    if kind == 'integer':
+      return str(self.GetValueAsUnsigned() if self.typeName.startswith('unsigned') else self.GetValueAsSigned())
+    return None
+
+  def GetValueAsSigned(self, default=0):
+    if self.error is not None or self.process is None:
+      return default
+    kind = self._kind()
+    if kind == 'struct':
+      return default
+    if kind in ('object', 'pointer', 'selector'):
+      return self._address()
+    return int(fakeexpressions._scalar(self.value))
+
+  def GetValueAsUnsigned(self, default=0):
+    value = self.GetValueAsSigned(default)
+    return value & ((1 << (self.GetByteSize() * 8)) - 1) if value < 0 else value
+
+  def GetLoadAddress(self):
+    return self._address() if self._kind() in ('object', 'pointer') else LLDB_INVALID_ADDRESS
+
+  def GetByteSize(self):
+    if self.process is None:
+      return 0
+    kind = self._kind()
+    if kind == 'void':
+      return 0
+    if kind == 'struct':
+      return 8 * _leafCount(self.typeName)
+    return _integerSizes.get(self.typeName, 8)
+
+  def GetData(self):
+    if self.error is not None or self.process is None:
+      return SBData()
+    kind = self._kind()
+    if kind == 'struct':
+      return SBData(struct.pack('<%dd' % _leafCount(self.typeName), *_leaves(self.value)))
+    if kind == 'float':
+      return SBData(struct.pack('<f' if self.GetByteSize() == 4 else '<d', self.value))
+    size = self.GetByteSize()
+    return SBData(struct.pack('<Q', self.GetValueAsUnsigned() & 0xffffffffffffffff)[:size])
+
+  def GetSummary(self):
+    if self.error is not None or self.process is None:
+      return None
+    kind = self._kind()
+    runtime = self.runtime
+    if kind == 'pointer' and 'char' in self.typeName:
+      return '"%s"' % runtime.readCString(self._address()).encode('string_escape')
+    if kind == 'selector':
+      return '"%s"' % self.value.name
+    obj = self._object() if kind == 'object' else None
+    if obj is None:
+      return None
+    if obj.isKindOfClass(runtime.classes['NSString']):
+      return '@"%s"' % obj['value'].encode('utf-8').replace('"', '\\"')
+    if obj.isKindOfClass(runtime.classes['NSArray']) or obj.isKindOfClass(runtime.classes['NSDictionary']):
+      count = len(obj['items'])
+      return '%d %s' % (count, 'element' if count == 1 else 'elements')
+    if obj.isKindOfClass(runtime.classes['NSNumber']):
+      return '@"%s"' % obj['value']
+    return None
+
+  def GetObjectDescription(self):
+    if self.error is not None or self.process is None:
+      return None
+    kind = self._kind()
+    if kind != 'object':
+      return self.GetValue()
+    # `po` evaluates -debugDescription in the process.
+    return self.process._describe(self._object() if self.value else None)
+
+  def _childValues(self):
+    if self._children is None:
+      kind = self._kind()
+      children = []
+      if kind == 'struct':
+        for name, fieldType in fakeruntime.structFields[self.typeName]:
+          children.append((name, fieldType, self.value.fields[name]))
+      elif kind == 'object':
+        obj = self._object()
+        runtime = self.runtime
+        if obj is not None and obj.isKindOfClass(runtime.classes['NSArray']):
+          children = [('[%d]' % index, 'id', item) for index, item in enumerate(obj['items'])]
+        elif obj is not None:
+          children = [(name, ivarType, obj.values.get(name)) for name, ivarType in obj.cls.allIvars()]
+          children = [(name, ivarType, obj.cls if name == 'isa' else value) for name, ivarType, value in children]
+      self._children = children
+    return self._children
+
+  def GetNumChildren(self):
+    return len(self._childValues())
+
+  def GetChildAtIndex(self, index):
+    children = self._childValues()
+    if not 0 <= index < len(children):
+      return SBValue()
+    name, childType, value = children[index]
+    return SBValue(self.process, value, childType, name=name)
+
+  def GetIndexOfChildWithName(self, name):
+    for index, (childName, childType, value) in enumerate(self._childValues()):
+      if childName == name:
+        return index
+    return _NOT_FOUND
+
+  def GetChildMemberWithName(self, name):
+    index = self.GetIndexOfChildWithName(name)
+    return self.GetChildAtIndex(index) if index != _NOT_FOUND else SBValue()
+
+  def __str__(self):
+    if self.error is not None:
+      return str(self.error)
+    return '(%s) %s = %s' % (self.typeName, self.name or '$0', self.GetSummary() or self.GetValue())
+
+def _leaves(value):
+  leaves = []
+  for name, fieldType in fakeruntime.structFields[value.typeName]:
+    field = value.fields[name]
+    leaves.extend(_leaves(field) if fieldType in fakeruntime.structFields else [float(field)])
+  return leaves
+
+def _leafCount(typeName):
+  return sum(_leafCount(fieldType) if fieldType in fakeruntime.structFields else 1
+             for name, fieldType in fakeruntime.structFields[typeName])
+
+class SBCompileUnit(object):
+  def __init__(self, language):
+    self.language = language
+
+  def GetLanguage(self):
+    return self.language
+
+class SBFrame(object):
+  def __init__(self, thread):
+    self.thread = thread
+
+  def IsValid(self):
+    return True
+
+  def GetThread(self):
+    return self.thread
+
+  def GetFrameID(self):
+    return 0
+
+  def GetFunctionName(self):
+    return 'main'
+
+  def GetCompileUnit(self):
+    return SBCompileUnit(eLanguageTypeObjC)
+
+  def EvaluateExpression(self, expression, options=None):
+    return self.thread.process._evaluate(expression, options)
+
+class SBThread(object):
+  def __init__(self, process):
+    self.process = process
+    self.frame = SBFrame(self)
+
+  def IsValid(self):
+    return True
+
+  def GetProcess(self):
+    return self.process
+
+  def GetThreadID(self):
+    return 1
+
+  def GetIndexID(self):
+    return 1
+
+  def GetSelectedFrame(self):
+    return self.frame
+
+  def GetFrameAtIndex(self, index):
+    return self.frame
+
+  def GetNumFrames(self):
+    return 1
+
+class SBProcess(object):
+  def __init__(self, debugger, runtime, uniqueID):
+    self.debugger = debugger
+    self.runtime = runtime
+    self.uniqueID = uniqueID
+    self.thread = SBThread(self)
+
+  def IsValid(self):
+    return True
+
+  def GetUniqueID(self):
+    return self.uniqueID
+
+  def GetProcessID(self):
+    return 1000 + self.uniqueID
+
+  def GetStopID(self):
+    return self.runtime.stopID
+
+  def GetAddressByteSize(self):
+    return 8
+
+  def GetSelectedThread(self):
+    return self.thread
+
+  def GetThreadAtIndex(self, index):
+    return self.thread
+
+  def GetNumThreads(self):
+    return 1
+
+  def Continue(self):
+    self.runtime.stopID += 1
+    return SBError()
+
+  @property
+  def simulatedTime(self):
+    return self.runtime.simulatedTime
+
+  def _evaluate(self, expression, options):
+    runtime = self.runtime
+    runtime.statistics['evaluations'] += 1
+    latency = self.debugger.evaluationLatency
+    runtime.simulatedTime += latency(expression) if callable(latency) else latency
+
+    try:
+      value, typeName = fakeexpressions.evaluate(runtime, expression)
+    except fakeexpressions.FBFakeCompileError as error:
+      return SBValue(error=SBError('%s\nerror: 1 error parsing expression' % error, eExpressionParseError))
+    except fakeruntime.FBFakeException as exception:
+      return SBValue(error=SBError('Execution was interrupted, reason: Objective-C exception %s: %s.' % (exception.name, exception.reason), eExpressionInterrupted))
+    except fakeruntime.FBFakeCrash as crash:
+      return SBValue(error=SBError('Execution was interrupted, reason: %s.' % crash, eExpressionInterrupted))
+
+    if value is fakeexpressions.void:
+      return SBValue(error=SBError('unknown error', _kNoResult))
+    return SBValue(self, value, typeName, name='$0')
+
+  def _describe(self, obj):
+    runtime = self.runtime
+    runtime.statistics['descriptions'] += 1
+    latency = self.debugger.evaluationLatency
+    runtime.simulatedTime += latency('po') if callable(latency) else latency
+    try:
+      return runtime.describe(obj)
+    except (fakeruntime.FBFakeException, fakeruntime.FBFakeCrash):
+      return None
+
+  def _read(self, address, size, error):
+    runtime = self.runtime
+    runtime.statistics['memoryReads'] += 1
+    runtime.statistics['bytesRead'] += size
+    runtime.simulatedTime += self.debugger.memoryReadLatency
+    data = runtime.memory.read(address, size)
+    if data is None:
+      error.SetErrorString('memory read failed for 0x%x' % address)
+    return data
+
+  def ReadMemory(self, address, size, error):
+    return self._read(address, size, error)
+
+  def ReadPointerFromMemory(self, address, error):
+    data = self._read(address, 8, error)
+    return struct.unpack('<Q', data)[0] if data is not None else 0
+
+  def ReadUnsignedFromMemory(self, address, size, error):
+    data = self._read(address, size, error)
+    if data is None:
+      return 0
+    return struct.unpack({1: '<B', 2: '<H', 4: '<I', 8: '<Q'}[size], data)[0]
+
+  def ReadCStringFromMemory(self, address, size, error):
+    runtime = self.runtime
+    runtime.statistics['memoryReads'] += 1
+    runtime.simulatedTime += self.debugger.memoryReadLatency
+    string = runtime.memory.readCString(address, max(size - 1, 0))
+    if string is None:
+      error.SetErrorString('memory read failed for 0x%x' % address)
+      return None
+    runtime.statistics['bytesRead'] += len(string) + 1
+    return string
+
+class SBSymbolContextList(object):
+  def GetSize(self):
+    return 0
+
+class SBTarget(object):
+  def __init__(self, process=None):
+    self.process = process
+
+  def IsValid(self):
+    return self.process is not None
+
+  def GetProcess(self):
+    return self.process
+
+  def GetTriple(self):
+    return 'x86_64-apple-ios-simulator'
+
+  def FindSymbols(self, name):
+    return SBSymbolContextList()
+
+class SBCommandReturnObject(object):
+  def __init__(self):
+    self.output = []
+    self.error = ''
+    self.succeeded = True
+
+  def AppendMessage(self, message):
+    self.output.append(message + '\n')
+
+  def SetError(self, error):
+    self.error = str(error)
+    self.succeeded = False
+
+  def Succeeded(self):
+    return self.succeeded
+
+  def GetOutput(self):
+    return ''.join(self.output)
+
+  def GetError(self):
+    return self.error
+
+_scriptAddPattern = re.compile(r'^command script add (?:--help "(?:[^"\\]|\\.)*" )?--function (\S+) (\S+)$')
+
+class SBCommandInterpreter(object):
+  def __init__(self, debugger):
+    self.debugger = debugger
+    self.commands = {}
+    self.scriptGlobals = {'sys': sys, 'lldb': sys.modules[__name__]}
+
+  def HandleCommand(self, command, result):
+    match = _scriptAddPattern.match(command)
+    if match:
+      self.commands[match.group(2)] = match.group(1)
+      return
+    if command.startswith('command script delete '):
+      self.commands.pop(command.split()[-1], None)
+      return
+    if command.startswith('script '):
+      exec(command[len('script '):], self.scriptGlobals)
+      return
+
+    name, _, arguments = command.strip().partition(' ')
+    if name in self.commands:
+      self.debugger.runtime.statistics['commands'] += 1
+      function = self._function(self.commands[name])
+      try:
+        function(self.debugger, arguments, result, self.scriptGlobals)
+      except Exception:
+        result.SetError(traceback.format_exc())
+      return
+    if name in ('po', 'p', 'expression', 'expr'):
+      self._printExpression(name, arguments, result)
+      return
+    self.debugger.handledCommands.append(command)
+
+  def _function(self, path):
+    if path in self.scriptGlobals:
+      return self.scriptGlobals[path]
+    components = path.split('.')
+    for index in range(len(components) - 1, 0, -1):
+      module = sys.modules.get('.'.join(components[:index]))
+      if module is not None:
+        function = module
+        for component in components[index:]:
+          function = getattr(function, component)
+        return function
+    raise KeyError(path)
+
+  def _printExpression(self, name, arguments, result):
+    expression = arguments.split(' -- ', 1)[-1] if ' -- ' in arguments else arguments
+    describe = name == 'po' or ' -O ' in ' ' + arguments
+    value = self.debugger.process._evaluate(expression, None)
+    if value.GetError().Fail() and value.GetError().GetError() != _kNoResult:
+      result.SetError(value.GetError())
+    elif value.GetError().Success():
+      result.AppendMessage(value.GetObjectDescription() if describe else str(value))
+
+class SBDebugger(object):
+  def __init__(self):
+    self.interpreter = SBCommandInterpreter(self)
+    self.process = None
+    self.runtime = None
+    self.handledCommands = []
+    self.evaluationLatency = 0.0
+    self.memoryReadLatency = 0.0
+    self._nextProcessID = 1
+    self._async = False
+    # Set to simulate Ctrl-C while a command runs.
+    self.interruptRequested = False
+
+  # Attaches to a new process, with its own unique ID, backed by the runtime.
+  def attach(self, runtime):
+    self.runtime = runtime
+    self.process = SBProcess(self, runtime, self._nextProcessID)
+    self._nextProcessID += 1
+    return self.process
+
+  def GetSelectedTarget(self):
+    return SBTarget(self.process)
+
+  def GetCommandInterpreter(self):
+    return self.interpreter
+
+  def HandleCommand(self, command):
+    result = SBCommandReturnObject()
+    self.interpreter.HandleCommand(command, result)
+    sys.stdout.write(result.GetOutput())
+    if result.GetError():
+      sys.stdout.write(result.GetError())
+
+  def InterruptRequested(self):
+    return self.interruptRequested
+
+  def SetAsync(self, isAsync):
+    self._async = isAsync
+
+  def GetAsync(self):
+    return self._async
+
+debugger = SBDebugger()
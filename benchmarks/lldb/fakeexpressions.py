@@ -0,0 +1,794 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# Interprets the subset of Objective-C that Chisel's commands evaluate: message
+# sends, casts, literals, C function calls, struct members, statement
+# expressions, @try/@catch and #define macros. The persistent blocks Chisel
+# injects (see fblldbbase.injectedFunction) can't be interpreted; they're
+# dispatched to the Python implementations in fakefunctions instead.
+
+import re
+
+import fakefunctions
+from fakeruntime import (FBFakeBlock, FBFakeException, FBFakeObject, FBFakeSelector, FBFakeStruct,
+  makeStruct, structFields)
+
+class FBFakeCompileError(Exception):
+  pass
+
+# Returned as the value of expressions that have none, like LLDB's kNoResult.
+class _Void:
+  pass
+
+void = _Void()
+
+# Evaluates an expression, and returns its value and the name of its type.
+def evaluate(runtime, expression):
+  declaration = _injectedDeclarationPattern.match(expression)
+  if declaration:
+    return _inject(runtime, declaration.group(1), declaration.group(2))
+
+  if expression.strip().startswith('@import'):
+    return (void, 'void')
+
+  tokens = _tokenize(_preprocess(expression))
+  parser = _FBParser(tokens, runtime)
+  statements = parser.parseStatements(topLevel=True)
+  if not statements or statements[-1][0] != 'expr':
+    _FBEvaluator(runtime).execute(statements)
+    return (void, 'void')
+
+  evaluator = _FBEvaluator(runtime)
+  evaluator.execute(statements[:-1])
+  node = statements[-1][1]
+  value = evaluator.evaluate(node)
+  typeName = _staticType(node) or _inferredType(value)
+  if typeName == 'void':
+    return (void, 'void')
+  return (value, typeName)
+
+_injectedDeclarationPattern = re.compile(r'^\s*[\w\s\*]+\(\^\s*(\$chisel_(\w+?)_[0-9a-f]{8}_\d+)\s*\)', re.S)
+
+def _inject(runtime, persistentName, name):
+  function = fakefunctions.injectedFunctions.get(name)
+  if function is None:
+    raise FBFakeCompileError("the fake process doesn't implement the injected function '%s'" % name)
+  if persistentName in runtime.persistentVariables:
+    raise FBFakeCompileError("redefinition of persistent variable '%s'" % persistentName)
+  runtime.persistentVariables[persistentName] = FBFakeBlock(function)
+  return (void, 'void')
+
+# Macros
+
+_definePattern = re.compile(r'^\s*#define\s+(\w+)(?:\(([^)]*)\))?\s?(.*)$')
+
+def _preprocess(source):
+  if '#define' not in source:
+    return source
+
+  macros = {}
+  lines = []
+  for line in source.replace('\\\n', ' ').split('\n'):
+    match = _definePattern.match(line)
+    if match:
+      name, parameters, body = match.groups()
+      macros[name] = ([parameter.strip() for parameter in parameters.split(',')] if parameters is not None else None, body)
+    else:
+      lines.append(line)
+  text = '\n'.join(lines)
+
+  for iteration in xrange(32):
+    expanded = _expandMacros(text, macros)
+    if expanded == text:
+      return text
+    text = expanded
+  raise FBFakeCompileError('macro expansion is too deep')
+
+def _expandMacros(text, macros):
+  for name, (parameters, body) in macros.items():
+    if parameters is None:
+      text = re.sub(r'\b%s\b' % name, lambda match: body, text)
+      continue
+
+    pattern = re.compile(r'\b%s\s*\(' % name)
+    position = 0
+    while True:
+      match = pattern.search(text, position)
+      if match is None:
+        break
+      arguments, end = _macroArguments(text, match.end())
+      replacement = body
+      for parameter, argument in zip(parameters, arguments):
+        replacement = re.sub(r'\b%s\b' % re.escape(parameter), lambda _, argument=argument: argument, replacement)
+      text = text[:match.start()] + replacement + text[end:]
+      position = match.start() + len(replacement)
+  return text
+
+def _macroArguments(text, start):
+  arguments = []
+  depth = 0
+  current = start
+  index = start
+  inString = False
+  while index < len(text):
+    character = text[index]
+    if inString:
+      if character == '\\':
+        index += 1
+      elif character == '"':
+        inString = False
+    elif character == '"':
+      inString = True
+    elif character in '([{':
+      depth += 1
+    elif character in ')]}':
+      if depth == 0:
+        arguments.append(text[current:index].strip())
+        return (arguments, index + 1)
+      depth -= 1
+    elif character == ',' and depth == 0:
+      arguments.append(text[current:index].strip())
+      current = index + 1
+    index += 1
+  raise FBFakeCompileError('unterminated macro invocation')
+
+# Tokens
+
+_tokenPattern = re.compile(r'''
+  (?P<space>\s+|//[^\n]*|/\*.*?\*/) |
+  (?P<number>0[xX][0-9a-fA-F]+[uUlL]*|(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?[fF]?|\d+[eE][-+]?\d+[fF]?|\d+[uUlL]*) |
+  (?P<string>@?"(?:[^"\\]|\\.)*") |
+  (?P<character>'(?:[^'\\]|\\.)*') |
+  (?P<identifier>[A-Za-z_$][\w$]*) |
+  (?P<punctuation>->|<<|>>|<=|>=|==|!=|&&|\|\||\+\+|--|[-+*/%&|^!~<>=?:;,.()\[\]{}@])
+''', re.X | re.S)
+
+def _tokenize(source):
+  tokens = []
+  position = 0
+  while position < len(source):
+    match = _tokenPattern.match(source, position)
+    if match is None:
+      raise FBFakeCompileError("unexpected character '%s'" % source[position])
+    position = match.end()
+    kind = match.lastgroup
+    if kind != 'space':
+      tokens.append((kind, match.group(kind)))
+  tokens.append(('end', ''))
+  return tokens
+
+def _numberValue(text):
+  if text[:2].lower() == '0x':
+    return int(text.rstrip('uUlL'), 16)
+  if any(character in text for character in '.eE') and not text.lower().startswith('0x'):
+    return float(text.rstrip('fF'))
+  return int(text.rstrip('uUlL'))
+
+def _stringValue(text):
+  return text[text.index('"') + 1:-1].decode('string_escape')
+
+# Types
+
+_integerTypes = set(['int', 'long', 'short', 'char', 'unsigned', 'signed', 'BOOL', 'bool', 'NSInteger', 'NSUInteger',
+  'uintptr_t', 'intptr_t', 'size_t', 'uint64_t', 'int64_t', 'uint32_t', 'int32_t', 'uint8_t', 'int8_t', 'long long'])
+_floatTypes = set(['float', 'double', 'CGFloat', 'NSTimeInterval'])
+_objectTypes = set(['id', 'Class', 'instancetype', 'CGColorRef'])
+_otherTypes = set(['void', 'SEL', 'Method', 'Ivar', 'objc_property_t'])
+_qualifiers = set(['const', 'volatile', 'struct', '__bridge', '__strong', '__weak', '__unsafe_unretained', '__autoreleasing'])
+_typeWords = _integerTypes | _floatTypes | _objectTypes | _otherTypes | _qualifiers | set(structFields)
+_rawPointeeTypes = _integerTypes | _floatTypes | set(['void', 'Method', 'objc_property_t', 'Ivar'])
+
+def typeKind(typeName):
+  """Classifies a type name as 'void', 'object', 'pointer', 'integer', 'bool', 'float', 'struct' or 'selector'."""
+  words = [word for word in typeName.replace('*', ' * ').split() if word not in _qualifiers]
+  if '*' in words:
+    base = ' '.join(word for word in words if word != '*')
+    return 'pointer' if base in _rawPointeeTypes or base.split()[-1] in _rawPointeeTypes else 'object'
+  base = ' '.join(words)
+  if base == 'void':
+    return 'void'
+  if base in ('BOOL', 'bool'):
+    return 'bool'
+  if base in _objectTypes:
+    return 'object'
+  if base in _floatTypes:
+    return 'float'
+  if base == 'SEL':
+    return 'selector'
+  if base in structFields:
+    return 'struct'
+  if base in ('Method', 'Ivar', 'objc_property_t'):
+    return 'pointer'
+  return 'integer'
+
+def _staticType(node):
+  kind = node[0]
+  if kind == 'cast':
+    return node[1]
+  if kind == 'compound':
+    return node[1]
+  if kind == 'stmtexpr':
+    statements = node[1]
+    if statements and statements[-1][0] == 'expr':
+      return _staticType(statements[-1][1])
+    return 'void'
+  return None
+
+def _inferredType(value):
+  if value is void:
+    return 'void'
+  if value is None or isinstance(value, FBFakeObject):
+    return 'id'
+  if isinstance(value, bool):
+    return 'BOOL'
+  if isinstance(value, float):
+    return 'double'
+  if isinstance(value, FBFakeStruct):
+    return value.typeName
+  if isinstance(value, FBFakeSelector):
+    return 'SEL'
+  return 'long'
+
+class _FBParser:
+  def __init__(self, tokens, runtime):
+    self.tokens = tokens
+    self.position = 0
+    self.runtime = runtime
+
+  def peek(self, offset=0):
+    return self.tokens[min(self.position + offset, len(self.tokens) - 1)]
+
+  def next(self):
+    token = self.tokens[self.position]
+    self.position += 1
+    return token
+
+  def accept(self, text):
+    if self.peek()[1] == text and self.peek()[0] != 'string':
+      self.position += 1
+      return True
+    return False
+
+  def expect(self, text):
+    if not self.accept(text):
+      raise FBFakeCompileError("expected '%s' before '%s'" % (text, self.peek()[1]))
+
+  def isTypeWord(self, token):
+    kind, text = token
+    return kind == 'identifier' and (text in _typeWords or text in self.runtime.classes or text.endswith('Ref'))
+
+  # Statements
+
+  def parseStatements(self, topLevel=False):
+    statements = []
+    while True:
+      while self.accept(';'):
+        pass
+      if self.peek()[0] == 'end' or (not topLevel and self.peek()[1] == '}'):
+        return statements
+      statements.append(self.parseStatement())
+
+  def parseStatement(self):
+    kind, text = self.peek()
+    if text == '{':
+      self.next()
+      statements = self.parseStatements()
+      self.expect('}')
+      return ('block', statements)
+    if text == '@' and self.peek(1)[1] == 'try':
+      return self.parseTry()
+    if text == '@' and self.peek(1)[1] == 'autoreleasepool':
+      self.next()
+      self.next()
+      self.expect('{')
+      statements = self.parseStatements()
+      self.expect('}')
+      return ('block', statements)
+    if kind == 'identifier' and text == 'if':
+      self.next()
+      self.expect('(')
+      condition = self.parseExpression()
+      self.expect(')')
+      then = self.parseStatement()
+      otherwise = self.parseStatement() if self.accept('else') else None
+      return ('if', condition, then, otherwise)
+    if kind == 'identifier' and text == 'return':
+      self.next()
+      value = self.parseExpression() if self.peek()[1] != ';' else None
+      self.accept(';')
+      return ('return', value)
+
+    declaration = self.parseDeclaration()
+    if declaration is not None:
+      return declaration
+
+    if kind == 'identifier' and self.peek(1)[1] == '=' and self.peek(2)[1] != '=':
+      self.next()
+      self.next()
+      value = self.parseExpression()
+      self.accept(';')
+      return ('assign', text, value)
+
+    expression = self.parseExpression()
+    if self.peek()[1] not in ('}', 'end', ''):
+      self.expect(';')
+    return ('expr', expression)
+
+  def parseDeclaration(self):
+    start = self.position
+    words = []
+    while self.isTypeWord(self.peek()) or (words and self.peek()[1] == '*'):
+      words.append(self.next()[1])
+    if words and self.peek()[0] == 'identifier' and self.peek(1)[1] in ('=', ';'):
+      name = self.next()[1]
+      value = None
+      if self.accept('='):
+        value = self.parseExpression()
+      self.accept(';')
+      return ('decl', ' '.join(words), name, value)
+    self.position = start
+    return None
+
+  def parseTry(self):
+    self.expect('@')
+    self.expect('try')
+    self.expect('{')
+    body = self.parseStatements()
+    self.expect('}')
+    catchName = None
+    catchBody = []
+    if self.peek()[1] == '@' and self.peek(1)[1] == 'catch':
+      self.next()
+      self.next()
+      self.expect('(')
+      while not self.accept(')'):
+        catchName = self.next()[1]
+      self.expect('{')
+      catchBody = self.parseStatements()
+      self.expect('}')
+    finallyBody = []
+    if self.peek()[1] == '@' and self.peek(1)[1] == 'finally':
+      self.next()
+      self.next()
+      self.expect('{')
+      finallyBody = self.parseStatements()
+      self.expect('}')
+    return ('try', body, catchName, catchBody, finallyBody)
+
+  # Expressions
+
+  def parseExpression(self):
+    condition = self.parseBinary(0)
+    if self.accept('?'):
+      if self.accept(':'):
+        return ('elvis', condition, self.parseExpression())
+      then = self.parseExpression()
+      self.expect(':')
+      return ('cond', condition, then, self.parseExpression())
+    return condition
+
+  _precedences = {
+    '||': 1, '&&': 2, '|': 3, '^': 4, '&': 5, '==': 6, '!=': 6,
+    '<': 7, '>': 7, '<=': 7, '>=': 7, '<<': 8, '>>': 8,
+    '+': 9, '-': 9, '*': 10, '/': 10, '%': 10,
+  }
+
+  def parseBinary(self, minimumPrecedence):
+    left = self.parseUnary()
+    while True:
+      kind, text = self.peek()
+      precedence = self._precedences.get(text) if kind == 'punctuation' else None
+      if precedence is None or precedence <= minimumPrecedence:
+        return left
+      self.next()
+      right = self.parseBinary(precedence)
+      left = ('binary', text, left, right)
+
+  def parseUnary(self):
+    kind, text = self.peek()
+    if kind == 'punctuation' and text in ('!', '-', '+', '~'):
+      self.next()
+      return ('unary', text, self.parseUnary())
+    if kind == 'punctuation' and text in ('&', '*'):
+      raise FBFakeCompileError("the fake process doesn't support pointer arithmetic ('%s')" % text)
+    if text == '(' and kind == 'punctuation':
+      typeName = self.parseCastType()
+      if typeName is not None:
+        if self.peek()[1] == '{':
+          return ('compound', typeName, self.parseInitializer())
+        return ('cast', typeName, self.parseUnary())
+    return self.parsePostfix(self.parsePrimary())
+
+  def parseCastType(self):
+    start = self.position
+    self.expect('(')
+    words = []
+    while self.isTypeWord(self.peek()) or (words and self.peek()[1] == '*'):
+      words.append(self.next()[1])
+    if words and self.accept(')'):
+      return ' '.join(words).replace(' *', '*').replace('*', ' *').strip()
+    self.position = start
+    return None
+
+  def parseInitializer(self):
+    self.expect('{')
+    items = []
+    while not self.accept('}'):
+      designator = None
+      if self.peek()[1] == '.' and self.peek(1)[0] == 'identifier' and self.peek(2)[1] == '=':
+        self.next()
+        designator = self.next()[1]
+        self.next()
+      if self.peek()[1] == '{':
+        items.append((designator, self.parseInitializer()))
+      else:
+        items.append((designator, self.parseExpression()))
+      if not self.accept(','):
+        self.expect('}')
+        break
+    return ('initializer', items)
+
+  def parsePostfix(self, node):
+    while True:
+      if self.accept('.'):
+        node = ('member', node, self.next()[1])
+      elif self.accept('->'):
+        node = ('member', node, self.next()[1])
+      else:
+        return node
+
+  def parsePrimary(self):
+    kind, text = self.next()
+    if kind == 'number':
+      return ('literal', _numberValue(text))
+    if kind == 'string':
+      if text.startswith('@'):
+        return ('nsstring', _stringValue(text))
+      return ('cstring', _stringValue(text))
+    if kind == 'character':
+      return ('literal', ord(text[1:-1].decode('string_escape')))
+    if kind == 'identifier':
+      if text in ('YES', 'true'):
+        return ('literal', 1)
+      if text in ('NO', 'false'):
+        return ('literal', 0)
+      if text in ('nil', 'NULL', 'Nil'):
+        return ('literal', None)
+      if self.peek()[1] == '(':
+        self.next()
+        arguments = []
+        while not self.accept(')'):
+          arguments.append(self.parseExpression())
+          if not self.accept(','):
+            self.expect(')')
+            break
+        return ('call', text, arguments)
+      return ('name', text)
+    if text == '(':
+      if self.peek()[1] == '{':
+        self.next()
+        statements = self.parseStatements()
+        self.expect('}')
+        self.expect(')')
+        return ('stmtexpr', statements)
+      node = self.parseExpression()
+      self.expect(')')
+      return node
+    if text == '[':
+      return self.parseMessage()
+    if text == '@':
+      return self.parseAtExpression()
+    raise FBFakeCompileError("expected expression before '%s'" % text)
+
+  def parseMessage(self):
+    receiver = self.parseExpression()
+    selector = []
+    arguments = []
+    kind, text = self.next()
+    if kind != 'identifier':
+      raise FBFakeCompileError("expected a selector before '%s'" % text)
+    if not self.accept(':'):
+      self.expect(']')
+      return ('send', receiver, text, [])
+
+    selector.append(text + ':')
+    arguments.append(self.parseExpression())
+    while self.peek()[0] == 'identifier' and self.peek(1)[1] == ':':
+      selector.append(self.next()[1] + ':')
+      self.next()
+      arguments.append(self.parseExpression())
+    while self.accept(','):
+      arguments.append(self.parseExpression())
+    self.expect(']')
+    return ('send', receiver, ''.join(selector), arguments)
+
+  def parseAtExpression(self):
+    kind, text = self.next()
+    if text == 'selector':
+      self.expect('(')
+      name = ''
+      while not self.accept(')'):
+        name += self.next()[1]
+      return ('selector', name)
+    if text in ('YES', 'NO'):
+      return ('box', ('literal', int(text == 'YES')))
+    if text == '(':
+      node = self.parseExpression()
+      self.expect(')')
+      return ('box', node)
+    if kind == 'number':
+      return ('box', ('literal', _numberValue(text)))
+    if text == '[':
+      items = []
+      while not self.accept(']'):
+        items.append(self.parseExpression())
+        if not self.accept(','):
+          self.expect(']')
+          break
+      return ('array', items)
+    if text == '{':
+      items = []
+      while not self.accept('}'):
+        key = self.parseExpression()
+        self.expect(':')
+        items.append((key, self.parseExpression()))
+        if not self.accept(','):
+          self.expect('}')
+          break
+      return ('dictionary', items)
+    raise FBFakeCompileError("unexpected '@%s'" % text)
+
+class _FBReturn(Exception):
+  def __init__(self, value):
+    Exception.__init__(self)
+    self.value = value
+
+class _FBEvaluator:
+  def __init__(self, runtime):
+    self.runtime = runtime
+    self.scopes = [{}]
+
+  def execute(self, statements):
+    for statement in statements:
+      self.executeStatement(statement)
+
+  def executeStatement(self, statement):
+    kind = statement[0]
+    if kind == 'expr':
+      self.evaluate(statement[1])
+    elif kind == 'decl':
+      typeName, name, node = statement[1:]
+      value = self.convert(self.evaluate(node), typeName) if node is not None else None
+      if name.startswith('$'):
+        self.runtime.persistentVariables[name] = value
+      else:
+        self.scopes[-1][name] = value
+    elif kind == 'assign':
+      self.assign(statement[1], self.evaluate(statement[2]))
+    elif kind == 'block':
+      self.scopes.append({})
+      try:
+        self.execute(statement[1])
+      finally:
+        self.scopes.pop()
+    elif kind == 'if':
+      if _truthy(self.evaluate(statement[1])):
+        self.executeStatement(statement[2])
+      elif statement[3] is not None:
+        self.executeStatement(statement[3])
+    elif kind == 'try':
+      body, catchName, catchBody, finallyBody = statement[1:]
+      try:
+        self.executeStatement(('block', body))
+      except FBFakeException as exception:
+        self.scopes.append({catchName: self.runtime.new('NSException',
+          name=self.runtime.string(exception.name), reason=self.runtime.string(exception.reason))})
+        try:
+          self.execute(catchBody)
+        finally:
+          self.scopes.pop()
+      finally:
+        self.executeStatement(('block', finallyBody))
+    elif kind == 'return':
+      raise _FBReturn(self.evaluate(statement[1]) if statement[1] is not None else None)
+
+  def assign(self, name, value):
+    for scope in reversed(self.scopes):
+      if name in scope:
+        scope[name] = value
+        return
+    if name in self.runtime.persistentVariables:
+      self.runtime.persistentVariables[name] = value
+      return
+    raise FBFakeCompileError("use of undeclared identifier '%s'" % name)
+
+  def lookup(self, name):
+    for scope in reversed(self.scopes):
+      if name in scope:
+        return scope[name]
+    if name in self.runtime.persistentVariables:
+      return self.runtime.persistentVariables[name]
+    if name in self.runtime.classes:
+      return self.runtime.classes[name]
+    raise FBFakeCompileError("use of undeclared identifier '%s'" % name)
+
+  def evaluate(self, node):
+    kind = node[0]
+    if kind == 'literal':
+      return node[1]
+    if kind == 'name':
+      return self.lookup(node[1])
+    if kind == 'cast':
+      return self.convert(self.evaluate(node[2]), node[1])
+    if kind == 'send':
+      receiver = self.evaluate(node[1])
+      if isinstance(receiver, (int, long)) and not isinstance(receiver, bool):
+        receiver = self.runtime.object(receiver)
+      arguments = [self.evaluate(argument) for argument in node[3]]
+      return self.runtime.send(receiver, node[2], *arguments)
+    if kind == 'call':
+      return self.call(node[1], [self.evaluate(argument) for argument in node[2]])
+    if kind == 'member':
+      value = self.evaluate(node[1])
+      if isinstance(value, FBFakeStruct):
+        if node[2] not in value.fields:
+          raise FBFakeCompileError("no member named '%s' in '%s'" % (node[2], value.typeName))
+        return value.fields[node[2]]
+      return self.runtime.send(value, node[2])
+    if kind == 'binary':
+      return self.binary(node[1], node[2], node[3])
+    if kind == 'unary':
+      value = self.evaluate(node[2])
+      if node[1] == '!':
+        return int(not _truthy(value))
+      if node[1] == '-':
+        return -_scalar(value)
+      if node[1] == '~':
+        return ~_scalar(value)
+      return _scalar(value)
+    if kind == 'cond':
+      return self.evaluate(node[2]) if _truthy(self.evaluate(node[1])) else self.evaluate(node[3])
+    if kind == 'elvis':
+      value = self.evaluate(node[1])
+      return value if _truthy(value) else self.evaluate(node[2])
+    if kind == 'nsstring':
+      return self.runtime.string(node[1])
+    if kind == 'cstring':
+      return self.runtime.cString(node[1])
+    if kind == 'selector':
+      return FBFakeSelector(node[1])
+    if kind == 'box':
+      value = self.evaluate(node[1])
+      if isinstance(value, FBFakeObject):
+        return value
+      return self.runtime.number(value)
+    if kind == 'array':
+      items = [self.evaluate(item) for item in node[1]]
+      if None in items:
+        raise FBFakeException('NSInvalidArgumentException', '*** -[__NSPlaceholderArray initWithObjects:count:]: attempt to insert nil object')
+      return self.runtime.array(items)
+    if kind == 'dictionary':
+      items = [(self.evaluate(key), self.evaluate(value)) for key, value in node[1]]
+      if any(key is None or value is None for key, value in items):
+        raise FBFakeException('NSInvalidArgumentException', '*** -[__NSPlaceholderDictionary initWithObjects:forKeys:count:]: attempt to insert nil object')
+      return self.runtime.dictionary(items)
+    if kind == 'stmtexpr':
+      statements = node[1]
+      self.scopes.append({})
+      try:
+        self.execute(statements[:-1])
+        if statements and statements[-1][0] == 'expr':
+          return self.evaluate(statements[-1][1])
+        if statements:
+          self.executeStatement(statements[-1])
+        return void
+      finally:
+        self.scopes.pop()
+    if kind == 'compound':
+      return self.structFromInitializer(node[1], node[2])
+    raise FBFakeCompileError('unsupported expression %s' % kind)
+
+  def binary(self, operator, leftNode, rightNode):
+    left = self.evaluate(leftNode)
+    if operator == '&&':
+      return int(_truthy(left) and _truthy(self.evaluate(rightNode)))
+    if operator == '||':
+      return int(_truthy(left) or _truthy(self.evaluate(rightNode)))
+    right = self.evaluate(rightNode)
+    if operator == '==':
+      return int(_scalar(left) == _scalar(right))
+    if operator == '!=':
+      return int(_scalar(left) != _scalar(right))
+    left, right = _scalar(left), _scalar(right)
+    if operator == '/' and isinstance(left, (int, long)) and isinstance(right, (int, long)):
+      return left // right
+    return {
+      '<': lambda: int(left < right),
+      '>': lambda: int(left > right),
+      '<=': lambda: int(left <= right),
+      '>=': lambda: int(left >= right),
+      '+': lambda: left + right,
+      '-': lambda: left - right,
+      '*': lambda: left * right,
+      '/': lambda: left / right,
+      '%': lambda: left % right,
+      '&': lambda: left & right,
+      '|': lambda: left | right,
+      '^': lambda: left ^ right,
+      '<<': lambda: left << right,
+      '>>': lambda: left >> right,
+    }[operator]()
+
+  def call(self, name, arguments):
+    if name.startswith('$'):
+      block = self.lookup(name)
+      if not isinstance(block, FBFakeBlock):
+        raise FBFakeCompileError("called object type is not a function or function pointer ('%s')" % name)
+      return block.function(self.runtime, *arguments)
+    function = fakefunctions.cFunctions.get(name)
+    if function is None:
+      raise FBFakeCompileError("use of undeclared identifier '%s'" % name)
+    return function(self.runtime, *arguments)
+
+  def convert(self, value, typeName):
+    return convert(self.runtime, value, typeName)
+
+  def structFromInitializer(self, typeName, initializer):
+    fields = structFields.get(typeName)
+    if fields is None:
+      raise FBFakeCompileError("the fake process doesn't know the layout of '%s'" % typeName)
+    values = {}
+    for index, (designator, item) in enumerate(initializer[1]):
+      name = designator or fields[index][0]
+      fieldType = dict(fields)[name]
+      if item[0] == 'initializer':
+        values[name] = self.structFromInitializer(fieldType, item)
+      else:
+        values[name] = self.convert(self.evaluate(item), fieldType)
+    return makeStruct(typeName, [values.get(name) for name, fieldType in fields])
+
+def convert(runtime, value, typeName):
+  kind = typeKind(typeName)
+  if kind == 'void':
+    return void
+  if kind == 'object':
+    if isinstance(value, (int, long)) and not isinstance(value, bool):
+      return runtime.object(value) if value in runtime.objects or value == 0 else value
+    return value
+  if kind == 'struct':
+    if value is None:
+      return makeStruct(typeName)
+    if not isinstance(value, FBFakeStruct) or value.typeName != typeName:
+      raise FBFakeCompileError("can't convert to '%s'" % typeName)
+    return value
+  if kind == 'selector':
+    return value
+  if kind == 'float':
+    return float(_scalar(value))
+  if kind == 'bool':
+    return int(_truthy(value))
+  return _scalar(value)
+
+def _scalar(value):
+  if value is None:
+    return 0
+  if isinstance(value, FBFakeObject):
+    return value.address
+  if isinstance(value, bool):
+    return int(value)
+  if isinstance(value, (int, long, float)):
+    return value
+  if isinstance(value, FBFakeSelector):
+    return hash(value.name) & 0x7fffffffffff
+  raise FBFakeCompileError('invalid operand')
+
+def _truthy(value):
+  if isinstance(value, FBFakeStruct):
+    raise FBFakeCompileError('statement requires expression of scalar type')
+  return _scalar(value) != 0
@@ -0,0 +1,277 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# The C functions expressions can call, and the Python implementations of the
+# helper blocks Chisel injects. An injected function is looked up by the name it
+# was given in fblldbbase.injectedFunction() (e.g. 'transfer' for
+# $chisel_transfer_<digest>_<process>), so a new injected function needs an
+# implementation here before the benchmarks can run the command that uses it.
+
+import json
+import re
+import struct
+
+from fakeruntime import FBFakeClass, FBFakeException, FBFakeSelector, makeStruct, rect, rectValues
+
+def _object(runtime, value):
+  if isinstance(value, (int, long)) and not isinstance(value, bool):
+    return runtime.object(value)
+  return value
+
+def _class(runtime, value):
+  cls = _object(runtime, value)
+  if cls is not None and not isinstance(cls, FBFakeClass):
+    raise FBFakeException('NSInvalidArgumentException', 'Not a class: 0x%x' % cls.address)
+  return cls
+
+def _objc_getClass(runtime, name):
+  return runtime.classes.get(runtime.readCString(name))
+
+def _object_getClass(runtime, obj):
+  obj = _object(runtime, obj)
+  return obj.cls if obj is not None else None
+
+def _class_getName(runtime, cls):
+  cls = _class(runtime, cls)
+  return cls.nameAddress if cls is not None else runtime.cString('nil')
+
+def _class_getSuperclass(runtime, cls):
+  cls = _class(runtime, cls)
+  return cls.superclass if cls is not None else None
+
+def _class_isMetaClass(runtime, cls):
+  cls = _class(runtime, cls)
+  return int(cls is not None and cls.isMeta)
+
+def _class_getInstanceMethod(runtime, cls, selector):
+  cls = _class(runtime, cls)
+  method = cls.lookup(selector.name) if cls is not None else None
+  return method.imp if method is not None else 0
+
+def _class_getClassMethod(runtime, cls, selector):
+  cls = _class(runtime, cls)
+  return _class_getInstanceMethod(runtime, cls.cls, selector) if cls is not None else 0
+
+def _class_respondsToSelector(runtime, cls, selector):
+  return int(_class_getInstanceMethod(runtime, cls, selector) != 0)
+
+def _free(runtime, address):
+  if address:
+    runtime.memory.free(address)
+
+def _stringFromRect(runtime, value):
+  return runtime.string('{{%g, %g}, {%g, %g}}' % rectValues(value))
+
+cFunctions = {
+  'objc_getClass': _objc_getClass,
+  'objc_lookUpClass': _objc_getClass,
+  'NSClassFromString': lambda runtime, name: runtime.classes.get(runtime.stringValue(name)),
+  'object_getClass': _object_getClass,
+  'class_getName': _class_getName,
+  'class_getSuperclass': _class_getSuperclass,
+  'class_isMetaClass': _class_isMetaClass,
+  'class_getInstanceMethod': _class_getInstanceMethod,
+  'class_getClassMethod': _class_getClassMethod,
+  'class_respondsToSelector': _class_respondsToSelector,
+  'NSStringFromClass': lambda runtime, cls: runtime.string(_class(runtime, cls).name) if cls else None,
+  'NSStringFromSelector': lambda runtime, selector: runtime.string(selector.name),
+  'NSSelectorFromString': lambda runtime, name: FBFakeSelector(runtime.stringValue(name)),
+  'sel_registerName': lambda runtime, name: FBFakeSelector(runtime.readCString(name)),
+  'sel_getName': lambda runtime, selector: runtime.cString(selector.name),
+  'NSStringFromCGRect': _stringFromRect,
+  'CGRectMake': lambda runtime, x, y, width, height: rect(x, y, width, height),
+  'CGPointMake': lambda runtime, x, y: makeStruct('CGPoint', [x, y]),
+  'CGSizeMake': lambda runtime, width, height: makeStruct('CGSize', [width, height]),
+  'malloc': lambda runtime, size: runtime.memory.allocate(size),
+  'free': _free,
+}
+
+# Injected functions
+
+def _transfer(runtime, value):
+  value = _object(runtime, value)
+  if value is None:
+    raise FBFakeException('Invalid RETURN argument', '')
+  data = json.dumps({'return': runtime.toPython(value)}, separators=(',', ':'))
+  buffer = runtime.memory.allocate(8 + len(data))
+  runtime.memory.write(buffer, struct.pack('<Q', len(data)) + data)
+  return buffer
+
+def _methods(runtime, cls):
+  cls = _class(runtime, cls)
+  result = []
+  for selector, method in cls.methods.items():
+    result.append(runtime.dictionary([
+      (runtime.string('name'), runtime.string(selector)),
+      (runtime.string('type_encoding'), runtime.string(method.typeEncoding())),
+      (runtime.string('parameters_type'), runtime.array(runtime.string(argumentType) for argumentType in method.argumentTypes)),
+      (runtime.string('return_type'), runtime.string(method.returnType)),
+      (runtime.string('implementation'), runtime.number(method.imp)),
+    ]))
+  return runtime.array(result)
+
+def _properties(runtime, cls):
+  cls = _class(runtime, cls)
+  result = []
+  for name, attributes in cls.properties:
+    result.append(runtime.dictionary([
+      (runtime.string('name'), runtime.string(name)),
+      (runtime.string('attributes_string'), runtime.string(attributes)),
+      (runtime.string('attributes'), runtime.dictionary((runtime.string(attribute[0]), runtime.string(attribute[1:])) for attribute in attributes.split(','))),
+    ]))
+  return runtime.array(result)
+
+def _heapUsage(runtime):
+  allocations = runtime.memory.allocations
+  return runtime.array([runtime.number(len(allocations)), runtime.number(sum(allocations.values()))])
+
+# Walkers made with fblldbtraversal.walkerDeclaration(). visit(node, index,
+# parent, depth) returns the node's record, or None to filter it out, and its
+# children, or None if there's nothing below it. extras are the (key, object)
+# pairs to return with the records. The state of an unfinished walk is an
+# object whose address is the token.
+def _walk(runtime, root, token, limit, maxDepth, visit, extras=()):
+  state = _object(runtime, token)
+  if state is None:
+    state = runtime.new('NSMutableDictionary', stack=[(_object(runtime, root), -1, 0)], count=0)
+  stack = list(state['stack'])
+  index = state['count']
+  nodes = []
+  visited = 0
+  while stack and visited < limit:
+    node, parent, depth = stack.pop()
+    record, children = visit(node, index, parent, depth)
+    if record is not None:
+      nodes.append(record)
+    if children is not None and (maxDepth < 0 or depth < maxDepth):
+      for child in reversed(children):
+        stack.append((child, index, depth + 1))
+    index += 1
+    visited += 1
+  state['stack'] = stack
+  state['count'] = index
+
+  return runtime.dictionary([
+    (runtime.string('nodes'), runtime.array(nodes)),
+    (runtime.string('extras'), runtime.dictionary((runtime.string(key), value) for key, value in extras)),
+    (runtime.string('visited'), runtime.number(visited)),
+    (runtime.string('token'), runtime.number(state.address) if stack else runtime.null),
+  ])
+
+def _pointValues(value):
+  return [value['x'], value['y']]
+
+def _viewSnapshot(runtime, root, token, limit, maxDepth, arguments):
+  classes = runtime.dictionary()
+  def visit(view, index, parent, depth):
+    cls = runtime.send(view, 'class')
+    layer = runtime.send(view, 'layer')
+    if runtime.send(classes, 'objectForKey:', runtime.string(cls.name)) is None:
+      superclasses = []
+      superclass = cls.superclass
+      while superclass is not None:
+        superclasses.append(runtime.string(superclass.name))
+        superclass = superclass.superclass
+      runtime.send(classes, 'setObject:forKey:', runtime.array(superclasses), runtime.string(cls.name))
+
+    record = runtime.array([
+      runtime.number(view.address), runtime.string(cls.name), runtime.number(parent), runtime.number(depth)] +
+      [runtime.number(value) for value in rectValues(runtime.send(view, 'frame'))] +
+      [runtime.number(value) for value in rectValues(runtime.send(view, 'bounds'))] + [
+      runtime.number(bool(runtime.send(view, 'isHidden'))),
+      runtime.number(runtime.send(view, 'alpha')),
+      runtime.number(layer.address),
+      runtime.number(bool(runtime.send(view, 'hasAmbiguousLayout'))),
+      runtime.number(runtime.send(view, 'tag')),
+      runtime.send(view, 'accessibilityIdentifier') or runtime.null,
+      runtime.send(view, 'accessibilityLabel') or runtime.null,
+      runtime.number(bool(runtime.send(view, 'isFirstResponder'))),
+      runtime.array(runtime.number(value) for value in _pointValues(runtime.send(view, 'center'))),
+      runtime.array([runtime.number(value) for value in _pointValues(runtime.send(layer, 'position')) + _pointValues(runtime.send(layer, 'anchorPoint'))] +
+        [runtime.number(runtime.send(layer, 'affineTransform')[field]) for field in ('a', 'b', 'c', 'd', 'tx', 'ty')]),
+      runtime.number(bool(runtime.send(view, 'isUserInteractionEnabled'))),
+      runtime.number(bool(runtime.send(view, 'clipsToBounds'))),
+    ])
+    return record, runtime.send(view, 'subviews')['items']
+
+  return _walk(runtime, root, token, limit, maxDepth, visit, [('classes', classes)])
+
+def _intersects(rect, other):
+  return (rect[2] > 0 and rect[3] > 0 and other[2] > 0 and other[3] > 0 and
+    rect[0] < other[0] + other[2] and other[0] < rect[0] + rect[2] and
+    rect[1] < other[1] + other[3] and other[1] < rect[1] + rect[3])
+
+def _viewDescriptions(runtime, root, token, limit, maxDepth, arguments):
+  filters = json.loads(runtime.stringValue(arguments)) if arguments is not None else {}
+  classPattern = None
+  if 'class' in filters:
+    try:
+      classPattern = re.compile(filters['class'], re.IGNORECASE)
+    except re.error:
+      raise FBFakeException('Invalid class pattern', filters['class'])
+
+  def matches(view):
+    if classPattern is not None and not classPattern.search(runtime.send(view, 'class').name):
+      return False
+    if filters.get('hidden') and not runtime.send(view, 'isHidden'):
+      return False
+    if filters.get('zeroSize') and all(rectValues(runtime.send(view, 'bounds'))[2:]):
+      return False
+    if filters.get('offscreen'):
+      window = runtime.send(view, 'window')
+      if window is not None:
+        frame = rectValues(runtime.send(view, 'convertRect:toView:', runtime.send(view, 'bounds'), None))
+        if _intersects(frame, rectValues(runtime.send(window, 'bounds'))):
+          return False
+    return True
+
+  def visit(view, index, parent, depth):
+    record = runtime.array([runtime.number(depth), runtime.send(view, 'description')]) if matches(view) else None
+    return record, runtime.send(view, 'subviews')['items']
+  return _walk(runtime, root, token, limit, maxDepth, visit)
+
+def _accessibilityWalker(value):
+  def walker(runtime, root, token, limit, maxDepth, arguments):
+    keyWindow = runtime.send(runtime.send(runtime.classes['UIApplication'], 'sharedApplication'), 'keyWindow')
+    def visit(element, index, parent, depth):
+      elementValue = value(runtime, element)
+      record = runtime.array([runtime.number(depth), runtime.string(runtime.send(element, 'class').name),
+        runtime.number(element.address), runtime.send(elementValue, 'description') if elementValue is not None else runtime.null])
+      if elementValue is not None:
+        return record, None
+      children = runtime.send(element, 'accessibilityElements')
+      if children is None:
+        children = runtime.send(element, '_accessibleSubviews')
+      return record, children['items']
+    return _walk(runtime, root, token, limit, maxDepth, visit)
+  return walker
+
+def _xcElementSnapshots(runtime, root, token, limit, maxDepth, arguments):
+  def string(value):
+    return value if value is not None else runtime.string('')
+  def visit(element, index, parent, depth):
+    record = runtime.array([runtime.number(depth), runtime.number(element.address),
+      runtime.number(element['_elementType']), runtime.number(element['_traits'])] +
+      [runtime.number(value) for value in rectValues(element['_frame'])] +
+      [string(element[name]) for name in ('_identifier', '_value', '_placeholderValue', '_label', '_title')] +
+      [runtime.number(element[name]) for name in ('_enabled', '_selected', '_isMainWindow', '_hasKeyboardFocus', '_hasFocus')])
+    return record, element['_children']['items']
+  return _walk(runtime, root, token, limit, maxDepth, visit)
+
+injectedFunctions = {
+  'transfer': _transfer,
+  'heapUsage': _heapUsage,
+  'methods': _methods,
+  'properties': _properties,
+  'viewSnapshot': _viewSnapshot,
+  'viewDescriptions': _viewDescriptions,
+  'accessibilityLabels': _accessibilityWalker(lambda runtime, element: runtime.send(element, 'accessibilityAttributeValue:', 2001)),
+  'accessibilityIdentifiers': _accessibilityWalker(lambda runtime, element: runtime.send(element, 'accessibilityIdentifier')),
+  'xcElementSnapshots': _xcElementSnapshots,
+}
@@ -0,0 +1,876 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# A scripted stand-in for an iOS process: a heap of Objective-C objects whose
+# methods are implemented in Python, and enough of the runtime's memory layout
+# (isa pointers, class_ro_t, class names) for fblldbobjcmemoryhelpers to read.
+
+import json
+import struct
+
+from collections import OrderedDict
+
+# From objc-runtime-new.h, as read by fblldbobjcmemoryhelpers.
+_RO_META = 1 << 0
+
+class FBFakeException(Exception):
+  """An Objective-C exception thrown in the process, which @catch can handle."""
+  def __init__(self, name, reason):
+    Exception.__init__(self, reason)
+    self.name = name
+    self.reason = reason
+
+class FBFakeCrash(Exception):
+  """Something that would crash the process, e.g. messaging a bad pointer."""
+  pass
+
+class FBFakeMemory:
+  def __init__(self, base=0x600000010000):
+    self.base = base
+    self.data = bytearray()
+    self.allocations = {}
+    self.frees = 0
+
+  def allocate(self, size):
+    address = self.base + len(self.data)
+    self.data.extend('\0' * ((size + 15) & ~15 or 16))
+    self.allocations[address] = size
+    return address
+
+  def free(self, address):
+    if self.allocations.pop(address, None) is None:
+      raise FBFakeCrash('pointer being freed was not allocated: 0x%x' % address)
+    self.frees += 1
+
+  def write(self, address, bytes):
+    offset = address - self.base
+    self.data[offset:offset + len(bytes)] = bytes
+
+  def read(self, address, size):
+    offset = address - self.base
+    if offset < 0 or offset + size > len(self.data):
+      return None
+    return str(self.data[offset:offset + size])
+
+  def readCString(self, address, maxSize):
+    offset = address - self.base
+    if offset < 0 or offset >= len(self.data):
+      return None
+    end = self.data.find('\0', offset, offset + maxSize)
+    return str(self.data[offset:end if end >= 0 else offset + maxSize])
+
+class FBFakeSelector:
+  def __init__(self, name):
+    self.name = name
+
+  def __eq__(self, other):
+    return isinstance(other, FBFakeSelector) and other.name == self.name
+
+  def __ne__(self, other):
+    return not self == other
+
+class FBFakeStruct:
+  def __init__(self, typeName, fields):
+    self.typeName = typeName
+    self.fields = fields
+
+  def __getitem__(self, name):
+    return self.fields[name]
+
+# The layout of the structs the commands use.
+structFields = {
+  'CGPoint': [('x', 'CGFloat'), ('y', 'CGFloat')],
+  'CGSize': [('width', 'CGFloat'), ('height', 'CGFloat')],
+  'CGRect': [('origin', 'CGPoint'), ('size', 'CGSize')],
+  'CGVector': [('dx', 'CGFloat'), ('dy', 'CGFloat')],
+  'UIEdgeInsets': [('top', 'CGFloat'), ('left', 'CGFloat'), ('bottom', 'CGFloat'), ('right', 'CGFloat')],
+  'CGAffineTransform': [('a', 'CGFloat'), ('b', 'CGFloat'), ('c', 'CGFloat'), ('d', 'CGFloat'), ('tx', 'CGFloat'), ('ty', 'CGFloat')],
+}
+
+def makeStruct(typeName, values=()):
+  values = list(values)
+  fields = OrderedDict()
+  for index, (name, fieldType) in enumerate(structFields[typeName]):
+    value = values[index] if index < len(values) else None
+    if fieldType in structFields:
+      if not isinstance(value, FBFakeStruct):
+        value = makeStruct(fieldType, value or ())
+    else:
+      value = float(value or 0)
+    fields[name] = value
+  return FBFakeStruct(typeName, fields)
+
+def rect(x, y, width, height):
+  return makeStruct('CGRect', [(x, y), (width, height)])
+
+def point(x, y):
+  return makeStruct('CGPoint', [x, y])
+
+def rectValues(value):
+  return (value['origin']['x'], value['origin']['y'], value['size']['width'], value['size']['height'])
+
+class FBFakeObject(object):
+  def __init__(self, runtime, cls, size=16, **values):
+    self.runtime = runtime
+    self.cls = cls
+    self.values = values
+    self.address = runtime.memory.allocate(size)
+    if cls is not None:
+      runtime.memory.write(self.address, struct.pack('<Q', cls.address))
+    runtime.objects[self.address] = self
+
+  def __getitem__(self, key):
+    return self.values.get(key)
+
+  def __setitem__(self, key, value):
+    self.values[key] = value
+
+  def isKindOfClass(self, cls):
+    klass = self.cls
+    while klass is not None:
+      if klass is cls:
+        return True
+      klass = klass.superclass
+    return False
+
+class FBFakeMethod:
+  def __init__(self, selector, implementation, returnType, argumentTypes, imp):
+    self.selector = selector
+    self.implementation = implementation
+    self.returnType = returnType
+    self.argumentTypes = argumentTypes
+    self.imp = imp
+
+  def typeEncoding(self):
+    return self.returnType + ''.join(self.argumentTypes)
+
+class FBFakeClass(FBFakeObject):
+  def __init__(self, runtime, name, superclass, metaclass=None, isMeta=False):
+    self.name = name
+    self.superclass = superclass
+    self.isMeta = isMeta
+    self.methods = OrderedDict()
+    self.ivars = []
+    self.properties = []
+
+    # isa, superclass, cache (2 words) and bits, which points to a class_ro_t
+    # that holds the flags and, at offset 24, the name.
+    FBFakeObject.__init__(self, runtime, metaclass, size=40)
+    self.nameAddress = runtime.cString(name)
+    ro = runtime.memory.allocate(32)
+    runtime.memory.write(ro, struct.pack('<I', _RO_META if isMeta else 0))
+    runtime.memory.write(ro + 24, struct.pack('<Q', self.nameAddress))
+    runtime.memory.write(self.address + 8, struct.pack('<Q', superclass.address if superclass else 0))
+    runtime.memory.write(self.address + 32, struct.pack('<Q', ro))
+
+  def lookup(self, selector):
+    klass = self
+    while klass is not None:
+      method = klass.methods.get(selector)
+      if method is not None:
+        return method
+      klass = klass.superclass
+    return None
+
+  def ivarType(self, name):
+    klass = self
+    while klass is not None:
+      for ivarName, ivarType in klass.ivars:
+        if ivarName == name:
+          return ivarType
+      klass = klass.superclass
+    return None
+
+  def allIvars(self):
+    ivars = []
+    klass = self
+    while klass is not None:
+      ivars = klass.ivars + ivars
+      klass = klass.superclass
+    return ivars
+
+class FBFakeBlock:
+  def __init__(self, function):
+    self.function = function
+
+class FBFakeRuntime:
+  def __init__(self):
+    self.memory = FBFakeMemory()
+    self.objects = {}
+    self.classes = {}
+    self.persistentVariables = {}
+    self.statistics = {'evaluations': 0, 'descriptions': 0, 'memoryReads': 0, 'bytesRead': 0, 'commands': 0}
+    self.simulatedTime = 0.0
+    self.stopID = 1
+    self.keyWindow = None
+    self.application = None
+    self.xcSnapshot = None
+    self._defineClasses()
+    self.null = self.new('NSNull')
+
+  # Objects and values
+
+  def cString(self, string):
+    if isinstance(string, unicode):
+      string = string.encode('utf-8')
+    address = self.memory.allocate(len(string) + 1)
+    self.memory.write(address, string + '\0')
+    return address
+
+  def readCString(self, address):
+    if isinstance(address, FBFakeObject):
+      address = address.address
+    string = self.memory.readCString(address or 0, 1 << 20)
+    if string is None:
+      raise FBFakeCrash('EXC_BAD_ACCESS (address=0x%x)' % (address or 0))
+    return string
+
+  def object(self, address):
+    if address == 0:
+      return None
+    obj = self.objects.get(address)
+    if obj is None:
+      raise FBFakeCrash('EXC_BAD_ACCESS (address=0x%x)' % address)
+    return obj
+
+  def new(self, className, **values):
+    return FBFakeObject(self, self.classes[className], **values)
+
+  def string(self, value):
+    if isinstance(value, str):
+      value = value.decode('utf-8')
+    return self.new('__NSCFString', value=value)
+
+  def number(self, value):
+    return self.new('__NSCFNumber', value=value)
+
+  def array(self, items=()):
+    return self.new('__NSArrayM', items=list(items))
+
+  def dictionary(self, items=()):
+    return self.new('__NSDictionaryM', items=OrderedDict(items))
+
+  def stringValue(self, obj):
+    if obj is None:
+      return None
+    if not obj.isKindOfClass(self.classes['NSString']):
+      raise FBFakeException('NSInvalidArgumentException', 'Expected an NSString, got %s' % obj.cls.name)
+    return obj['value']
+
+  # Converts an object graph to what JSON serialization would produce.
+  def toPython(self, value):
+    if value is None:
+      raise FBFakeException('NSInvalidArgumentException', 'Invalid nil value')
+    if isinstance(value, FBFakeObject):
+      classes = self.classes
+      if value.isKindOfClass(classes['NSString']):
+        return value['value']
+      if value.isKindOfClass(classes['NSNumber']):
+        return value['value']
+      if value.isKindOfClass(classes['NSNull']):
+        return None
+      if value.isKindOfClass(classes['NSArray']):
+        return [self.toPython(item) for item in value['items']]
+      if value.isKindOfClass(classes['NSDictionary']):
+        return OrderedDict((self.toPython(key), self.toPython(item)) for key, item in value['items'].items())
+      raise FBFakeException('NSInvalidArgumentException', 'Invalid type in JSON write (%s)' % value.cls.name)
+    if isinstance(value, bool):
+      return value
+    if isinstance(value, (int, long, float)):
+      return value
+    raise FBFakeException('NSInvalidArgumentException', 'Invalid value in JSON write')
+
+  def describe(self, obj):
+    if obj is None:
+      return 'nil'
+    return self.stringValue(self.send(obj, 'debugDescription'))
+
+  def send(self, receiver, selector, *arguments):
+    if receiver is None:
+      return None
+    if not isinstance(receiver, FBFakeObject):
+      raise FBFakeCrash('EXC_BAD_ACCESS (message %s sent to a non-object)' % selector)
+    method = receiver.cls.lookup(selector)
+    if method is None:
+      prefix = '+' if isinstance(receiver, FBFakeClass) else '-'
+      name = receiver.name if isinstance(receiver, FBFakeClass) else receiver.cls.name
+      raise FBFakeException('NSInvalidArgumentException', '%s[%s %s]: unrecognized selector sent to %s 0x%x' % (
+        prefix, name, selector, 'class' if prefix == '+' else 'instance', receiver.address))
+    return method.implementation(receiver, *arguments)
+
+  # Classes
+
+  def defineClass(self, name, superclassName=None, methods=None, classMethods=None, ivars=None, properties=None):
+    superclass = self.classes[superclassName] if superclassName else None
+    if superclass is None:
+      metaclass = FBFakeClass(self, name, None, None, isMeta=True)
+      metaclass.cls = metaclass
+      self.memory.write(metaclass.address, struct.pack('<Q', metaclass.address))
+    else:
+      rootMetaclass = superclass.cls
+      while rootMetaclass.superclass is not None and rootMetaclass.superclass.isMeta:
+        rootMetaclass = rootMetaclass.superclass
+      metaclass = FBFakeClass(self, name, superclass.cls, rootMetaclass, isMeta=True)
+
+    cls = FBFakeClass(self, name, superclass, metaclass)
+    if superclass is None:
+      # The root metaclass inherits from the root class.
+      metaclass.superclass = cls
+      self.memory.write(metaclass.address + 8, struct.pack('<Q', cls.address))
+
+    for selector, implementation in (methods or {}).items():
+      self.addMethod(cls, selector, implementation)
+    for selector, implementation in (classMethods or {}).items():
+      self.addMethod(metaclass, selector, implementation)
+    cls.ivars = list(ivars or [])
+    cls.properties = list(properties or [])
+    self.classes[name] = cls
+    return cls
+
+  def addMethod(self, cls, selector, implementation):
+    argumentTypes = ['@', ':'] + ['@'] * selector.count(':')
+    cls.methods[selector] = FBFakeMethod(selector, implementation, '@', argumentTypes, self.memory.allocate(4))
+
+  def _defineClasses(self):
+    for definition in (_foundationClasses, _uikitClasses, _xctestClasses):
+      for name, superclassName, methods, classMethods, ivars, properties in definition():
+        self.defineClass(name, superclassName, methods, classMethods, ivars, properties)
+
+# Helpers for writing methods.
+
+def _getter(key, default=None):
+  return lambda self: self.values.get(key, default)
+
+def _setter(key):
+  def setter(self, value):
+    self.values[key] = value
+  return setter
+
+def _constant(value):
+  return lambda self, *arguments: value
+
+def _string(self, value):
+  return self.runtime.string(value)
+
+def _format(runtime, format, arguments):
+  arguments = list(arguments)
+  result = []
+  index = 0
+  while index < len(format):
+    character = format[index]
+    if character != '%':
+      result.append(character)
+      index += 1
+      continue
+    end = index + 1
+    while end < len(format) and format[end] in '0123456789.-+ lzhqt':
+      end += 1
+    conversion = format[end] if end < len(format) else '%'
+    if conversion == '%':
+      result.append('%')
+    else:
+      argument = arguments.pop(0)
+      if conversion == '@':
+        result.append(runtime.stringValue(runtime.send(argument, 'description')) if argument is not None else '(null)')
+      elif conversion == 'p':
+        result.append('0x%x' % (argument.address if isinstance(argument, FBFakeObject) else argument or 0))
+      elif conversion == 's':
+        result.append(runtime.readCString(argument).decode('utf-8'))
+      elif conversion in 'diuxX':
+        value = argument.address if isinstance(argument, FBFakeObject) else int(argument or 0)
+        result.append(('%' + conversion) % value)
+      else:
+        result.append(('%' + format[index + 1:end].strip('lzhqt') + conversion) % float(argument or 0))
+    index = end + 1
+  return ''.join(result)
+
+def _isKindOfClass(self, cls):
+  # A class is an instance of its metaclass, whose chain ends with the root class.
+  return self.isKindOfClass(cls)
+
+def _respondsToSelector(self, selector):
+  return self.cls.lookup(selector.name) is not None
+
+def _description(self):
+  if isinstance(self, FBFakeClass):
+    return self.runtime.string(self.name)
+  return self.runtime.string('<%s: 0x%x>' % (self.cls.name, self.address))
+
+def _valueForKey(self, key):
+  return self.runtime.send(self, self.runtime.stringValue(key))
+
+def _setValueForKeyPath(self, value, keyPath):
+  runtime = self.runtime
+  keys = runtime.stringValue(keyPath).split('.')
+  target = self
+  for key in keys[:-1]:
+    target = runtime.send(target, key)
+  if isinstance(value, FBFakeObject) and value.isKindOfClass(runtime.classes['NSNumber']):
+    value = value['value']
+  runtime.send(target, 'set' + keys[-1][0].upper() + keys[-1][1:] + ':', value)
+
+def _raise(self, name, format, *arguments):
+  runtime = self.runtime
+  raise FBFakeException(runtime.stringValue(name), _format(runtime, runtime.stringValue(format), arguments))
+
+def _foundationClasses():
+  return [
+    ('NSObject', None, {
+      'class': lambda self: self if isinstance(self, FBFakeClass) else self.cls,
+      'superclass': lambda self: self.superclass if isinstance(self, FBFakeClass) else self.cls.superclass,
+      'self': lambda self: self,
+      'init': lambda self: self,
+      'retain': lambda self: self,
+      'release': lambda self: None,
+      'autorelease': lambda self: self,
+      'isKindOfClass:': _isKindOfClass,
+      'isMemberOfClass:': lambda self, cls: self.cls is cls,
+      'respondsToSelector:': _respondsToSelector,
+      'isEqual:': lambda self, other: self is other,
+      'hash': lambda self: self.address,
+      'description': _description,
+      'debugDescription': lambda self: self.runtime.send(self, 'description'),
+      'valueForKey:': _valueForKey,
+      'setValue:forKeyPath:': _setValueForKeyPath,
+      'performSelector:': lambda self, selector: self.runtime.send(self, selector.name),
+    }, {
+      'alloc': lambda cls: FBFakeObject(cls.runtime, cls),
+      'new': lambda cls: FBFakeObject(cls.runtime, cls),
+      'instancesRespondToSelector:': lambda cls, selector: cls.lookup(selector.name) is not None,
+    }, [('isa', 'Class')], []),
+    ('NSString', 'NSObject', {
+      'description': lambda self: self,
+      'debugDescription': lambda self: self,
+      'length': lambda self: len(self['value']),
+      'UTF8String': lambda self: self.runtime.cString(self['value']),
+      'isEqualToString:': lambda self, other: other is not None and self['value'] == other['value'],
+      'hasPrefix:': lambda self, other: self['value'].startswith(other['value']),
+      'lowercaseString': lambda self: self.runtime.string(self['value'].lower()),
+      'initWithFormat:': lambda self, format, *arguments: self.runtime.string(_format(self.runtime, self.runtime.stringValue(format), arguments)),
+      'initWithUTF8String:': lambda self, address: self.runtime.string(self.runtime.readCString(address)),
+    }, {
+      'stringWithUTF8String:': lambda cls, address: cls.runtime.string(cls.runtime.readCString(address)),
+      'stringWithCString:': lambda cls, address: cls.runtime.string(cls.runtime.readCString(address)),
+      'stringWithString:': lambda cls, string: cls.runtime.string(string['value']),
+      'stringWithFormat:': lambda cls, format, *arguments: cls.runtime.string(_format(cls.runtime, cls.runtime.stringValue(format), arguments)),
+    }, [], []),
+    ('__NSCFString', 'NSString', {}, {}, [], []),
+    ('NSNumber', 'NSObject', {
+      'description': lambda self: self.runtime.string(json.dumps(self['value'])),
+      'intValue': lambda self: int(self['value']),
+      'integerValue': lambda self: int(self['value']),
+      'doubleValue': lambda self: float(self['value']),
+      'boolValue': lambda self: bool(self['value']),
+    }, dict((selector, (lambda convert: lambda cls, value: cls.runtime.number(convert(value)))(convert)) for selector, convert in [
+      ('numberWithInt:', int),
+      ('numberWithInteger:', int),
+      ('numberWithLong:', int),
+      ('numberWithLongLong:', int),
+      ('numberWithUnsignedInt:', int),
+      ('numberWithUnsignedInteger:', int),
+      ('numberWithUnsignedLongLong:', int),
+      ('numberWithDouble:', float),
+      ('numberWithFloat:', float),
+      ('numberWithBool:', bool),
+    ]), [], []),
+    ('__NSCFNumber', 'NSNumber', {}, {}, [], []),
+    ('NSNull', 'NSObject', {
+      'description': lambda self: self.runtime.string('<null>'),
+    }, {
+      'null': lambda cls: cls.runtime.null,
+    }, [], []),
+    ('NSArray', 'NSObject', {
+      'count': lambda self: len(self['items']),
+      'objectAtIndex:': _objectAtIndex,
+      'objectAtIndexedSubscript:': _objectAtIndex,
+      'firstObject': lambda self: self['items'][0] if self['items'] else None,
+      'lastObject': lambda self: self['items'][-1] if self['items'] else None,
+      'containsObject:': lambda self, obj: obj in self['items'],
+      'indexOfObject:': lambda self, obj: self['items'].index(obj) if obj in self['items'] else (1 << 63) - 1,
+      'componentsJoinedByString:': lambda self, separator: self.runtime.string(self.runtime.stringValue(separator).join(
+        self.runtime.stringValue(self.runtime.send(item, 'description')) for item in self['items'])),
+      'valueForKey:': lambda self, key: self.runtime.array(self.runtime.send(item, self.runtime.stringValue(key)) for item in self['items']),
+      'setValue:forKeyPath:': lambda self, value, keyPath: [_setValueForKeyPath(item, value, keyPath) for item in self['items']] and None,
+      'description': lambda self: self.runtime.string('(\n' + ',\n'.join(
+        '    ' + self.runtime.stringValue(self.runtime.send(item, 'description')) for item in self['items']) + '\n)'),
+      'addObject:': _addObject,
+    }, {
+      'array': lambda cls: cls.runtime.array(),
+      'arrayWithArray:': lambda cls, array: cls.runtime.array(array['items'] if array else ()),
+    }, [], []),
+    ('NSMutableArray', 'NSArray', {}, {}, [], []),
+    ('__NSArrayM', 'NSMutableArray', {}, {}, [], []),
+    ('NSSet', 'NSObject', {
+      'count': lambda self: len(self['items']),
+      'allObjects': lambda self: self.runtime.array(self['items']),
+      'anyObject': lambda self: self['items'][0] if self['items'] else None,
+    }, {}, [], []),
+    ('NSDictionary', 'NSObject', {
+      'count': lambda self: len(self['items']),
+      'objectForKey:': lambda self, key: _dictionaryItem(self, key),
+      'allKeys': lambda self: self.runtime.array(self['items'].keys()),
+      'allValues': lambda self: self.runtime.array(self['items'].values()),
+      'setObject:forKey:': _setObjectForKey,
+    }, {
+      'dictionary': lambda cls: cls.runtime.dictionary(),
+    }, [], []),
+    ('NSMutableDictionary', 'NSDictionary', {}, {}, [], []),
+    ('__NSDictionaryM', 'NSMutableDictionary', {}, {}, [], []),
+    ('NSException', 'NSObject', {
+      'name': lambda self: self['name'],
+      'reason': lambda self: self['reason'],
+    }, {
+      'raise:format:': _raise,
+    }, [], []),
+    ('NSJSONSerialization', 'NSObject', {}, {
+      'isValidJSONObject:': _isValidJSONObject,
+    }, [], []),
+  ]
+
+def _objectAtIndex(self, index):
+  items = self['items']
+  if not 0 <= index < len(items):
+    raise FBFakeException('NSRangeException', '*** -[__NSArrayM objectAtIndex:]: index %d beyond bounds [0 .. %d]' % (index, len(items) - 1))
+  return items[index]
+
+def _addObject(self, obj):
+  if obj is None:
+    raise FBFakeException('NSInvalidArgumentException', '*** -[__NSArrayM insertObject:atIndex:]: object cannot be nil')
+  self['items'].append(obj)
+
+def _dictionaryKey(runtime, key):
+  if isinstance(key, FBFakeObject) and key.isKindOfClass(runtime.classes['NSString']):
+    return key['value']
+  return key
+
+def _dictionaryItem(self, key):
+  key = _dictionaryKey(self.runtime, key)
+  for itemKey, item in self['items'].items():
+    if _dictionaryKey(self.runtime, itemKey) == key:
+      return item
+  return None
+
+def _setObjectForKey(self, obj, key):
+  if obj is None or key is None:
+    raise FBFakeException('NSInvalidArgumentException', '*** -[__NSDictionaryM setObject:forKey:]: object or key cannot be nil')
+  for itemKey in self['items'].keys():
+    if _dictionaryKey(self.runtime, itemKey) == _dictionaryKey(self.runtime, key):
+      del self['items'][itemKey]
+  self['items'][key] = obj
+
+def _isValidJSONObject(cls, obj):
+  try:
+    cls.runtime.toPython(obj)
+  except FBFakeException:
+    return False
+  return obj is not None and (obj.isKindOfClass(cls.runtime.classes['NSArray']) or obj.isKindOfClass(cls.runtime.classes['NSDictionary']))
+
+# UIKit
+
+def _formatNumber(value):
+  return '%g' % value
+
+def _viewDescription(self):
+  x, y, width, height = rectValues(self['frame'])
+  details = ['frame = (%s %s; %s %s)' % tuple(_formatNumber(value) for value in (x, y, width, height))]
+  if self['clipsToBounds']:
+    details.append('clipsToBounds = YES')
+  if self['hidden']:
+    details.append('hidden = YES')
+  if self['alpha'] is not None and self['alpha'] != 1:
+    details.append('alpha = %s' % _formatNumber(self['alpha']))
+  if self['text'] is not None:
+    details.append("text = '%s'" % self['text'])
+  if self['userInteractionEnabled'] is False:
+    details.append('userInteractionEnabled = NO')
+  if self['tag']:
+    details.append('tag = %d' % self['tag'])
+  details.append('layer = <%s: 0x%x>' % (self['layer'].cls.name, self['layer'].address))
+  return self.runtime.string('<%s: 0x%x; %s>' % (self.cls.name, self.address, '; '.join(details)))
+
+def _recursiveDescription(self):
+  lines = []
+  stack = [(self, 0)]
+  runtime = self.runtime
+  while stack:
+    view, depth = stack.pop()
+    lines.append('   | ' * depth + runtime.stringValue(runtime.send(view, 'description')))
+    stack.extend((subview, depth + 1) for subview in reversed(view['subviews']))
+  return runtime.string('\n'.join(lines))
+
+def _superviewChain(view):
+  while view is not None:
+    yield view
+    view = view['superview']
+
+def _originInWindow(view):
+  x = y = 0.0
+  for ancestor in _superviewChain(view):
+    x += ancestor['frame']['origin']['x']
+    y += ancestor['frame']['origin']['y']
+  return (x, y)
+
+def _convertPoint(self, point, toView):
+  x, y = _originInWindow(self)
+  toX, toY = _originInWindow(toView) if toView is not None else (0.0, 0.0)
+  return makeStruct('CGPoint', [point['x'] + x - toX, point['y'] + y - toY])
+
+def _convertRect(self, value, toView):
+  x, y, width, height = rectValues(value)
+  origin = _convertPoint(self, point(x, y), toView)
+  return rect(origin['x'], origin['y'], width, height)
+
+def _window(self):
+  root = list(_superviewChain(self))[-1]
+  return root if root.isKindOfClass(self.runtime.classes['UIWindow']) else None
+
+def _addSubview(self, subview):
+  # Like an id parameter, the subview can be passed as a bare address.
+  if isinstance(subview, (int, long)):
+    subview = self.runtime.object(subview)
+  if subview['superview'] is not None:
+    subview['superview']['subviews'].remove(subview)
+  self['subviews'].append(subview)
+  subview['superview'] = self
+
+def _removeFromSuperview(self):
+  if self['superview'] is not None:
+    self['superview']['subviews'].remove(self)
+    self['superview'] = None
+
+def _pointInside(self, value, event):
+  x, y, width, height = rectValues(self.runtime.send(self, 'bounds'))
+  return x <= value['x'] < x + width and y <= value['y'] < y + height
+
+# Like UIKit, the frontmost subview that contains the point, or the view itself.
+def _hitTest(self, value, event):
+  runtime = self.runtime
+  if not runtime.send(self, 'isUserInteractionEnabled') or runtime.send(self, 'isHidden') or runtime.send(self, 'alpha') < 0.01:
+    return None
+  if not runtime.send(self, 'pointInside:withEvent:', value, event):
+    return None
+  for subview in reversed(self['subviews']):
+    hit = runtime.send(subview, 'hitTest:withEvent:', _convertPoint(self, value, subview), event)
+    if hit is not None:
+      return hit
+  return self
+
+def _viewWithTag(self, tag):
+  stack = [self]
+  while stack:
+    view = stack.pop()
+    if view['tag'] == tag:
+      return view
+    stack.extend(view['subviews'])
+  return None
+
+def _initView(self, frame=None):
+  runtime = self.runtime
+  self.values.setdefault('frame', frame or rect(0, 0, 0, 0))
+  self.values.setdefault('subviews', [])
+  self.values.setdefault('superview', None)
+  self.values.setdefault('alpha', 1.0)
+  self.values.setdefault('hidden', False)
+  self.values.setdefault('tag', 0)
+  self.values['layer'] = FBFakeObject(runtime, runtime.classes['CALayer'], delegate=self, borderWidth=0.0, borderColor=None)
+  return self
+
+def _layerFrame(self):
+  return self['delegate']['frame'] if self['delegate'] is not None else rect(0, 0, 0, 0)
+
+def _nextResponder(self):
+  if self['viewController'] is not None:
+    return self['viewController']
+  return self['superview']
+
+def _color(name):
+  def color(cls):
+    runtime = cls.runtime
+    return FBFakeObject(runtime, runtime.classes['UIColor'], name=name,
+      CGColor=FBFakeObject(runtime, runtime.classes['__NSCFType'], name=name))
+  return color
+
+_colorNames = ['black', 'darkGray', 'lightGray', 'white', 'gray', 'red', 'green', 'blue', 'cyan', 'yellow', 'magenta', 'orange', 'purple', 'brown', 'clear']
+
+def _allTargets(self):
+  return self.runtime.new('NSSet', items=[target for target, action, events in self['actions'] or []])
+
+# Like UIKit, no events matches the actions for any event.
+def _actionsForTarget(self, target, events):
+  actions = [self.runtime.string(action) for actionTarget, action, actionEvents in self['actions'] or []
+    if actionTarget is target and (actionEvents & events or not events)]
+  return self.runtime.array(actions) if actions else None
+
+def _allControlEvents(self):
+  events = 0
+  for target, action, actionEvents in self['actions'] or []:
+    events |= actionEvents
+  return events
+
+def _uikitClasses():
+  return [
+    ('UIResponder', 'NSObject', {
+      'nextResponder': _nextResponder,
+      'isFirstResponder': _getter('firstResponder', False),
+    }, {}, [], []),
+    ('UIApplication', 'UIResponder', {
+      'keyWindow': lambda self: self.runtime.keyWindow,
+      'windows': lambda self: self.runtime.array(self['windows'] or [self.runtime.keyWindow]),
+      'delegate': _getter('delegate'),
+      'accessibilityActivate': lambda self: None,
+    }, {
+      'sharedApplication': lambda cls: cls.runtime.application,
+    }, [], []),
+    ('UIDevice', 'NSObject', {
+      'model': lambda self: self.runtime.string('iPhone Simulator'),
+      'name': lambda self: self.runtime.string('iPhone'),
+    }, {
+      'currentDevice': lambda cls: cls.runtime.new('UIDevice'),
+    }, [], []),
+    ('UIView', 'UIResponder', {
+      'initWithFrame:': _initView,
+      'init': _initView,
+      'description': _viewDescription,
+      'recursiveDescription': _recursiveDescription,
+      'subviews': lambda self: self.runtime.array(self['subviews']),
+      'superview': _getter('superview'),
+      'window': _window,
+      'layer': _getter('layer'),
+      'frame': _getter('frame'),
+      'setFrame:': _setter('frame'),
+      'bounds': lambda self: rect(0, 0, self['frame']['size']['width'], self['frame']['size']['height']),
+      'center': lambda self: point(*(lambda x, y, width, height: (x + width / 2, y + height / 2))(*rectValues(self['frame']))),
+      'isHidden': _getter('hidden', False),
+      'hidden': _getter('hidden', False),
+      'setHidden:': lambda self, hidden: self.values.__setitem__('hidden', bool(hidden)),
+      'alpha': _getter('alpha', 1.0),
+      'setAlpha:': _setter('alpha'),
+      'tag': _getter('tag', 0),
+      'setTag:': _setter('tag'),
+      'viewWithTag:': _viewWithTag,
+      'backgroundColor': _getter('backgroundColor'),
+      'setBackgroundColor:': _setter('backgroundColor'),
+      'isUserInteractionEnabled': _getter('userInteractionEnabled', True),
+      'clipsToBounds': _getter('clipsToBounds', False),
+      'pointInside:withEvent:': _pointInside,
+      'hitTest:withEvent:': _hitTest,
+      'hasAmbiguousLayout': _getter('ambiguousLayout', False),
+      'addSubview:': _addSubview,
+      'removeFromSuperview': _removeFromSuperview,
+      'convertPoint:toView:': _convertPoint,
+      'convertRect:toView:': _convertRect,
+      'accessibilityLabel': lambda self: self.runtime.string(self['accessibilityLabel']) if self['accessibilityLabel'] is not None else None,
+      'accessibilityIdentifier': lambda self: self.runtime.string(self['accessibilityIdentifier']) if self['accessibilityIdentifier'] is not None else None,
+      'isAccessibilityElement': _getter('isAccessibilityElement', False),
+      'accessibilityAttributeValue:': lambda self, key: self.runtime.send(self, 'accessibilityLabel') if key == 2001 else None,
+      'accessibilityElements': _getter('accessibilityElements'),
+      '_accessibleSubviews': lambda self: self.runtime.array(self['subviews']),
+    }, {}, [], []),
+    ('UIWindow', 'UIView', {
+      'rootViewController': _getter('rootViewController'),
+      'isKeyWindow': lambda self: self is self.runtime.keyWindow,
+    }, {}, [], []),
+    ('UILabel', 'UIView', {
+      'text': lambda self: self.runtime.string(self['text']) if self['text'] is not None else None,
+      'setText:': lambda self, text: self.values.__setitem__('text', self.runtime.stringValue(text)),
+    }, {}, [], []),
+    ('UIImageView', 'UIView', {}, {}, [], []),
+    ('UIControl', 'UIView', {
+      'allTargets': _allTargets,
+      'allControlEvents': _allControlEvents,
+      'actionsForTarget:forControlEvent:': _actionsForTarget,
+    }, {}, [], []),
+    ('UIButton', 'UIControl', {}, {}, [], []),
+    ('UITextField', 'UIControl', {
+      'text': lambda self: self.runtime.string(self['text'] or ''),
+      'setText:': lambda self, text: self.values.__setitem__('text', self.runtime.stringValue(text)),
+    }, {}, [], []),
+    ('UIScrollView', 'UIView', {}, {}, [], []),
+    ('UITableView', 'UIScrollView', {}, {}, [], []),
+    ('UITableViewCell', 'UIView', {}, {}, [], []),
+    ('UIViewController', 'UIResponder', {
+      'view': _getter('view'),
+      'isViewLoaded': lambda self: self['view'] is not None,
+      'childViewControllers': lambda self: self.runtime.array(self['childViewControllers'] or []),
+      'parentViewController': _getter('parentViewController'),
+      'presentedViewController': _getter('presentedViewController'),
+      'presentingViewController': _getter('presentingViewController'),
+      'title': lambda self: self.runtime.string(self['title']) if self['title'] is not None else None,
+    }, {}, [], [('view', 'T@"UIView",&,N'), ('title', 'T@"NSString",C,N')]),
+    ('UINavigationController', 'UIViewController', {}, {}, [], []),
+    ('UITabBarController', 'UIViewController', {}, {}, [], []),
+    ('UIAccessibilityElement', 'NSObject', {
+      'accessibilityLabel': lambda self: self.runtime.string(self['accessibilityLabel']) if self['accessibilityLabel'] is not None else None,
+      'accessibilityIdentifier': lambda self: self.runtime.string(self['accessibilityIdentifier']) if self['accessibilityIdentifier'] is not None else None,
+      'accessibilityAttributeValue:': lambda self, key: self.runtime.send(self, 'accessibilityLabel') if key == 2001 else None,
+      'accessibilityElements': lambda self: None,
+      'accessibilityContainer': _getter('accessibilityContainer'),
+    }, {}, [], []),
+    ('UIColor', 'NSObject', {
+      'CGColor': _getter('CGColor'),
+    }, dict((name + 'Color', _color(name)) for name in _colorNames), [], []),
+    ('__NSCFType', 'NSObject', {}, {}, [], []),
+    ('CALayer', 'NSObject', {
+      'delegate': _getter('delegate'),
+      'frame': _layerFrame,
+      'bounds': lambda self: rect(0, 0, *rectValues(_layerFrame(self))[2:]),
+      'borderWidth': _getter('borderWidth', 0.0),
+      'setBorderWidth:': _setter('borderWidth'),
+      'borderColor': _getter('borderColor'),
+      'setBorderColor:': _setter('borderColor'),
+      'speed': _getter('speed', 1.0),
+      'setSpeed:': _setter('speed'),
+      'superlayer': lambda self: self['delegate']['superview']['layer'] if self['delegate']['superview'] is not None else None,
+      'sublayers': lambda self: self.runtime.array(subview['layer'] for subview in self['delegate']['subviews']),
+      'position': lambda self: self.runtime.send(self['delegate'], 'center'),
+      'anchorPoint': lambda self: point(0.5, 0.5),
+      'affineTransform': lambda self: makeStruct('CGAffineTransform', self['transform'] or (1, 0, 0, 1, 0, 0)),
+      'convertPoint:toLayer:': lambda self, point, layer: _convertPoint(self['delegate'], point, layer['delegate'] if layer is not None else None),
+    }, {}, [], []),
+    ('CATransaction', 'NSObject', {}, {
+      'flush': lambda cls: None,
+    }, [], []),
+  ]
+
+# XCTest
+
+def _xctestClasses():
+  return [
+    ('XCUIElementQuery', 'NSObject', {
+      'matchingSnapshotsWithError:': lambda self, error: self.runtime.array([self['snapshot']] if self['snapshot'] else []),
+    }, {}, [], []),
+    ('XCUIElement', 'NSObject', {
+      'query': lambda self: self.runtime.new('XCUIElementQuery', snapshot=self.runtime.xcSnapshot),
+    }, {}, [], []),
+    ('XCUIApplication', 'XCUIElement', {
+      'init': lambda self: self,
+      'retain': lambda self: self,
+      'release': lambda self: None,
+      'autorelease': lambda self: self,
+    }, {}, [], []),
+    ('XCElementSnapshot', 'NSObject', {}, {}, [
+      ('_elementType', 'unsigned long long'),
+      ('_traits', 'unsigned long long'),
+      ('_frame', 'CGRect'),
+      ('_identifier', 'NSString *'),
+      ('_value', 'id'),
+      ('_placeholderValue', 'NSString *'),
+      ('_label', 'NSString *'),
+      ('_title', 'NSString *'),
+      ('_children', 'NSArray *'),
+      ('_enabled', 'BOOL'),
+      ('_selected', 'BOOL'),
+      ('_isMainWindow', 'BOOL'),
+      ('_hasKeyboardFocus', 'BOOL'),
+      ('_hasFocus', 'BOOL'),
+      ('_generation', 'unsigned int'),
+      ('_horizontalSizeClass', 'long long'),
+      ('_verticalSizeClass', 'long long'),
+    ], []),
+  ]
@@ -7,12 +7,14 @@
 # LICENSE file in the root directory of this source tree. An additional grant
 # of patent rights can be found in the PATENTS file in the same directory.
 
-import re
 import os
+import re
 
 import lldb
 import fblldbbase as fb
-import fblldbobjecthelpers as objHelpers
+import fblldbcapabilities as capabilities
+import fblldbtraversal as traversal
+import fblldbtreerenderer as treeRenderer
 
 # This is the key corresponding to accessibility label in _accessibilityElementsInContainer:
 ACCESSIBILITY_LABEL_KEY = 2001
@@ -31,12 +33,18 @@ class FBPrintAccessibilityLabels(fb.FBCommand):
   def description(self):
     return 'Print accessibility labels of all views in hierarchy of <aView>'
 
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-o', long='--output', arg='output', type='string', default=None, help='Write the hierarchy to this file instead of the console.'),
+    ]
+
   def args(self):
     return [ fb.FBCommandArgument(arg='aView', type='UIView*', help='The view to print the hierarchy of.', default='(id)[[UIApplication sharedApplication] keyWindow]') ]
 
   def run(self, arguments, options):
     forceStartAccessibilityServer()
-    printAccessibilityHierarchy(arguments[0])
+    with treeRenderer.openRenderer(options.output) as renderer:
+      printAccessibilityHierarchy(arguments[0], renderer)
 
 class FBPrintAccessibilityIdentifiers(fb.FBCommand):
   def name(self):
@@ -45,12 +53,18 @@ class FBPrintAccessibilityIdentifiers(fb.FBCommand):
   def description(self):
     return 'Print accessibility identifiers of all views in hierarchy of <aView>'
 
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-o', long='--output', arg='output', type='string', default=None, help='Write the hierarchy to this file instead of the console.'),
+    ]
+
   def args(self):
     return [ fb.FBCommandArgument(arg='aView', type='UIView*', help='The view to print the hierarchy of.', default='(id)[[UIApplication sharedApplication] keyWindow]') ]
 
-  def run(self, arguments, option):
+  def run(self, arguments, options):
     forceStartAccessibilityServer()
-    printAccessibilityIdentifiersHierarchy(arguments[0])
+    with treeRenderer.openRenderer(options.output) as renderer:
+      printAccessibilityIdentifiersHierarchy(arguments[0], renderer)
 
 class FBFindViewByAccessibilityLabelCommand(fb.FBCommand):
   def name(self):
@@ -62,91 +76,84 @@ class FBFindViewByAccessibilityLabelCommand(fb.FBCommand):
   def args(self):
     return [ fb.FBCommandArgument(arg='labelRegex', type='string', help='The accessibility label regex to search the view hierarchy for.') ]
 
-  def accessibilityGrepHierarchy(self, view, needle):
-    a11yLabel = accessibilityLabel(view)
-    #if we don't have any accessibility string - we should have some children
-    if int(a11yLabel.GetValue(), 16) == 0:
-      #We call private method that gives back all visible accessibility children for view
-      accessibilityElements = fb.evaluateObjectExpression('[[[UIApplication sharedApplication] keyWindow] _accessibilityElementsInContainer:0 topLevel:%s includeKB:0]' % view)
-      accessibilityElementsCount = fb.evaluateIntegerExpression('[%s count]' % accessibilityElements)
-      for index in range(0, accessibilityElementsCount):
-        subview = fb.evaluateObjectExpression('[%s objectAtIndex:%i]' % (accessibilityElements, index))
-        self.accessibilityGrepHierarchy(subview, needle)
-    elif re.match(r'.*' + needle + '.*', a11yLabel.GetObjectDescription(), re.IGNORECASE):
-      classDesc = objHelpers.className(view)
-      print('({} {}) {}'.format(classDesc, view, a11yLabel.GetObjectDescription()))
+  def run(self, arguments, options):
+    forceStartAccessibilityServer()
+    rootView = fb.evaluateObjectExpression('[[UIApplication sharedApplication] keyWindow]', cacheable=True)
+    address = traversal.rootAddress(rootView)
+    if not address:
+      return
+
+    # The walk is the one pa11y prints, so elements that aren't views, e.g. in
+    # custom accessibilityElements, are found too, and like VoiceOver it
+    # doesn't look inside elements that have a label of their own.
+    pattern = re.compile(arguments[0], re.IGNORECASE)
+    foundElement = False
+    for depth, className, elementAddress, a11yLabel in traversal.walkNodes('accessibilityLabels', _labelsWalker, address):
+      if a11yLabel is None or not pattern.search(a11yLabel):
+        continue
+      element = '0x%x' % elementAddress
+      print('({} {}) {}'.format(className, element, a11yLabel.encode('utf-8')))
 
       #First element that is found is copied to clipboard
-      if not self.foundElement:
-        self.foundElement = True
-        cmd = 'echo %s | tr -d "\n" | pbcopy' % view
+      if not foundElement:
+        foundElement = True
+        cmd = 'echo %s | tr -d "\n" | pbcopy' % element
         os.system(cmd)
 
-  def run(self, arguments, options):
-    forceStartAccessibilityServer()
-    rootView = fb.evaluateObjectExpression('[[UIApplication sharedApplication] keyWindow]')
-    self.foundElement = False
-    self.accessibilityGrepHierarchy(rootView, arguments[0])
-
 def isRunningInSimulator():
-  return ((fb.evaluateExpressionValue('(id)[[UIDevice currentDevice] model]').GetObjectDescription().lower().find('simulator') >= 0) or (fb.evaluateExpressionValue('(id)[[UIDevice currentDevice] name]').GetObjectDescription().lower().find('simulator') >= 0))
+  return capabilities.capabilities().isSimulator
 
 def forceStartAccessibilityServer():
   #We try to start accessibility server only if we don't have needed method active
-  if not fb.evaluateBooleanExpression('[UIView instancesRespondToSelector:@selector(_accessibilityElementsInContainer:)]'):
+  profile = capabilities.capabilities()
+  if not profile.hasAccessibilityElements:
     #Starting accessibility server is different for simulator and device
-    if isRunningInSimulator():
+    if profile.isSimulator:
       fb.evaluateEffect('[[UIApplication sharedApplication] accessibilityActivate]')
     else:
       fb.evaluateEffect('[[[UIApplication sharedApplication] _accessibilityBundlePrincipalClass] _accessibilityStartServer]')
-
-def accessibilityLabel(view):
-  #using Apple private API to get real value of accessibility string for element.
-  return fb.evaluateExpressionValue('(id)[%s accessibilityAttributeValue:%i]' % (view, ACCESSIBILITY_LABEL_KEY), False)
-
-def accessibilityIdentifier(view):
-  return fb.evaluateExpressionValue('(id)[{} accessibilityIdentifier]'.format(view), False)
-
-def accessibilityElements(view):
-  if fb.evaluateBooleanExpression('[UIView instancesRespondToSelector:@selector(accessibilityElements)]'):
-    a11yElements = fb.evaluateExpression('(id)[%s accessibilityElements]' % view, False)
-    if int(a11yElements, 16) != 0:
-      return a11yElements
-  if fb.evaluateBooleanExpression('[%s respondsToSelector:@selector(_accessibleSubviews)]' % view):
-    return fb.evaluateExpression('(id)[%s _accessibleSubviews]' % (view), False)
-  else:
-    return fb.evaluateObjectExpression('[[[UIApplication sharedApplication] keyWindow] _accessibilityElementsInContainer:0 topLevel:%s includeKB:0]' % view)
-
-def printAccessibilityHierarchy(view, indent = 0):
-  a11yLabel = accessibilityLabel(view)
-  classDesc = objHelpers.className(view)
-  indentString = '   | ' * indent
-
-  #if we don't have any accessibility string - we should have some children
-  if int(a11yLabel.GetValue(), 16) == 0:
-    print indentString + ('{} {}'.format(classDesc, view))
-    #We call private method that gives back all visible accessibility children for view
-    a11yElements = accessibilityElements(view)
-    accessibilityElementsCount = int(fb.evaluateExpression('(int)[%s count]' % a11yElements))
-    for index in range(0, accessibilityElementsCount):
-      subview = fb.evaluateObjectExpression('[%s objectAtIndex:%i]' % (a11yElements, index))
-      printAccessibilityHierarchy(subview, indent + 1)
-  else:
-    print indentString + ('({} {}) {}'.format(classDesc, view, a11yLabel.GetObjectDescription()))
-
-def printAccessibilityIdentifiersHierarchy(view, indent = 0):
-  a11yIdentifier = accessibilityIdentifier(view)
-  classDesc = objHelpers.className(view)
-  indentString = '   | ' * indent
-
-  #if we don't have any accessibility identifier - we should have some children
-  if int(a11yIdentifier.GetValue(), 16) == 0:
-    print indentString + ('{} {}'.format(classDesc, view))
-    #We call private method that gives back all visible accessibility children for view
-    a11yElements = accessibilityElements(view)
-    accessibilityElementsCount = int(fb.evaluateExpression('(int)[%s count]' % a11yElements))
-    for index in range(0, accessibilityElementsCount):
-      subview = fb.evaluateObjectExpression('[%s objectAtIndex:%i]' % (a11yElements, index))
-      printAccessibilityIdentifiersHierarchy(subview, indent + 1)
-  else:
-    print indentString + ('({} {}) {}'.format(classDesc, view, a11yIdentifier.GetObjectDescription()))
+    profile.hasAccessibilityElements = True
+
+# Each record is [depth, class name, address, value], where value is the
+# element's label or identifier, or null if it has none. Like VoiceOver, the
+# walk doesn't look inside elements that have a value of their own.
+def _accessibilityWalker(valueExpression):
+  return traversal.walkerDeclaration(prologue="""
+  id keyWindow = (id)[(id)[UIApplication sharedApplication] keyWindow];
+""", visit="""
+    id value = (id)%s;
+    [nodes addObject:@[@(depth), (NSString *)NSStringFromClass((Class)[node class]), @((unsigned long long)(uintptr_t)node),
+      value ? (id)[value description] : (id)[NSNull null]]];
+    if (value == nil) {
+      children = (BOOL)[node respondsToSelector:@selector(accessibilityElements)] ? (NSArray *)[node accessibilityElements] : nil;
+      if (children == nil) {
+        //We call private method that gives back all visible accessibility children for view
+        children = (BOOL)[node respondsToSelector:@selector(_accessibleSubviews)] ?
+          (NSArray *)[node _accessibleSubviews] :
+          (NSArray *)[keyWindow _accessibilityElementsInContainer:0 topLevel:node includeKB:0];
+      }
+    }
+""" % valueExpression)
+
+#using Apple private API to get real value of accessibility string for element.
+_labelsWalker = _accessibilityWalker('[node accessibilityAttributeValue:%i]' % ACCESSIBILITY_LABEL_KEY)
+_identifiersWalker = _accessibilityWalker('[node accessibilityIdentifier]')
+
+def printAccessibilityHierarchy(view, renderer=None):
+  _printAccessibilityHierarchy('accessibilityLabels', _labelsWalker, view, renderer)
+
+def printAccessibilityIdentifiersHierarchy(view, renderer=None):
+  _printAccessibilityHierarchy('accessibilityIdentifiers', _identifiersWalker, view, renderer)
+
+def _printAccessibilityHierarchy(name, walker, view, renderer):
+  renderer = renderer or treeRenderer.FBTreeRenderer()
+  address = traversal.rootAddress(view)
+  if not address:
+    return
+  for chunk in traversal.walk(name, walker, address):
+    for depth, className, elementAddress, a11yValue in chunk.nodes:
+      #if we don't have any accessibility string - we should have some children
+      if a11yValue is None:
+        renderer.node('{} 0x{:x}'.format(className, elementAddress), depth)
+      else:
+        renderer.node('({} 0x{:x}) {}'.format(className, elementAddress, a11yValue.encode('utf-8')), depth)
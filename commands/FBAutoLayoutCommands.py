@@ -11,6 +11,7 @@
 import lldb
 import fblldbbase as fb
 import fblldbviewhelpers as viewHelpers
+import fblldbviewsnapshot as viewSnapshot
 
 def lldbcommands():
   return [
@@ -34,22 +35,18 @@ class FBPrintAutolayoutTrace(fb.FBCommand):
     print fb.describeObject('[{} _autolayoutTrace]'.format(view))
 
 
-def setBorderOnAmbiguousViewRecursive(view, width, color):
-  if not fb.evaluateBooleanExpression('[(id)%s isKindOfClass:(Class)[UIView class]]' % view):
+def setBorderOnAmbiguousViews(view, width, color, refresh=False):
+  snapshot = viewSnapshot.snapshotView(view, refresh=refresh)
+  if snapshot is None:
     return
 
-  isAmbiguous = fb.evaluateBooleanExpression('(BOOL)[%s hasAmbiguousLayout]' % view)
-  if isAmbiguous:
-    layer = viewHelpers.convertToLayer(view)
-    fb.evaluateEffect('[%s setBorderWidth:(CGFloat)%s]' % (layer, width))
-    fb.evaluateEffect('[%s setBorderColor:(CGColorRef)[(id)[UIColor %sColor] CGColor]]' % (layer, color))
-
-  subviews = fb.evaluateExpression('(id)[%s subviews]' % view)
-  subviewsCount = int(fb.evaluateExpression('(int)[(id)%s count]' % subviews))
-  if subviewsCount > 0:
-    for i in range(0, subviewsCount):
-      subview = fb.evaluateExpression('(id)[%s objectAtIndex:%i]' % (subviews, i))
-      setBorderOnAmbiguousViewRecursive(subview, width, color)
+  statements = []
+  for node in snapshot.nodes:
+    if node.ambiguous and node.isKindOfClass('UIView'):
+      statements.append('[%s setBorderWidth:(CGFloat)%s]' % (node.layerExpression(), width))
+      statements.append('[%s setBorderColor:(CGColorRef)[(id)[UIColor %sColor] CGColor]]' % (node.layerExpression(), color))
+  fb.evaluateEffects(statements)
+  viewSnapshot.invalidateSnapshots()
 
 
 class FBAutolayoutBorderAmbiguous(fb.FBCommand):
@@ -62,13 +59,14 @@ class FBAutolayoutBorderAmbiguous(fb.FBCommand):
   def options(self):
     return [
       fb.FBCommandArgument(short='-c', long='--color', arg='color', type='string', default='red', help='A color name such as \'red\', \'green\', \'magenta\', etc.'),
-      fb.FBCommandArgument(short='-w', long='--width', arg='width', type='CGFloat', default=2.0, help='Desired width of border.')
+      fb.FBCommandArgument(short='-w', long='--width', arg='width', type='CGFloat', default=2.0, help='Desired width of border.'),
+      fb.FBCommandArgument(short='-r', long='--refresh', arg='refresh', boolean=True, default=False, help='Read the view hierarchy again, rather than reuse what an earlier command read since the process stopped.'),
     ]
 
   def run(self, arguments, options):
-    keyWindow = fb.evaluateExpression('(id)[[UIApplication sharedApplication] keyWindow]')
-    setBorderOnAmbiguousViewRecursive(keyWindow, options.width, options.color)
-    lldb.debugger.HandleCommand('caflush')
+    keyWindow = viewHelpers.keyWindow()
+    setBorderOnAmbiguousViews(keyWindow, options.width, options.color, options.refresh)
+    fb.handleCommand('caflush')
 
 
 class FBAutolayoutUnborderAmbiguous(fb.FBCommand):
@@ -78,7 +76,12 @@ class FBAutolayoutUnborderAmbiguous(fb.FBCommand):
   def description(self):
     return "Removes the border around views with an ambiguous layout"
 
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-r', long='--refresh', arg='refresh', boolean=True, default=False, help='Read the view hierarchy again, rather than reuse what an earlier command read since the process stopped.'),
+    ]
+
   def run(self, arguments, options):
-    keyWindow = fb.evaluateExpression('(id)[[UIApplication sharedApplication] keyWindow]')
-    setBorderOnAmbiguousViewRecursive(keyWindow, 0, "red")
-    lldb.debugger.HandleCommand('caflush')
+    keyWindow = viewHelpers.keyWindow()
+    setBorderOnAmbiguousViews(keyWindow, 0, "red", options.refresh)
+    fb.handleCommand('caflush')
@@ -1,5 +1,4 @@
 #!/usr/bin/python
-import string
 import lldb
 import fblldbbase as fb
 import fblldbobjcruntimehelpers as runtimeHelpers
@@ -82,62 +81,7 @@ class FBPrintBlock(fb.FBCommand):
 
   def run(self, arguments, options):
     block = arguments[0]
-
-    # http://clang.llvm.org/docs/Block-ABI-Apple.html
-    tmpString = """
-    enum {
-      BLOCK_HAS_COPY_DISPOSE =  (1 << 25),
-      BLOCK_HAS_CTOR =          (1 << 26), // helpers have C++ code
-      BLOCK_IS_GLOBAL =         (1 << 28),
-      BLOCK_HAS_STRET =         (1 << 29), // IFF BLOCK_HAS_SIGNATURE
-      BLOCK_HAS_SIGNATURE =     (1 << 30),
-    };
-    struct Block_literal_1 {
-      void *isa; // initialized to &_NSConcreteStackBlock or &_NSConcreteGlobalBlock
-      int flags;
-      int reserved;
-      void (*invoke)(void *, ...);
-      struct Block_descriptor_1 {
-          unsigned long int reserved; // NULL
-          unsigned long int size;         // sizeof(struct Block_literal_1)
-          // optional helper functions
-          void (*copy_helper)(void *dst, void *src);     // IFF (1<<25)
-          void (*dispose_helper)(void *src);             // IFF (1<<25)
-          // required ABI.2010.3.16
-          const char *signature;                         // IFF (1<<30)
-      } *descriptor;
-      // imported variables
-    };
-    struct Block_literal_1 real = *((__bridge struct Block_literal_1 *)$block);
-    NSMutableDictionary *dict = (id)[NSMutableDictionary dictionary];
-    
-    [dict setObject:(id)[NSNumber numberWithLong:(long)real.invoke] forKey:@"invoke"];
-    
-    if (real.flags & BLOCK_HAS_SIGNATURE) {
-      char *signature;
-      if (real.flags & BLOCK_HAS_COPY_DISPOSE) {
-          signature = (char *)(real.descriptor)->signature;
-      } else {
-          signature = (char *)(real.descriptor)->copy_helper;
-      }
-
-      NSMethodSignature *sig = [NSMethodSignature signatureWithObjCTypes:signature];
-      NSMutableArray *types = [NSMutableArray array];
-
-      [types addObject:(id)[NSString stringWithUTF8String:(char *)[sig methodReturnType]]];
-
-      for (NSUInteger i = 0; i < sig.numberOfArguments; i++) {
-          char *type = (char *)[sig getArgumentTypeAtIndex:i];
-          [types addObject:(id)[NSString stringWithUTF8String:type]];
-      }
-      
-      [dict setObject:types forKey:@"signature"];
-    }
-    
-    RETURN(dict);
-    """
-    command = string.Template(tmpString).substitute(block=block)
-    json = fb.evaluate(command)
+    json = fb.evaluateFunction('blockDescription', blockDescriptionFunction, '(id)({})'.format(block))
 
     signature = json['signature']
     if not signature:
@@ -151,6 +95,62 @@ class FBPrintBlock(fb.FBCommand):
     
     print  'Imp: ' + hex(json['invoke']) + '    Signature: ' + sigStr
 
+# http://clang.llvm.org/docs/Block-ABI-Apple.html
+blockDescriptionFunction = """
+id (^$name)(id) = ^id (id block) {
+  enum {
+    BLOCK_HAS_COPY_DISPOSE =  (1 << 25),
+    BLOCK_HAS_CTOR =          (1 << 26), // helpers have C++ code
+    BLOCK_IS_GLOBAL =         (1 << 28),
+    BLOCK_HAS_STRET =         (1 << 29), // IFF BLOCK_HAS_SIGNATURE
+    BLOCK_HAS_SIGNATURE =     (1 << 30),
+  };
+  struct Block_literal_1 {
+    void *isa; // initialized to &_NSConcreteStackBlock or &_NSConcreteGlobalBlock
+    int flags;
+    int reserved;
+    void (*invoke)(void *, ...);
+    struct Block_descriptor_1 {
+        unsigned long int reserved; // NULL
+        unsigned long int size;         // sizeof(struct Block_literal_1)
+        // optional helper functions
+        void (*copy_helper)(void *dst, void *src);     // IFF (1<<25)
+        void (*dispose_helper)(void *src);             // IFF (1<<25)
+        // required ABI.2010.3.16
+        const char *signature;                         // IFF (1<<30)
+    } *descriptor;
+    // imported variables
+  };
+  struct Block_literal_1 real = *((__bridge struct Block_literal_1 *)block);
+  NSMutableDictionary *dict = (id)[NSMutableDictionary dictionary];
+
+  [dict setObject:(id)[NSNumber numberWithLong:(long)real.invoke] forKey:@"invoke"];
+
+  if (real.flags & BLOCK_HAS_SIGNATURE) {
+    char *signature;
+    if (real.flags & BLOCK_HAS_COPY_DISPOSE) {
+        signature = (char *)(real.descriptor)->signature;
+    } else {
+        signature = (char *)(real.descriptor)->copy_helper;
+    }
+
+    NSMethodSignature *sig = [NSMethodSignature signatureWithObjCTypes:signature];
+    NSMutableArray *types = [NSMutableArray array];
+
+    [types addObject:(id)[NSString stringWithUTF8String:(char *)[sig methodReturnType]]];
+
+    for (NSUInteger i = 0; i < sig.numberOfArguments; i++) {
+        char *type = (char *)[sig getArgumentTypeAtIndex:i];
+        [types addObject:(id)[NSString stringWithUTF8String:type]];
+    }
+
+    [dict setObject:types forKey:@"signature"];
+  }
+
+  return dict;
+};
+"""
+
 # helpers 
 def isClassObject(arg):
   return runtimeHelpers.class_isMetaClass(runtimeHelpers.object_getClass(arg))
@@ -229,41 +229,43 @@ def decode(code):
 
 # Notice that evaluateExpression doesn't work with variable arguments. such as -[NSString stringWithFormat:]
 # I remove the "free(methods)" because it would cause evaluateExpressionValue to raise exception some time.
-def getMethods(klass):
-  tmpString = """
-    unsigned int outCount;
-    Method *methods = (Method *)class_copyMethodList((Class)$cls, &outCount);
-    NSMutableArray *result = (id)[NSMutableArray array];
-    
-    for (int i = 0; i < outCount; i++) {
-      NSMutableDictionary *m = (id)[NSMutableDictionary dictionary];
-
-      SEL name = (SEL)method_getName(methods[i]);
-      [m setObject:(id)NSStringFromSelector(name) forKey:@"name"];
-      
-      char * encoding = (char *)method_getTypeEncoding(methods[i]);
-      [m setObject:(id)[NSString stringWithUTF8String:encoding] forKey:@"type_encoding"];
-      
-      NSMutableArray *types = (id)[NSMutableArray array];
-      NSInteger args = (NSInteger)method_getNumberOfArguments(methods[i]);
-      for (int idx = 0; idx < args; idx++) {
-          char *type = (char *)method_copyArgumentType(methods[i], idx);
-          [types addObject:(id)[NSString stringWithUTF8String:type]];
-      }
-      [m setObject:types forKey:@"parameters_type"];
-      
-      char *ret_type = (char *)method_copyReturnType(methods[i]);
-      [m setObject:(id)[NSString stringWithUTF8String:ret_type] forKey:@"return_type"];
-      
-      long imp = (long)method_getImplementation(methods[i]);
-      [m setObject:[NSNumber numberWithLongLong:imp] forKey:@"implementation"];
-      
-      [result addObject:m];
+methodsFunction = """
+id (^$name)(Class) = ^id (Class cls) {
+  unsigned int outCount;
+  Method *methods = (Method *)class_copyMethodList(cls, &outCount);
+  NSMutableArray *result = (id)[NSMutableArray array];
+
+  for (int i = 0; i < outCount; i++) {
+    NSMutableDictionary *m = (id)[NSMutableDictionary dictionary];
+
+    SEL name = (SEL)method_getName(methods[i]);
+    [m setObject:(id)NSStringFromSelector(name) forKey:@"name"];
+
+    char * encoding = (char *)method_getTypeEncoding(methods[i]);
+    [m setObject:(id)[NSString stringWithUTF8String:encoding] forKey:@"type_encoding"];
+
+    NSMutableArray *types = (id)[NSMutableArray array];
+    NSInteger args = (NSInteger)method_getNumberOfArguments(methods[i]);
+    for (int idx = 0; idx < args; idx++) {
+        char *type = (char *)method_copyArgumentType(methods[i], idx);
+        [types addObject:(id)[NSString stringWithUTF8String:type]];
     }
-    RETURN(result);
-  """
-  command = string.Template(tmpString).substitute(cls=klass)
-  methods = fb.evaluate(command)
+    [m setObject:types forKey:@"parameters_type"];
+
+    char *ret_type = (char *)method_copyReturnType(methods[i]);
+    [m setObject:(id)[NSString stringWithUTF8String:ret_type] forKey:@"return_type"];
+
+    long imp = (long)method_getImplementation(methods[i]);
+    [m setObject:[NSNumber numberWithLongLong:imp] forKey:@"implementation"];
+
+    [result addObject:m];
+  }
+  return result;
+};
+"""
+
+def getMethods(klass):
+  methods = fb.evaluateFunction('methods', methodsFunction, '(Class){}'.format(klass))
   return [Method(m) for m in methods]
 
 class Method:
@@ -293,36 +295,38 @@ class Method:
   def __str__(self):
     return "<Method:" + self.oc_method + "> " + self.name + " --- " + self.type + " --- " + self.imp
 
-def getProperties(klass):
-  tmpString = """
-      NSMutableArray *result = (id)[NSMutableArray array];
-      unsigned int count;
-      objc_property_t *props = (objc_property_t *)class_copyPropertyList((Class)$cls, &count);
-      for (int i = 0; i < count; i++) {
-          NSMutableDictionary *dict = (id)[NSMutableDictionary dictionary];
-          
-          char *name = (char *)property_getName(props[i]);
-          [dict setObject:(id)[NSString stringWithUTF8String:name] forKey:@"name"];
-          
-          char *attrstr = (char *)property_getAttributes(props[i]);
-          [dict setObject:(id)[NSString stringWithUTF8String:attrstr] forKey:@"attributes_string"];
-          
-          NSMutableDictionary *attrsDict = (id)[NSMutableDictionary dictionary];
-          unsigned int pcount;
-          objc_property_attribute_t *attrs = (objc_property_attribute_t *)property_copyAttributeList(props[i], &pcount);
-          for (int i = 0; i < pcount; i++) {
-              NSString *name = (id)[NSString stringWithUTF8String:(char *)attrs[i].name];
-              NSString *value = (id)[NSString stringWithUTF8String:(char *)attrs[i].value];
-              [attrsDict setObject:value forKey:name];
-          }
-          [dict setObject:attrsDict forKey:@"attributes"];
-          
-          [result addObject:dict];
+propertiesFunction = """
+id (^$name)(Class) = ^id (Class cls) {
+  NSMutableArray *result = (id)[NSMutableArray array];
+  unsigned int count;
+  objc_property_t *props = (objc_property_t *)class_copyPropertyList(cls, &count);
+  for (int i = 0; i < count; i++) {
+      NSMutableDictionary *dict = (id)[NSMutableDictionary dictionary];
+
+      char *name = (char *)property_getName(props[i]);
+      [dict setObject:(id)[NSString stringWithUTF8String:name] forKey:@"name"];
+
+      char *attrstr = (char *)property_getAttributes(props[i]);
+      [dict setObject:(id)[NSString stringWithUTF8String:attrstr] forKey:@"attributes_string"];
+
+      NSMutableDictionary *attrsDict = (id)[NSMutableDictionary dictionary];
+      unsigned int pcount;
+      objc_property_attribute_t *attrs = (objc_property_attribute_t *)property_copyAttributeList(props[i], &pcount);
+      for (int i = 0; i < pcount; i++) {
+          NSString *name = (id)[NSString stringWithUTF8String:(char *)attrs[i].name];
+          NSString *value = (id)[NSString stringWithUTF8String:(char *)attrs[i].value];
+          [attrsDict setObject:value forKey:name];
       }
-      RETURN(result);
-    """
-  command = string.Template(tmpString).substitute(cls=klass)
-  propsJson = fb.evaluate(command)
+      [dict setObject:attrsDict forKey:@"attributes"];
+
+      [result addObject:dict];
+  }
+  return result;
+};
+"""
+
+def getProperties(klass):
+  propsJson = fb.evaluateFunction('properties', propertiesFunction, '(Class){}'.format(klass))
   return [Property(m) for m in propsJson]
 
 class Property:
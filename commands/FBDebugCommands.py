@@ -33,17 +33,17 @@ class FBWatchInstanceVariableCommand(fb.FBCommand):
   def run(self, arguments, options):
     commandForObject, ivarName = arguments
 
-    objectAddress = int(fb.evaluateObjectExpression(commandForObject), 0)
+    objectAddress = fb.evaluatePointer(commandForObject)
 
     ivarOffsetCommand = '(ptrdiff_t)ivar_getOffset((void*)object_getInstanceVariable((id){}, "{}", 0))'.format(objectAddress, ivarName)
-    ivarOffset = int(fb.evaluateExpression(ivarOffsetCommand), 0)
+    ivarOffset = fb.evaluateSigned(ivarOffsetCommand)
 
     # A multi-statement command allows for variables scoped to the command, not permanent in the session like $variables.
     ivarSizeCommand = ('unsigned int size = 0;'
                        'char *typeEncoding = (char *)ivar_getTypeEncoding((void*)class_getInstanceVariable((Class)object_getClass((id){}), "{}"));'
                        '(char *)NSGetSizeAndAlignment(typeEncoding, &size, 0);'
                        'size').format(objectAddress, ivarName)
-    ivarSize = int(fb.evaluateExpression(ivarSizeCommand), 0)
+    ivarSize = fb.evaluateUnsigned(ivarSizeCommand)
 
     error = lldb.SBError()
     watchpoint = lldb.debugger.GetSelectedTarget().WatchAddress(objectAddress + ivarOffset, ivarSize, False, True, error)
@@ -69,7 +69,7 @@ class FBFrameworkAddressBreakpointCommand(fb.FBCommand):
     library_address = int(arguments[0], 0)
     address = int(lldb.debugger.GetSelectedTarget().GetProcess().GetSelectedThread().GetSelectedFrame().GetModule().ResolveFileAddress(library_address))
 
-    lldb.debugger.HandleCommand('breakpoint set --address {}'.format(address))
+    fb.handleCommand('breakpoint set --address {}'.format(address))
 
 class FBMethodBreakpointCommand(fb.FBCommand):
   def name(self):
@@ -161,10 +161,10 @@ class FBMethodBreakpointCommand(fb.FBCommand):
     print 'Setting a breakpoint at {} with condition {}'.format(breakpointFullName, breakpointCondition)
 
     if category:
-      lldb.debugger.HandleCommand('breakpoint set --skip-prologue false --fullname "{}" --condition "{}"'.format(breakpointFullName, breakpointCondition))
+      fb.handleCommand('breakpoint set --skip-prologue false --fullname "{}" --condition "{}"'.format(breakpointFullName, breakpointCondition))
     else:
       breakpointPattern = '{}\[{}(\(.+\))? {}\]'.format(methodTypeCharacter, breakpointClassName, selector)
-      lldb.debugger.HandleCommand('breakpoint set --skip-prologue false --func-regex "{}" --condition "{}"'.format(breakpointPattern, breakpointCondition))
+      fb.handleCommand('breakpoint set --skip-prologue false --func-regex "{}" --condition "{}"'.format(breakpointPattern, breakpointCondition))
 
 def classItselfImplementsSelector(klass, selector):
   thisMethod = objc.class_getInstanceMethod(klass, selector)
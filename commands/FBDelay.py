@@ -26,12 +26,12 @@ class FBDelay(fb.FBCommand):
 
   def run(self, arguments, options):
     lldb.debugger.SetAsync(True)
-    lldb.debugger.HandleCommand('process continue')
+    fb.handleCommand('process continue')
     delay = float(arguments[0])
     command = str(arguments[1])
     t = Timer(delay, lambda: self.runDelayed(command))
     t.start()
 
   def runDelayed(self, command):
-    lldb.debugger.HandleCommand('process interrupt')
-    lldb.debugger.HandleCommand(command)
+    fb.handleCommand('process interrupt')
+    fb.handleCommand(command)
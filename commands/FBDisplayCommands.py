@@ -13,6 +13,7 @@ import fblldbviewhelpers as viewHelpers
 import fblldbviewcontrollerhelpers as viewControllerHelpers
 import fblldbbase as fb
 import fblldbobjcruntimehelpers as runtimeHelpers
+import fblldbviewsnapshot as viewSnapshot
 
 def lldbcommands():
   return [
@@ -59,12 +60,15 @@ class FBDrawBorderCommand(fb.FBCommand):
       fb.FBCommandArgument(short='-c', long='--color', arg='color', type='string', default='red', help='A color name such as \'red\', \'green\', \'magenta\', etc.'),
       fb.FBCommandArgument(short='-w', long='--width', arg='width', type='CGFloat', default=2.0, help='Desired width of border.'),
       fb.FBCommandArgument(short='-d', long='--depth', arg='depth', type='int', default=0, help='Number of levels of subviews to border. Each level gets a different color beginning with the provided or default color'),
+      fb.FBCommandArgument(short='-r', long='--refresh', arg='refresh', boolean=True, default=False, help='Read the view hierarchy again, rather than reuse what an earlier command read since the process stopped.'),
     ]
 
   def run(self, args, options):
     def setBorder(layer, width, color, colorClass):
-      fb.evaluateEffect('[%s setBorderWidth:(CGFloat)%s]' % (layer, width))
-      fb.evaluateEffect('[%s setBorderColor:(CGColorRef)[(id)[%s %sColor] CGColor]]' % (layer, colorClass, color))
+      return [
+        '[%s setBorderWidth:(CGFloat)%s]' % (layer, width),
+        '[%s setBorderColor:(CGColorRef)[(id)[%s %sColor] CGColor]]' % (layer, colorClass, color),
+      ]
 
     obj = fb.evaluateInputExpression(args[0])
     depth = int(options.depth)
@@ -76,22 +80,26 @@ class FBDrawBorderCommand(fb.FBCommand):
       colorClassName = 'NSColor'
 
     if viewHelpers.isView(obj):
-      prevLevel = 0
-      for view, level in viewHelpers.subviewsOfView(obj):
-        if level > depth:
-           break
-        if prevLevel != level:
-          color = self.nextColorAfterColor(color)
-          prevLevel = level
-        layer = viewHelpers.convertToLayer(view)
-        setBorder(layer, options.width, color, colorClassName)
+      snapshot = viewSnapshot.snapshotView(obj, max(depth, 0), refresh=options.refresh)
+      if snapshot is None:
+        return
+
+      levelColors = [color]
+      statements = []
+      for node in snapshot.nodes:
+        while len(levelColors) <= node.depth:
+          levelColors.append(self.nextColorAfterColor(levelColors[-1]))
+        statements += setBorder(node.layerExpression(), options.width, levelColors[node.depth], colorClassName)
+      fb.evaluateEffects(statements)
+      viewSnapshot.invalidateSnapshots()
     else:
       # `obj` is not a view, make sure recursive bordering is not requested
       assert depth <= 0, "Recursive bordering is only supported for UIViews or NSViews"
       layer = viewHelpers.convertToLayer(obj)
-      setBorder(layer, options.width, color, colorClassName)
+      fb.evaluateEffects(setBorder(layer, options.width, color, colorClassName))
+      viewSnapshot.invalidateSnapshots()
 
-    lldb.debugger.HandleCommand('caflush')
+    fb.handleCommand('caflush')
 
   def nextColorAfterColor(self, color):
     assert color in self.colors, "{} is not a supported color".format(color)
@@ -106,31 +114,33 @@ class FBRemoveBorderCommand(fb.FBCommand):
 
   def options(self):
     return [
-      fb.FBCommandArgument(short='-d', long='--depth', arg='depth', type='int', default=0, help='Number of levels of subviews to unborder.')
+      fb.FBCommandArgument(short='-d', long='--depth', arg='depth', type='int', default=0, help='Number of levels of subviews to unborder.'),
+      fb.FBCommandArgument(short='-r', long='--refresh', arg='refresh', boolean=True, default=False, help='Read the view hierarchy again, rather than reuse what an earlier command read since the process stopped.'),
     ]
 
   def args(self):
     return [ fb.FBCommandArgument(arg='viewOrLayer', type='UIView/NSView/CALayer *', help='The view/layer to unborder.') ]
 
   def run(self, args, options):
-    def setUnborder(layer):
-        fb.evaluateEffect('[%s setBorderWidth:(CGFloat)%s]' % (layer, 0))
+    def unborder(layer):
+      return '[%s setBorderWidth:(CGFloat)%s]' % (layer, 0)
 
     obj = args[0]
     depth = int(options.depth)
     if viewHelpers.isView(obj):
-      for view, level in viewHelpers.subviewsOfView(obj):
-        if level > depth:
-           break
-        layer = viewHelpers.convertToLayer(view)
-        setUnborder(layer)
+      snapshot = viewSnapshot.snapshotView(obj, max(depth, 0), refresh=options.refresh)
+      if snapshot is None:
+        return
+      fb.evaluateEffects(unborder(node.layerExpression()) for node in snapshot.nodes)
+      viewSnapshot.invalidateSnapshots()
     else:
       # `obj` is not a view, make sure recursive unbordering is not requested
       assert depth <= 0, "Recursive unbordering is only supported for UIViews or NSViews"
       layer = viewHelpers.convertToLayer(obj)
-      setUnborder(layer)
+      fb.evaluateEffect(unborder(layer))
+      viewSnapshot.invalidateSnapshots()
 
-    lldb.debugger.HandleCommand('caflush')
+    fb.handleCommand('caflush')
 
 class FBMaskViewCommand(fb.FBCommand):
   def name(self):
@@ -12,14 +12,19 @@ import re
 
 import lldb
 import fblldbbase as fb
+import fblldbgeometry as geometry
 import fblldbobjcruntimehelpers as objc
 import fblldbviewcontrollerhelpers as vcHelpers
+import fblldbviewhelpers as viewHelpers
+import fblldbviewquery as viewQuery
+import fblldbviewsnapshot as viewSnapshot
 
 def lldbcommands():
   return [
     FBFindViewControllerCommand(),
     FBFindViewCommand(),
     FBTapLoggerCommand(),
+    FBHitTestCommand(),
   ]
 
 class FBFindViewControllerCommand(fb.FBCommand):
@@ -83,12 +88,26 @@ class FBFindViewCommand(fb.FBCommand):
   def description(self):
       return 'Find the views whose class names match classNameRegex and puts the address of first on the clipboard.'
 
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-k', long='--kind', arg='kind', boolean=True, default=False, help='Find the views of the class named classNameRegex and of its subclasses, rather than match class names with the regex.'),
+      fb.FBCommandArgument(short='-r', long='--refresh', arg='refresh', boolean=True, default=False, help='Read the view hierarchy again, rather than reuse what an earlier command read since the process stopped.'),
+    ]
+
   def args(self):
     return [ fb.FBCommandArgument(arg='classNameRegex', type='string', help='The view-class regex to search the view hierarchy for.') ]
 
   def run(self, arguments, options):
-    output = fb.evaluateExpressionValue('(id)[[[UIApplication sharedApplication] keyWindow] recursiveDescription]').GetObjectDescription()
-    printMatchesInViewOutputStringAndCopyFirstToClipboard(arguments[0], output)
+    snapshot = viewSnapshot.snapshotView(viewHelpers.keyWindow(), refresh=options.refresh)
+    if snapshot is None:
+      return
+
+    query = viewQuery.query(snapshot)
+    if options.kind:
+      query.kindOf(arguments[0])
+    else:
+      query.classMatches(arguments[0])
+    printViewsAndCopyFirstToClipboard(query)
 
 
 def printMatchesInViewOutputStringAndCopyFirstToClipboard(needle, haystack):
@@ -103,6 +122,17 @@ def printMatchesInViewOutputStringAndCopyFirstToClipboard(needle, haystack):
       os.system(cmd)
 
 
+def printViewsAndCopyFirstToClipboard(nodes):
+  first = None
+  for node in nodes:
+    view = '0x%x' % node.address
+    print('{} {}'.format(view, node.className))
+    if first is None:
+      first = view
+      cmd = 'echo %s | tr -d "\n" | pbcopy' % view
+      os.system(cmd)
+
+
 class FBTapLoggerCommand(fb.FBCommand):
   def name(self):
     return 'taplog'
@@ -115,13 +145,47 @@ class FBTapLoggerCommand(fb.FBCommand):
     breakpoint = lldb.debugger.GetSelectedTarget().BreakpointCreateByName("-[UIApplication sendEvent:]")
     breakpoint.SetCondition('(int)[' + parameterExpr + ' type] == 0 && (int)[[[' + parameterExpr + ' allTouches] anyObject] phase] == 0')
     breakpoint.SetOneShot(True)
-    lldb.debugger.HandleCommand('breakpoint command add -s python -F "sys.modules[\'' + __name__ + '\'].' + self.__class__.__name__ + '.taplog_callback" ' + str(breakpoint.id))
+    fb.handleCommand('breakpoint command add -s python -F "sys.modules[\'' + __name__ + '\'].' + self.__class__.__name__ + '.taplog_callback" ' + str(breakpoint.id))
     lldb.debugger.SetAsync(True)
-    lldb.debugger.HandleCommand('continue')
+    fb.handleCommand('continue')
 
   @staticmethod
   def taplog_callback(frame, bp_loc, internal_dict):
     parameterExpr = objc.functionPreambleExpressionForObjectParameterAtIndex(0)
     print fb.describeObject('[[[%s allTouches] anyObject] view]' % (parameterExpr))
     # We don't want to proceed event (click on button for example), so we just skip it
-    lldb.debugger.HandleCommand('thread return')
+    fb.handleCommand('thread return')
+
+
+class FBHitTestCommand(fb.FBCommand):
+  def name(self):
+    return 'hittest'
+
+  def description(self):
+    return 'Print the view that would receive a touch at a point in the key window, and every view under the point with the reason it does or doesn\'t receive it, without resuming the process.'
+
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-r', long='--refresh', arg='refresh', boolean=True, default=False, help='Read the view hierarchy again, rather than reuse what an earlier command read since the process stopped.'),
+    ]
+
+  def args(self):
+    return [
+      fb.FBCommandArgument(arg='x', type='CGFloat', help='The x coordinate of the point, in the key window.'),
+      fb.FBCommandArgument(arg='y', type='CGFloat', help='The y coordinate of the point, in the key window.'),
+    ]
+
+  def run(self, arguments, options):
+    x, y = float(arguments[0]), float(arguments[1])
+    snapshot = viewSnapshot.snapshotView(viewHelpers.keyWindow(), refresh=options.refresh)
+    if snapshot is None:
+      return
+
+    candidates = geometry.geometry(snapshot).hitTestCandidates(x, y)
+    if not candidates:
+      print('No view contains ({:g}, {:g}).'.format(x, y))
+      return
+
+    # Front to back, like the views are drawn.
+    for node, reason in candidates:
+      print('0x{:x} {}: {}'.format(node.address, node.className, reason))
@@ -124,18 +124,18 @@ class FlickerWalker:
       print fb.describeObject(view)
 
 def superviewOfView(view):
-  superview = fb.evaluateObjectExpression('[' + view + ' superview]')
-  if int(superview, 16) == 0:
+  superview = fb.evaluatePointer('[' + view + ' superview]')
+  if not superview:
     return None
 
-  return superview
+  return '0x%x' % superview
 
 def subviewsOfView(view):
   return fb.evaluateObjectExpression('[' + view + ' subviews]')
 
 def firstSubviewOfView(view):
   subviews = subviewsOfView(view)
-  numViews = fb.evaluateIntegerExpression('[(id)' + subviews + ' count]')
+  numViews = fb.evaluateUnsigned('[(id)' + subviews + ' count]')
 
   if numViews == 0:
     return None
@@ -144,7 +144,7 @@ def firstSubviewOfView(view):
 
 def nthSiblingOfView(view, n):
   subviews = subviewsOfView(superviewOfView(view))
-  numViews = fb.evaluateIntegerExpression('[(id)' + subviews + ' count]')
+  numViews = fb.evaluateUnsigned('[(id)' + subviews + ' count]')
 
   idx = fb.evaluateIntegerExpression('[(id)' + subviews + ' indexOfObject:' + view + ']')
 
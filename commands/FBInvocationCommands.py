@@ -84,11 +84,11 @@ def stackStartAddressInSelectedFrame(frame):
   offset = currentPC - frameStartAddress
 
   if offset == 0:
-    return int(frame.EvaluateExpression('($esp + 4)').GetValue())
+    return int(fb.evaluateExpressionInFrame(frame, '($esp + 4)').GetValue())
   elif offset == 1:
-    return int(frame.EvaluateExpression('($esp + 8)').GetValue())
+    return int(fb.evaluateExpressionInFrame(frame, '($esp + 8)').GetValue())
   else:
-    return int(frame.EvaluateExpression('($ebp + 8)').GetValue())
+    return int(fb.evaluateExpressionInFrame(frame, '($ebp + 8)').GetValue())
 
 
 def findArgAtIndexFromStackFrame(frame, index):
@@ -179,7 +179,7 @@ def argumentAsString(frame, address, encoding):
       type += ' ' + pointers
 
   if type:
-    value = frame.EvaluateExpression('*(' + type + ' *)' + str(address))
+    value = fb.evaluateExpressionInFrame(frame, '*(' + type + ' *)' + str(address))
 
     if value.GetError() is None or str(value.GetError()) == 'success':
       description = None
@@ -13,9 +13,11 @@ import subprocess
 
 import lldb
 import fblldbbase as fb
+import fblldbcapabilities as capabilities
 import fblldbviewcontrollerhelpers as vcHelpers
 import fblldbviewhelpers as viewHelpers
 import fblldbobjcruntimehelpers as runtimeHelpers
+import fblldbtreerenderer as treeRenderer
 
 def lldbcommands():
   return [
@@ -51,6 +53,11 @@ class FBPrintViewHierarchyCommand(fb.FBCommand):
     return [
       fb.FBCommandArgument(short='-u', long='--up', arg='upwards', boolean=True, default=False, help='Print only the hierarchy directly above the view, up to its window.'),
       fb.FBCommandArgument(short='-d', long='--depth', arg='depth', type='int', default="0", help='Print only to a given depth. 0 indicates infinite depth.'),
+      fb.FBCommandArgument(short='-o', long='--output', arg='output', type='string', default=None, help='Write the hierarchy to this file instead of the console.'),
+      fb.FBCommandArgument(short='-c', long='--class', arg='classPattern', type='string', default=None, help='Print only the views whose class matches this regex (case insensitive).'),
+      fb.FBCommandArgument(short='-H', long='--hidden', arg='hidden', boolean=True, default=False, help='Print only the views that are hidden.'),
+      fb.FBCommandArgument(short='-z', long='--zero-size', arg='zeroSize', boolean=True, default=False, help='Print only the views that have no width or height.'),
+      fb.FBCommandArgument(short='-x', long='--offscreen', arg='offscreen', boolean=True, default=False, help='Print only the views that are outside their window.'),
     ]
 
   def args(self):
@@ -66,25 +73,19 @@ class FBPrintViewHierarchyCommand(fb.FBCommand):
       if isMac:
         arguments[0] = '(id)[[[[NSApplication sharedApplication] windows] objectAtIndex:0] contentView]'
 
-    if options.upwards:
-      view = arguments[0]
-      description = viewHelpers.upwardsRecursiveDescription(view, maxDepth)
-      if description:
-        print description
+    with treeRenderer.openRenderer(options.output) as renderer:
+      if options.upwards:
+        view = arguments[0]
+        if not viewHelpers.printUpwardsRecursiveDescription(view, renderer, maxDepth):
+          print 'Failed to walk view hierarchy. Make sure you pass a view, not any other kind of object or expression.'
+      elif isMac and maxDepth <= 0 and not (options.classPattern or options.hidden or options.zeroSize or options.offscreen):
+        description = fb.evaluateExpressionValue('(id)[' + arguments[0] + ' _subtreeDescription]').GetObjectDescription()
+        for line in (description or '').splitlines():
+          renderer.write(line)
       else:
-        print 'Failed to walk view hierarchy. Make sure you pass a view, not any other kind of object or expression.'
-    else:
-      printingMethod = 'recursiveDescription'
-      if isMac:
-        printingMethod = '_subtreeDescription'
-
-      description = fb.evaluateExpressionValue('(id)[' + arguments[0] + ' ' + printingMethod + ']').GetObjectDescription()
-      if maxDepth > 0:
-        separator = re.escape("   | ")
-        prefixToRemove = separator * maxDepth + " "
-        description += "\n"
-        description = re.sub(r'%s.*\n' % (prefixToRemove), r'', description)
-      print description
+        # The depth limit and the filters are applied in the process, as it walks.
+        viewHelpers.printRecursiveDescription(arguments[0], renderer, maxDepth, options.classPattern,
+          options.hidden, options.zeroSize, options.offscreen)
 
 
 class FBPrintCoreAnimationTree(fb.FBCommand):
@@ -105,22 +106,29 @@ class FBPrintViewControllerHierarchyCommand(fb.FBCommand):
   def description(self):
     return 'Print the recursion description of <aViewController>.'
 
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-o', long='--output', arg='output', type='string', default=None, help='Write the hierarchy to this file instead of the console.'),
+    ]
+
   def args(self):
     return [ fb.FBCommandArgument(arg='aViewController', type='UIViewController*', help='The view controller to print the description of.', default='__keyWindow_rootVC_dynamic__') ]
 
   def run(self, arguments, options):
     isMac = runtimeHelpers.isMacintoshArch()
 
-    if arguments[0] == '__keyWindow_rootVC_dynamic__':
-      if fb.evaluateBooleanExpression('[UIViewController respondsToSelector:@selector(_printHierarchy)]'):
-        print fb.describeObject('[UIViewController _printHierarchy]')
-        return
+    with treeRenderer.openRenderer(options.output) as renderer:
+      if arguments[0] == '__keyWindow_rootVC_dynamic__':
+        if capabilities.capabilities().hasPrintHierarchy:
+          for line in (fb.describeObject('[UIViewController _printHierarchy]') or '').splitlines():
+            renderer.write(line)
+          return
 
-      arguments[0] = '(id)[(id)[[UIApplication sharedApplication] keyWindow] rootViewController]'
-      if isMac:
-        arguments[0] = '(id)[[[[NSApplication sharedApplication] windows] objectAtIndex:0] contentViewController]'
+        arguments[0] = '(id)[(id)[[UIApplication sharedApplication] keyWindow] rootViewController]'
+        if isMac:
+          arguments[0] = '(id)[[[[NSApplication sharedApplication] windows] objectAtIndex:0] contentViewController]'
 
-    print vcHelpers.viewControllerRecursiveDescription(arguments[0])
+      vcHelpers.printViewControllerRecursiveDescription(arguments[0], renderer)
 
 
 class FBPrintIsExecutingInAnimationBlockCommand(fb.FBCommand):
@@ -131,14 +139,13 @@ class FBPrintIsExecutingInAnimationBlockCommand(fb.FBCommand):
     return 'Prints if the code is currently execution with a UIView animation block.'
 
   def run(self, arguments, options):
-    lldb.debugger.HandleCommand('p (BOOL)[UIView _isInAnimationBlock]')
+    fb.handleCommand('p (BOOL)[UIView _isInAnimationBlock]')
 
 
 def _printIterative(initialValue, generator):
-  indent = 0
-  for currentValue in generator(initialValue):
-    print '   | ' * indent + currentValue
-    indent += 1
+  renderer = treeRenderer.FBTreeRenderer()
+  for depth, currentValue in enumerate(generator(initialValue)):
+    renderer.node(currentValue, depth)
 
 
 class FBPrintInheritanceHierarchy(fb.FBCommand):
@@ -158,8 +165,8 @@ def _inheritanceHierarchy(instanceOfAClass):
   instanceAddress = fb.evaluateExpression(instanceOfAClass)
   instanceClass = fb.evaluateExpression('(id)[(id)' + instanceAddress + ' class]')
   while int(instanceClass, 16):
-    yield fb.evaluateExpressionValue(instanceClass).GetObjectDescription()
-    instanceClass = fb.evaluateExpression('(id)[(id)' + instanceClass + ' superclass]')
+    yield runtimeHelpers.class_getName(instanceClass)
+    instanceClass = runtimeHelpers.class_getSuperclass(instanceClass)
 
 
 class FBPrintUpwardResponderChain(fb.FBCommand):
@@ -187,10 +194,10 @@ class FBPrintUpwardResponderChain(fb.FBCommand):
     _printIterative(startResponder, _responderChain)
 
 def _responderChain(startResponder):
-  responderAddress = fb.evaluateExpression(startResponder)
-  while int(responderAddress, 16):
-    yield fb.evaluateExpressionValue(responderAddress).GetObjectDescription()
-    responderAddress = fb.evaluateExpression('(id)[(id)' + responderAddress + ' nextResponder]')
+  responderAddress = fb.evaluatePointer(startResponder)
+  while responderAddress:
+    yield fb.describeObject('0x%x' % responderAddress)
+    responderAddress = fb.evaluatePointer('[(id)0x%x nextResponder]' % responderAddress)
 
 
 def tableViewInHierarchy():
@@ -268,7 +275,7 @@ class FBPrintInternals(fb.FBCommand):
   def run(self, arguments, options):
     object = fb.evaluateObjectExpression(arguments[0])
     if options.appleWay:
-        if fb.evaluateBooleanExpression('[{} respondsToSelector:@selector(_ivarDescription)]'.format(object)):
+        if capabilities.capabilities().hasIvarDescription:
             command = 'po [{} _ivarDescription]'.format(object)
         else:
             print 'Sorry, but it seems Apple dumped the _ivarDescription method'
@@ -276,7 +283,7 @@ class FBPrintInternals(fb.FBCommand):
     else:
         objectClass = fb.evaluateExpressionValue('(id)[(id)(' + object + ') class]').GetObjectDescription()
         command = 'p *(({} *)((id){}))'.format(objectClass, object)
-    lldb.debugger.HandleCommand(command)
+    fb.handleCommand(command)
 
 
 class FBPrintInstanceVariable(fb.FBCommand):
@@ -319,7 +326,7 @@ class FBPrintKeyPath(fb.FBCommand):
   def run(self, arguments, options):
     command = arguments[0]
     if len(command.split('.')) == 1:
-      lldb.debugger.HandleCommand("po " + command)
+      fb.handleCommand("po " + command)
     else:
       objectToMessage, keypath = command.split('.', 1)
       object = fb.evaluateObjectExpression(objectToMessage)
@@ -441,7 +448,7 @@ class FBPrintData(fb.FBCommand):
     elif encoding_text == 'utf32l':
       enc = 0x9c000100
 
-    print fb.describeObject('[[NSString alloc] initWithData:{} encoding:{}]'.format(arguments[0], enc))
+    print fb.describeObject('[[[NSString alloc] initWithData:{} encoding:{}] autorelease]'.format(arguments[0], enc))
 
 class FBPrintTargetActions(fb.FBCommand):
 
@@ -456,17 +463,22 @@ class FBPrintTargetActions(fb.FBCommand):
 
   def run(self, arguments, options):
     control = arguments[0]
-    targets = fb.evaluateObjectExpression('[[{control} allTargets] allObjects]'.format(control=control))
-    targetCount = fb.evaluateIntegerExpression('[{targets} count]'.format(targets=targets))
-
-    for index in range(0, targetCount):
-      target = fb.evaluateObjectExpression('[{targets} objectAtIndex:{index}]'.format(targets=targets, index=index))
-      actions = fb.evaluateObjectExpression('[{control} actionsForTarget:{target} forControlEvent:0]'.format(control=control, target=target))
+    (targets, error), (targetCount, countError) = fb.evaluateMany([
+      ('[[{control} allTargets] allObjects]'.format(control=control), 'pointer'),
+      ('[[[{control} allTargets] allObjects] count]'.format(control=control), 'int'),
+    ])
+    if error or countError:
+      print error or countError
+      return
 
-      targetDescription = fb.evaluateExpressionValue('(id){target}'.format(target=target)).GetObjectDescription()
-      actionsDescription = fb.evaluateExpressionValue('(id)[{actions} componentsJoinedByString:@", "]'.format(actions=actions)).GetObjectDescription()
+    descriptions = fb.evaluateMany([item for index in range(0, targetCount or 0) for item in [
+      ('[(id){targets} objectAtIndex:{index}]'.format(targets=targets, index=index), 'object'),
+      ('[[{control} actionsForTarget:[(id){targets} objectAtIndex:{index}] forControlEvent:0] componentsJoinedByString:@", "]'.format(control=control, targets=targets, index=index), 'object'),
+    ]])
 
-      print '{target}: {actions}'.format(target=targetDescription, actions=actionsDescription)
+    for index in range(0, len(descriptions), 2):
+      (targetDescription, targetError), (actionsDescription, actionsError) = descriptions[index:index + 2]
+      print '{target}: {actions}'.format(target=targetDescription or targetError, actions=actionsDescription or actionsError)
 
 class FBPrintJSON(fb.FBCommand):
 
@@ -488,7 +500,7 @@ class FBPrintJSON(fb.FBCommand):
     objectToPrint = arguments[0]
     pretty = 1 if options.plain is None else 0
     jsonData = fb.evaluateObjectExpression('[NSJSONSerialization dataWithJSONObject:(id){} options:{} error:nil]'.format(objectToPrint, pretty))
-    jsonString = fb.evaluateExpressionValue('(NSString*)[[NSString alloc] initWithData:(id){} encoding:4]'.format(jsonData)).GetObjectDescription()
+    jsonString = fb.evaluateExpressionValue('(NSString*)[[[NSString alloc] initWithData:(id){} encoding:4] autorelease]'.format(jsonData)).GetObjectDescription()
 
     print jsonString
 
@@ -513,25 +525,29 @@ class FBPrintAsCurl(fb.FBCommand):
   def run(self, arguments, options):
     request = arguments[0]
     HTTPHeaderSring = ''
-    HTTPMethod = fb.evaluateExpressionValue('(id)[{} HTTPMethod]'.format(request)).GetObjectDescription()
-    URL = fb.evaluateExpressionValue('(id)[{} URL]'.format(request)).GetObjectDescription()
-    timeout = fb.evaluateExpression('(NSTimeInterval)[{} timeoutInterval]'.format(request))
-    HTTPHeaders = fb.evaluateObjectExpression('(id)[{} allHTTPHeaderFields]'.format(request))
-    HTTPHeadersCount = fb.evaluateIntegerExpression('[{} count]'.format(HTTPHeaders))
-    allHTTPKeys = fb.evaluateObjectExpression('[{} allKeys]'.format(HTTPHeaders))
-    for index in range(0, HTTPHeadersCount):
-        key = fb.evaluateObjectExpression('[{} objectAtIndex:{}]'.format(allHTTPKeys, index))
-        keyDescription = fb.evaluateExpressionValue('(id){}'.format(key)).GetObjectDescription()
-        value = fb.evaluateExpressionValue('(id)[(id){} objectForKey:{}]'.format(HTTPHeaders, key)).GetObjectDescription()
+    results = fb.evaluateMany([
+      ('[{} HTTPMethod]'.format(request), 'object'),
+      ('[{} URL]'.format(request), 'object'),
+      ('(NSTimeInterval)[{} timeoutInterval]'.format(request), 'double'),
+      ('[{} allHTTPHeaderFields]'.format(request), 'json'),
+      ('[{} HTTPBody]'.format(request), 'pointer'),
+      ('[[{} HTTPBody] length]'.format(request), 'unsigned'),
+    ])
+    for value, error in results:
+      if error:
+        print error
+        return False
+    HTTPMethod, URL, timeout, HTTPHeaders, HTTPData, HTTPDataLength = [value for value, error in results]
+    timeout = '{:g}'.format(timeout)
+    for key, value in (HTTPHeaders or {}).iteritems():
         if len(HTTPHeaderSring) > 0:
             HTTPHeaderSring += ' '
-        HTTPHeaderSring += '-H "{}: {}"'.format(keyDescription, value)
-    HTTPData = fb.evaluateObjectExpression('[{} HTTPBody]'.format(request))
+        HTTPHeaderSring += u'-H "{}: {}"'.format(key, value).encode('utf-8')
     dataFile = None
     dataAsString = None
-    if fb.evaluateIntegerExpression('[{} length]'.format(HTTPData)) > 0:
+    if HTTPDataLength > 0:
         if options.embed:
-          if fb.evaluateIntegerExpression('[{} respondsToSelector:@selector(base64EncodedStringWithOptions:)]'.format(HTTPData)):
+          if capabilities.capabilities().hasBase64Encoding:
             dataAsString = fb.evaluateExpressionValue('(id)[(id){} base64EncodedStringWithOptions:0]'.format(HTTPData)).GetObjectDescription()
           else :
             print 'This version of OS doesn\'t supports base64 data encoding'
@@ -589,4 +605,4 @@ class FBPrintObjectInObjc(fb.FBCommand):
 
   def run(self, arguments, options):
     expression = arguments[0]
-    lldb.debugger.HandleCommand('expression -O -l ObjC++ -- ' + expression)
+    fb.handleCommand('expression -O -l ObjC++ -- ' + expression)
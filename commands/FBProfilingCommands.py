@@ -0,0 +1,213 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+import os
+import time
+
+import lldb
+import fblldb
+import fblldbbase as fb
+import fblldbprofiler as profiler
+import fblldbviewsnapshot as viewSnapshot
+
+def lldbcommands():
+  return [
+    FBProfileCommand(),
+    FBExpressionStatisticsCommand(),
+    FBTraceCommand(),
+    FBLeakReportCommand(),
+    FBTimeBudgetCommand(),
+  ]
+
+class FBProfileCommand(fb.FBCommand):
+  def name(self):
+    return 'chiselprofile'
+
+  def description(self):
+    return 'Print where Chisel spent its time: loading each command module, eagerly or on first use, and running each command. Set CHISEL_PROFILE=1 before importing fblldb.py to include startup.'
+
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-e', long='--enable', arg='enable', boolean=True, default=False, help='Start profiling commands.'),
+      fb.FBCommandArgument(short='-d', long='--disable', arg='disable', boolean=True, default=False, help='Stop profiling commands.'),
+      fb.FBCommandArgument(short='-r', long='--reset', arg='reset', boolean=True, default=False, help='Discard everything recorded so far.'),
+    ]
+
+  def run(self, arguments, options):
+    if options.reset:
+      profiler.reset()
+      fb.resetExpressionCacheStatistics()
+      viewSnapshot.resetSnapshotCacheStatistics()
+      print 'Discarded the profile.'
+    if options.enable:
+      profiler.setEnabled(True)
+      print 'Profiling enabled.'
+    if options.disable:
+      profiler.setEnabled(False)
+      print 'Profiling disabled.'
+
+    if not (options.reset or options.enable or options.disable):
+      profiler.printReport()
+      printExpressionCacheStatistics()
+      printSnapshotCacheStatistics()
+      print ''
+      fblldb.lazyLoadReport()
+
+def printExpressionCacheStatistics():
+  if not fb.isExpressionCacheEnabled():
+    print '\nThe expression cache is disabled.'
+    return
+
+  stats = fb.expressionCacheStatistics()
+  lookups = stats['hits'] + stats['misses']
+  if lookups:
+    print '\nExpression cache: {} hits, {} misses ({:.0f}% hit rate), {} invalidations, {} entries.'.format(
+      stats['hits'], stats['misses'], 100.0 * stats['hits'] / lookups, stats['invalidations'], stats['size'])
+
+def printSnapshotCacheStatistics():
+  if not viewSnapshot.isSnapshotCacheEnabled():
+    print 'The snapshot cache is disabled.'
+    return
+
+  stats = viewSnapshot.snapshotCacheStatistics()
+  lookups = stats['hits'] + stats['misses']
+  if lookups:
+    print 'Snapshot cache: {} hits, {} misses ({:.0f}% hit rate), {} invalidations, {} entries.'.format(
+      stats['hits'], stats['misses'], 100.0 * stats['hits'] / lookups, stats['invalidations'], stats['size'])
+
+class FBExpressionStatisticsCommand(fb.FBCommand):
+  def name(self):
+    return 'chiselstats'
+
+  def description(self):
+    return 'Print how many expressions each command evaluated, how long they took and how many failed or timed out, followed by the most expensive expressions.'
+
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-n', long='--top', arg='top', type='int', default=10, help='The number of expressions to list.'),
+      fb.FBCommandArgument(short='-r', long='--reset', arg='reset', boolean=True, default=False, help='Discard the statistics collected so far.'),
+    ]
+
+  def run(self, arguments, options):
+    if options.reset:
+      profiler.resetExpressionStatistics()
+      print 'Discarded the expression statistics.'
+      return
+
+    profiler.printExpressionStatistics(int(options.top))
+
+class FBTraceCommand(fb.FBCommand):
+  def name(self):
+    return 'chiseltrace'
+
+  def description(self):
+    return 'Start recording a timeline of the Chisel commands you run, including every expression evaluation, memory read and LLDB command they make. Run `chiseltrace --stop` to write it to a file you can open in chrome://tracing or https://ui.perfetto.dev.'
+
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-o', long='--output', arg='output', type='string', default=None, help='Where to write the trace. Defaults to a new file in /tmp.'),
+      fb.FBCommandArgument(short='-s', long='--stop', arg='stop', boolean=True, default=False, help='Stop recording and write the trace.'),
+    ]
+
+  def run(self, arguments, options):
+    if options.stop:
+      if not profiler.isTracing():
+        print 'Not tracing. Start with `chiseltrace`.'
+        return
+      path, count = profiler.stopTracing()
+      print 'Wrote {} spans to {}'.format(count, path)
+      return
+
+    if profiler.isTracing():
+      print 'Already tracing. Stop with `chiseltrace --stop`.'
+      return
+
+    path = options.output or '/tmp/chisel-trace-{}.json'.format(time.strftime('%Y%m%d-%H%M%S'))
+    profiler.startTracing(os.path.abspath(os.path.expanduser(path)))
+    print 'Tracing. Run some commands, then `chiseltrace --stop`.'
+
+class FBLeakReportCommand(fb.FBCommand):
+  def name(self):
+    return 'chiselleaks'
+
+  def description(self):
+    return 'Report how much memory each command leaves allocated in the process. Once enabled, every command prints what it leaked; without options this prints the totals per command.'
+
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-e', long='--enable', arg='enable', boolean=True, default=False, help='Start measuring what each command leaks.'),
+      fb.FBCommandArgument(short='-d', long='--disable', arg='disable', boolean=True, default=False, help='Stop measuring.'),
+      fb.FBCommandArgument(short='-r', long='--reset', arg='reset', boolean=True, default=False, help='Discard the totals collected so far.'),
+    ]
+
+  def run(self, arguments, options):
+    if options.reset:
+      fb.resetLeakStatistics()
+      print 'Discarded the leak totals.'
+    if options.enable:
+      fb.setLeakReportEnabled(True)
+      print 'Leak reports enabled.'
+    if options.disable:
+      fb.setLeakReportEnabled(False)
+      print 'Leak reports disabled.'
+
+    if not (options.reset or options.enable or options.disable):
+      printLeakStatistics()
+
+def printLeakStatistics():
+  statistics = fb.leakStatistics()
+  if not statistics:
+    if fb.isLeakReportEnabled():
+      print 'No commands have been measured yet.'
+    else:
+      print 'Leak reports are disabled. Enable them with `chiselleaks --enable`, or set CHISEL_LEAK_REPORT=1.'
+    return
+
+  print 'Memory left allocated in the process by command (sorted by bytes):'
+  print '  {:<16} {:>6} {:>12} {:>10}'.format('command', 'calls', 'bytes', 'blocks')
+  for name, sample in sorted(statistics.items(), key=lambda item: item[1].bytes, reverse=True):
+    print '  {:<16} {:>6} {:>+12d} {:>+10d}'.format(name, sample.count, sample.bytes, sample.blocks)
+
+class FBTimeBudgetCommand(fb.FBCommand):
+  def name(self):
+    return 'chiselbudget'
+
+  def description(self):
+    return 'Set how long commands may run before they stop and summarize what they covered, or print the budgets if no time is given. A time of 0 removes the budget. Commands can always be stopped with Ctrl-C.'
+
+  def args(self):
+    return [ fb.FBCommandArgument(arg='seconds', type='float', help='The time budget in seconds.', default='__none__') ]
+
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-c', long='--command', arg='command', type='string', default=None, help='The command to set the budget of. Defaults to every command without a budget of its own.'),
+    ]
+
+  def run(self, arguments, options):
+    if arguments[0] == '__none__':
+      printTimeBudgets()
+      return
+
+    try:
+      seconds = float(arguments[0]) or None
+    except ValueError:
+      print 'Usage: chiselbudget [--command <command>] [<seconds>], where <seconds> is a number, e.g. 5 or 0.5.'
+      return
+    fb.setTimeBudget(seconds, options.command)
+    if options.command:
+      print '{} now stops after {:g}s.'.format(options.command, seconds) if seconds else '{} now uses the default time budget.'.format(options.command)
+    else:
+      print 'Commands now stop after {:g}s.'.format(seconds) if seconds else 'Commands have no time budget.'
+
+def printTimeBudgets():
+  budgets = fb.timeBudgets()
+  default = budgets.pop(None)
+  print 'Default: {}'.format('{:g}s'.format(default) if default else 'none')
+  for name, seconds in sorted(budgets.items()):
+    print '{}: {:g}s'.format(name, seconds)
@@ -12,6 +12,8 @@ import os
 import lldb
 import fblldbbase as fb
 import fblldbviewhelpers as viewHelpers
+import fblldbviewquery as viewQuery
+import fblldbviewsnapshot as viewSnapshot
 
 ACCESSIBILITY_ID = 0
 REPLACEMENT_TEXT = 1
@@ -38,18 +40,18 @@ class FBInputTexByAccessibilityIdCommand(fb.FBCommand):
       fb.FBCommandArgument(arg='replacementText', type='string', help='The text to set.')
     ]
 
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-r', long='--refresh', arg='refresh', boolean=True, default=False, help='Read the view hierarchy again, rather than reuse what an earlier command read since the process stopped.'),
+    ]
+
   def run(self, arguments, options):
-    self.findView(rootView(), arguments[ACCESSIBILITY_ID], arguments[REPLACEMENT_TEXT])
+    snapshot = viewSnapshot.snapshotView(rootView(), refresh=options.refresh)
+    if snapshot is None:
+      return
 
-  def findView(self, view, searchIdentifier, replacementText):
-    views = subviewsOfView(view)
-    for index in range(0, viewsCount(views)):
-        subview = subviewAtIndex(views, index)
-        self.findView(subview, searchIdentifier, replacementText)
-    else:
-      identifier = accessibilityIdentifier(view)
-      if isEqualToString(identifier, searchIdentifier):
-        setTextInView(view, replacementText)
+    for node in viewQuery.query(snapshot).identifier(arguments[ACCESSIBILITY_ID]):
+      setTextInView(node.expression(), arguments[REPLACEMENT_TEXT])
 
 
 class FBInputTexToFirstResponderCommand(fb.FBCommand):
@@ -64,41 +66,26 @@ class FBInputTexToFirstResponderCommand(fb.FBCommand):
       fb.FBCommandArgument(arg='inputText', type='string', help='The text to input.')
     ]
 
+  def options(self):
+    return [
+      fb.FBCommandArgument(short='-r', long='--refresh', arg='refresh', boolean=True, default=False, help='Read the view hierarchy again, rather than reuse what an earlier command read since the process stopped.'),
+    ]
+
   def run(self, arguments, options):
-    self.findFirstResponder(rootView(), arguments[INPUT_TEXT])
+    snapshot = viewSnapshot.snapshotView(rootView(), refresh=options.refresh)
+    if snapshot is None:
+      return
 
-  def findFirstResponder(self, view, replacementText):
-    views = subviewsOfView(view)
-    if isFirstResponder(view):
-        setTextInView(view, replacementText)
-    else:
-      for index in range(0, viewsCount(views)):
-          subview = subviewAtIndex(views, index)
-          self.findFirstResponder(subview, replacementText)
+    firstResponder = viewQuery.query(snapshot).firstResponder().first()
+    if firstResponder is not None:
+      setTextInView(firstResponder.expression(), arguments[INPUT_TEXT])
 
 
 # Some helpers
 def rootView():
-  return fb.evaluateObjectExpression('[[UIApplication sharedApplication] keyWindow]')
-
-def subviewsOfView(view):
-  return fb.evaluateObjectExpression('[%s subviews]' % view)
-
-def subviewAtIndex(views, index):
-  return fb.evaluateObjectExpression('[%s objectAtIndex:%i]' % (views, index))
-
-def viewsCount(views):
-  return int(fb.evaluateExpression('(int)[%s count]' % views))
-
-def accessibilityIdentifier(view):
-  return fb.evaluateObjectExpression('[%s accessibilityIdentifier]' % view)
-
-def isEqualToString(identifier, needle):
-  return fb.evaluateBooleanExpression('[%s isEqualToString:@"%s"]' % (identifier, needle))
+  return viewHelpers.keyWindow()
 
 def setTextInView(view, text):
   fb.evaluateObjectExpression('[%s setText:@"%s"]' % (view, text))
+  viewSnapshot.invalidateSnapshots()
   viewHelpers.flushCoreAnimationTransaction()
-
-def isFirstResponder(view):
-  return fb.evaluateBooleanExpression('[%s isFirstResponder]' % view)
@@ -35,11 +35,8 @@ def _showImage(commandForImage):
       raise
 
   imageDataAddress = fb.evaluateObjectExpression('UIImagePNGRepresentation((id)' + commandForImage + ')')
-  imageBytesStartAddress = fb.evaluateExpression('(void *)[(id)' + imageDataAddress + ' bytes]')
-  imageBytesLength = fb.evaluateExpression('(NSUInteger)[(id)' + imageDataAddress + ' length]')
-
-  address = int(imageBytesStartAddress, 16)
-  length = int(imageBytesLength)
+  address = fb.evaluatePointer('[(id)' + imageDataAddress + ' bytes]')
+  length = fb.evaluateUnsigned('[(id)' + imageDataAddress + ' length]')
 
   if not (address or length):
     print 'Could not get image data.'
@@ -47,7 +44,7 @@ def _showImage(commandForImage):
 
   process = lldb.debugger.GetSelectedTarget().GetProcess()
   error = lldb.SBError()
-  mem = process.ReadMemory(address, length, error)
+  mem = fb.readMemory(process, address, length, error)
 
   if error is not None and str(error) != 'success':
     print error
@@ -75,7 +72,7 @@ def _showColor(color):
     colorToUse = color
     isCF = _colorIsCGColorRef(color)
     if isCF:
-      colorToUse = '[[UIColor alloc] initWithCGColor:(CGColorRef){}]'.format(color)
+      colorToUse = '[[[UIColor alloc] initWithCGColor:(CGColorRef){}] autorelease]'.format(color)
     else:
       isCI = objectHelpers.isKindOfClass(color, 'CIColor')
       if isCI:
@@ -98,10 +95,7 @@ def _showColor(color):
 
 def _showLayer(layer):
   layer = '(' + layer + ')'
-  size = '((CGRect)[(id)' + layer + ' bounds]).size'
-
-  width = float(fb.evaluateExpression('(CGFloat)(' + size + '.width)'))
-  height = float(fb.evaluateExpression('(CGFloat)(' + size + '.height)'))
+  _, _, width, height = fb.evaluateRect('[(id)' + layer + ' bounds]')
   if width == 0.0 or height == 0.0:
     print 'Nothing to see here - the size of this element is {} x {}.'.format(width, height)
     return
@@ -132,7 +126,7 @@ def _dataIsImage(data):
 def _dataIsString(data):
   data = '(' + data + ')'
 
-  result = fb.evaluateExpressionValue('(NSString*)[[NSString alloc] initWithData:' + data + ' encoding:4]')
+  result = fb.evaluateExpressionValue('(NSString*)[[[NSString alloc] initWithData:' + data + ' encoding:4] autorelease]')
 
   if result.GetError() is not None and str(result.GetError()) != 'success':
     return False
@@ -158,7 +152,7 @@ def _visualize(target):
       if _dataIsImage(target):
         _showImage('(id)[UIImage imageWithData:' + target + ']')
       elif _dataIsString(target):
-        print fb.describeObject('[[NSString alloc] initWithData:' + target + ' encoding:4]')
+        print fb.describeObject('[[[NSString alloc] initWithData:' + target + ' encoding:4] autorelease]')
       else:
         print 'Data isn\'t an image and isn\'t a string.'
     else:
@@ -9,6 +9,8 @@
 
 import lldb
 import fblldbbase as fb
+import fblldbtraversal as traversal
+import fblldbtreerenderer as treeRenderer
 import re
 
 NOT_FOUND = 0xffffffff  # UINT32_MAX
@@ -64,7 +66,8 @@ class FBXCPrintTree(fb.FBCommand):
     return [
       fb.FBCommandArgument(arg='pointer', short='-p', long='--pointer', type='BOOL', boolean=True, default=False, help='Print pointers'),
       fb.FBCommandArgument(arg='trait', short='-t', long='--traits', type='BOOL', boolean=True, default=False, help='Print traits'),
-      fb.FBCommandArgument(arg='frame', short='-f', long='--frame', type='BOOL', boolean=True, default=False, help='Print frames')
+      fb.FBCommandArgument(arg='frame', short='-f', long='--frame', type='BOOL', boolean=True, default=False, help='Print frames'),
+      fb.FBCommandArgument(arg='output', short='-o', long='--output', type='string', default=None, help='Write the tree to this file instead of the console')
     ]
 
   def run(self, arguments, options):
@@ -78,14 +81,15 @@ class FBXCPrintTree(fb.FBCommand):
     """:type: lldb.SBValue"""
 
     # Get pointer value, so it will be working in Swift and Objective-C
-    element_pointer = int(element_sbvalue.GetValue(), 16)
+    element_pointer = element_sbvalue.GetValueAsUnsigned()
 
     # Get XCElementSnapshot object
     snapshot = take_snapshot(element_pointer)
 
-    # Print tree for snapshot element
+    # Print tree for snapshot element, each element as soon as it's read
     snapshot_object = XCElementSnapshot(snapshot, language=language)
-    print snapshot_object.tree().hierarchy_text(pointer=options.pointer, trait=options.trait, frame=options.frame)
+    with treeRenderer.openRenderer(options.output, indent=' | ') as renderer:
+      snapshot_object.render_tree(renderer, pointer=options.pointer, trait=options.trait, frame=options.frame)
 
 
 class FBXCPrintObject(fb.FBCommand):
@@ -109,7 +113,7 @@ class FBXCPrintObject(fb.FBCommand):
     """:type: lldb.SBValue"""
 
     # Get pointer value, so it will be working in Swift and Objective-C
-    element_pointer = int(element_sbvalue.GetValue(), 16)
+    element_pointer = element_sbvalue.GetValueAsUnsigned()
 
     # Get XCElementSnapshot object
     snapshot = take_snapshot(element_pointer)
@@ -134,7 +138,8 @@ class FBXCNoId(fb.FBCommand):
       fb.FBCommandArgument(arg='status_bar', short='-s', long='--status-bar', type='BOOL', boolean=True, default=False, help='Print status bar items'),
       fb.FBCommandArgument(arg='pointer', short='-p', long='--pointer', type='BOOL', boolean=True, default=False, help='Print pointers'),
       fb.FBCommandArgument(arg='trait', short='-t', long='--traits', type='BOOL', boolean=True, default=False, help='Print traits'),
-      fb.FBCommandArgument(arg='frame', short='-f', long='--frame', type='BOOL', boolean=True, default=False, help='Print frames')
+      fb.FBCommandArgument(arg='frame', short='-f', long='--frame', type='BOOL', boolean=True, default=False, help='Print frames'),
+      fb.FBCommandArgument(arg='output', short='-o', long='--output', type='string', default=None, help='Write the tree to this file instead of the console')
     ]
 
   def run(self, arguments, options):
@@ -148,7 +153,7 @@ class FBXCNoId(fb.FBCommand):
     """:type: lldb.SBValue"""
 
     # Get pointer value, so it will be working in Swift and Objective-C
-    element_pointer = int(element_sbvalue.GetValue(), 16)
+    element_pointer = element_sbvalue.GetValueAsUnsigned()
 
     # Get XCElementSnapshot object
     snapshot = take_snapshot(element_pointer)
@@ -157,7 +162,8 @@ class FBXCNoId(fb.FBCommand):
     snapshot_object = XCElementSnapshot(snapshot, language=language)
     elements = snapshot_object.find_missing_identifiers(status_bar=options.status_bar)
     if elements is not None:
-      print elements.hierarchy_text(pointer=options.pointer, trait=options.trait, frame=options.frame)
+      with treeRenderer.openRenderer(options.output, indent=' | ') as renderer:
+        elements.render(renderer, pointer=options.pointer, trait=options.trait, frame=options.frame)
     else:
       print "Couldn't found elements without identifier"
 
@@ -209,10 +215,19 @@ class _ElementList(object):
     :return: String representation of the hierarchy of elements
     :rtype: str
     """
-    s = self.text(pointer=pointer, trait=trait, frame=frame, indent=indent)
-    for e in self.children:
-      s += e.hierarchy_text(pointer=pointer, trait=trait, frame=frame, indent=indent+1)
-    return s
+    return treeRenderer.renderToString(lambda renderer: self.render(renderer, pointer=pointer, trait=trait, frame=frame, indent=indent), indent=' | ')
+
+  def render(self, renderer, pointer=False, trait=False, frame=False, indent=0):
+    """
+    Writes the hierarchy of elements with renderer, line by line
+    
+    :param fblldbtreerenderer.FBTreeRenderer renderer: Renderer to write with
+    :param bool pointer: Print pointers
+    :param bool trait: Print traits
+    :param bool frame: Print frames
+    :param int indent: Indention
+    """
+    renderer.render(self, lambda e: (e.element.summary(pointer=pointer, trait=trait, frame=frame), e.children), depth=indent)
 
 
 class XCElementSnapshot(object):
@@ -269,6 +284,14 @@ class XCElementSnapshot(object):
     self._horizontalSizeClass = None
     self._verticalSizeClass = None
 
+  @property
+  def pointer_value(self):
+    """
+    :return: XCElementSnapshot pointer
+    :rtype: int
+    """
+    return self.element.GetValueAsUnsigned()
+
   @property
   def is_missing_identifier(self):
     """
@@ -951,7 +974,7 @@ class XCElementSnapshot(object):
     """
     type_text = self.type_summary
     if pointer:
-      type_text += " {:#x}".format(int(self.element_value, 16))
+      type_text += " {:#x}".format(self.pointer_value)
     if trait:
       type_text += " traits: {}({:#x})".format(self.traits_summary, self.traits_value)
 
@@ -982,7 +1005,7 @@ class XCElementSnapshot(object):
     :rtype: str
     """
     texts = list()
-    texts.append("Pointer: {:#x}".format(int(self.element_value, 16)))
+    texts.append("Pointer: {:#x}".format(self.element.GetValueAsUnsigned()))
     texts.append("Type: {}".format(self.type_summary))
     texts.append("Depth: {}".format(self.depth_value))
     texts.append("Traits: {} ({:#x})".format(self.traits_summary, self.traits_value))
@@ -1019,9 +1042,25 @@ class XCElementSnapshot(object):
     :return: Elements hierarchy
     :rtype: _ElementList
     """
+    fb.visitedNodes()
     children = [XCElementSnapshot(e, self.language).tree() for e in self.children_list]
     return _ElementList(self, children)
 
+  def render_tree(self, renderer, pointer=False, trait=False, frame=False):
+    """
+    Writes the tree of elements in hierarchy with renderer. The elements are read in the process
+    a chunk at a time, and each chunk is written as soon as it's read
+    
+    :param fblldbtreerenderer.FBTreeRenderer renderer: Renderer to write with
+    :param bool pointer: Print pointers
+    :param bool trait: Print traits
+    :param bool frame: Print frames
+    """
+    for chunk in traversal.walk("xcElementSnapshots", _element_walker, self.pointer_value):
+      for record in chunk.nodes:
+        element = XCElementSnapshotRecord(record, self.language)
+        renderer.node(element.summary(pointer=pointer, trait=trait, frame=frame), element.tree_depth)
+
   def find_missing_identifiers(self, status_bar):
     """
     Find element which has a label but doesn't have an identifier
@@ -1030,6 +1069,7 @@ class XCElementSnapshot(object):
     :return: Hierarchy structure with items which has a label but doesn't have an identifier
     :rtype: _ElementList | None
     """
+    fb.visitedNodes()
     # Do not print status bar items
     if status_bar is not True and self.type_value == XCUIElementType.StatusBar:
       return None
@@ -1077,6 +1117,103 @@ class XCElementSnapshot(object):
     return UIUserInterfaceSizeClass.name_for_value(value)
 
 
+# Each record is [depth, pointer, type, traits, frame (4), identifier, value, placeholderValue,
+# label, title, enabled, selected, isMainWindow, hasKeyboardFocus, hasFocus].
+_element_walker = traversal.walkerDeclaration(prologue="""
+  id (^string)(id) = ^id (id value) {
+    if (value == nil) {
+      return (id)@"";
+    }
+    return (BOOL)[value isKindOfClass:(Class)[NSString class]] ? value : (id)[value description];
+  };
+""", visit="""
+    CGRect frame = (CGRect)[node frame];
+    [nodes addObject:@[
+      @(depth), @((unsigned long long)(uintptr_t)node),
+      @((unsigned long long)[node elementType]), @((unsigned long long)[node traits]),
+      @((double)frame.origin.x), @((double)frame.origin.y), @((double)frame.size.width), @((double)frame.size.height),
+      string((id)[node identifier]), string((id)[node value]), string((id)[node placeholderValue]),
+      string((id)[node label]), string((id)[node title]),
+      (id)[node valueForKey:@"enabled"], (id)[node valueForKey:@"selected"], (id)[node valueForKey:@"isMainWindow"],
+      (id)[node valueForKey:@"hasKeyboardFocus"], (id)[node valueForKey:@"hasFocus"]
+    ]];
+    children = (NSArray *)[node children];
+""")
+
+
+class XCElementSnapshotRecord(XCElementSnapshot):
+  """
+  XCElementSnapshot read by the xtree walker, with the values summary() needs
+
+  :param int tree_depth: Depth below the root of the walk
+  :param list record: Values read by the walker
+  """
+  def __init__(self, record, language):
+    """
+    :param list record: Values read by the walker
+    :param language: Project language
+    """
+    self.language = language
+    self.tree_depth = record[0]
+    self.record = record
+
+  @property
+  def pointer_value(self):
+    return self.record[1]
+
+  @property
+  def type_value(self):
+    return int(self.record[2])
+
+  @property
+  def traits_value(self):
+    return int(self.record[3])
+
+  @property
+  def frame_summary(self):
+    return "{{{{{}, {}}}, {{{}, {}}}}}".format(*[float(value) for value in self.record[4:8]])
+
+  @property
+  def identifier_value(self):
+    return self.record[8].encode("utf-8")
+
+  @property
+  def value_value(self):
+    return self.record[9].encode("utf-8")
+
+  @property
+  def placeholder_value(self):
+    return self.record[10].encode("utf-8")
+
+  @property
+  def label_value(self):
+    return self.record[11].encode("utf-8")
+
+  @property
+  def title_value(self):
+    return self.record[12].encode("utf-8")
+
+  @property
+  def enabled_value(self):
+    return bool(self.record[13])
+
+  @property
+  def selected_value(self):
+    return bool(self.record[14])
+
+  @property
+  def is_main_window_value(self):
+    return bool(self.record[15])
+
+  @property
+  def keyboard_focus_value(self):
+    return bool(self.record[16])
+
+  @property
+  def focus_value(self):
+    return bool(self.record[17])
+
+
 class XCUIElementType(object):
   """
   Represents all XCUIElementType types
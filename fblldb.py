@@ -9,13 +9,21 @@
 
 import lldb
 
+import ast
+import hashlib
 import imp
+import json
+import marshal
 import os
 import shlex
+import struct
+import sys
+import time
 
-from optparse import OptionParser
+from optparse import OptionParser, Values
 
 import fblldbbase as fb
+import fblldbprofiler as profiler
 
 def __lldb_init_module(debugger, dict):
   filePath = os.path.realpath(__file__)
@@ -24,21 +32,87 @@ def __lldb_init_module(debugger, dict):
   commandsDirectory = os.path.join(lldbHelperDir, 'commands')
   loadCommandsInDirectory(commandsDirectory)
 
-def loadCommandsInDirectory(commandsDirectory):
+# Lazy loading registers a stub for every command described by the module's
+# manifest and only imports the module the first time one of its commands runs.
+# Enable it for the builtin commands with:
+#   script os.environ['CHISEL_LAZY_LOAD'] = '1'
+# before `command script import fblldb.py`, or per directory with:
+#   script fblldb.loadCommandsInDirectory('/magical/commands/', lazy=True)
+# A lazy argument wins over CHISEL_LAZY_LOAD, which only sets the default.
+def isLazyLoadingEnabled():
+  return os.getenv('CHISEL_LAZY_LOAD', '0') not in ('', '0')
+
+_lazyModules = {}
+_lazyFunctions = {}
+_lazyLoadStatistics = {
+  'registrationTime': 0.0,
+  'commandCount': 0,
+  'deferredModules': [],
+  'loadTimes': {},
+  'estimatedLoadTimes': {},
+}
+
+def loadCommandsInDirectory(commandsDirectory, lazy=None):
+  if lazy is None:
+    lazy = isLazyLoadingEnabled()
+
+  manifestCache = manifestCacheForDirectory(commandsDirectory)
+  registrations = []
+  lazyRegistrations = []
+
   for file in os.listdir(commandsDirectory):
     fileName, fileExtension = os.path.splitext(file)
     if fileExtension == '.py':
-      module = imp.load_source(fileName, os.path.join(commandsDirectory, file))
+      path = os.path.join(commandsDirectory, file)
+
+      if lazy:
+        startTime = time.time()
+        with profiler.startupPhase('manifest', fileName):
+          entry = manifestCache.entryForFile(path)
+          if entry is None:
+            manifest = commandManifestForFile(path)
+            if manifest is not None:
+              entry = manifestCache.update(path, manifest)
+
+        if entry is not None and entry['commands'] is not None and not entry['hasInit']:
+          _lazyLoadStatistics['estimatedLoadTimes'][path] = entry['loadTime']
+          loadLazyCommands(entry['commands'], commandsDirectory, fileName, fileExtension, lazyRegistrations)
+          _lazyLoadStatistics['registrationTime'] += time.time() - startTime
+          continue
+
+      startTime = time.time()
+      with profiler.startupPhase('import', fileName):
+        module = loadModuleFromSource(fileName, path)
 
       if hasattr(module, 'lldbinit'):
-        module.lldbinit()
+        with profiler.startupPhase('lldbinit', fileName):
+          module.lldbinit()
+
+      with profiler.startupPhase('lldbcommands', fileName):
+        commands = module.lldbcommands() if hasattr(module, 'lldbcommands') else []
+      loadTime = time.time() - startTime
+      # Only files that changed need their entries rebuilt, and rewritten.
+      entry = manifestCache.entryForFile(path)
+      if entry is not None:
+        entry['loadTime'] = loadTime
+      else:
+        manifestCache.update(path, [manifestEntryForCommand(command) for command in commands], hasattr(module, 'lldbinit'), loadTime)
 
       if hasattr(module, 'lldbcommands'):
         module._loadedFunctions = {}
-        for command in module.lldbcommands():
-          loadCommand(module, command, commandsDirectory, fileName, fileExtension)
+        for command in commands:
+          loadCommand(module, command, commandsDirectory, fileName, fileExtension, registrations)
+
+  with profiler.startupPhase('registration', commandsDirectory):
+    registerCommands(registrations)
 
-def loadCommand(module, command, directory, filename, extension):
+    startTime = time.time()
+    registerCommands(lazyRegistrations)
+    _lazyLoadStatistics['registrationTime'] += time.time() - startTime
+
+  manifestCache.save()
+
+def loadCommand(module, command, directory, filename, extension, registrations=None):
   func = makeRunCommand(command, os.path.join(directory, filename + extension))
   name = command.name()
   helpText = command.description().splitlines()[0] # first line of description
@@ -47,53 +121,544 @@ def loadCommand(module, command, directory, filename, extension):
 
   module._loadedFunctions[key] = func
 
-  functionName = '__' + key
+  if registrations is None:
+    registerCommands([(key, func, name, helpText)])
+  else:
+    registrations.append((key, func, name, helpText))
+
+def loadLazyCommands(manifest, directory, filename, extension, registrations):
+  path = os.path.join(directory, filename + extension)
+  _lazyLoadStatistics['deferredModules'].append(path)
+
+  for entry in manifest:
+    func = makeLazyRunCommand(entry, directory, filename, extension)
+    name = entry['name']
+    helpText = (entry['description'].splitlines() or [''])[0] # first line of description
+
+    key = filename + '_' + name
+
+    _lazyFunctions[key] = func
+
+    registrations.append((key, func, name, helpText))
+    _lazyLoadStatistics['commandCount'] += 1
+
+# Command functions are attributes of this module, so LLDB can resolve them by
+# their dotted name (e.g. fblldb._commandFunctions.FBPrintCommands_pviews) and
+# registering a command takes a single `command script add`, sent straight to
+# the command interpreter.
+_commandFunctions = imp.new_module(__name__ + '._commandFunctions')
+_legacyBindings = {}
+_useLegacyRegistration = False
+
+def registerCommands(registrations):
+  global _useLegacyRegistration
+
+  if not registrations:
+    return
+
+  interpreter = lldb.debugger.GetCommandInterpreter()
+
+  if not _useLegacyRegistration:
+    for index, (key, func, name, helpText) in enumerate(registrations):
+      setattr(_commandFunctions, key, func)
+
+      result = lldb.SBCommandReturnObject()
+      interpreter.HandleCommand(_commandScriptAddCommand(name, helpText, __name__ + '._commandFunctions.' + key), result)
+      if not result.Succeeded() or result.GetError():
+        # Older versions of LLDB can't resolve dotted function names. Register
+        # this command and the ones that follow it the old way.
+        _useLegacyRegistration = True
+        if result.Succeeded():
+          interpreter.HandleCommand('command script delete ' + name, lldb.SBCommandReturnObject())
+        registrations = registrations[index:]
+        break
+    else:
+      return
+
+  # Bind all the functions in the script interpreter's globals with a single
+  # `script` invocation, then add a command for each of them.
+  for key, func, name, helpText in registrations:
+    _legacyBindings['__' + key] = func
+  lldb.debugger.HandleCommand('script globals().update(sys.modules[\'' + __name__ + '\']._legacyBindings)')
+  _legacyBindings.clear()
+
+  for key, func, name, helpText in registrations:
+    lldb.debugger.HandleCommand(_commandScriptAddCommand(name, helpText, '__' + key))
 
-  lldb.debugger.HandleCommand('script ' + functionName + ' = sys.modules[\'' + module.__name__ + '\']._loadedFunctions[\'' + key + '\']')
-  lldb.debugger.HandleCommand('command script add --help "{help}" --function {function} {name}'.format(
+def _commandScriptAddCommand(name, helpText, functionName):
+  return 'command script add --help "{help}" --function {function} {name}'.format(
     help=helpText.replace('"', '\\"'), # escape quotes
     function=functionName,
-    name=name))
+    name=name)
+
+def makeLazyRunCommand(entry, directory, filename, extension):
+  return FBLazyRunCommand(entry, directory, filename, extension)
+
+# Stands in for a command whose module hasn't been imported yet. The help text
+# comes from the manifest, so `help <command>` doesn't import the module either.
+class FBLazyRunCommand(object):
+  def __init__(self, entry, directory, filename, extension):
+    self.entry = entry
+    self.directory = directory
+    self.filename = filename
+    self.extension = extension
+    self._help = None
+
+  @property
+  def __doc__(self):
+    if self._help is None:
+      path = os.path.join(self.directory, self.filename + self.extension)
+      self._help = helpForCommand(FBManifestCommand(self.entry), path, self.entry['className'])
+    return self._help
+
+  def __call__(self, debugger, input, result, dict):
+    module = loadLazyModule(self.directory, self.filename, self.extension)
+    func = getattr(module, '_loadedFunctions', {}).get(self.filename + '_' + self.entry['name'])
+    if func is None:
+      print 'Whoops! ' + os.path.join(self.directory, self.filename + self.extension) + ' no longer provides the ' + self.entry['name'] + ' command. Re-import fblldb.py to refresh the command list.'
+      return
+    func(debugger, input, result, dict)
+
+def loadLazyModule(directory, filename, extension):
+  path = os.path.join(directory, filename + extension)
+  module = _lazyModules.get(path)
+  if module is None:
+    startTime = time.time()
+    with profiler.startupPhase('lazy import', filename):
+      module = loadModuleFromSource(filename, path)
+
+      if hasattr(module, 'lldbinit'):
+        module.lldbinit()
+
+      commands = module.lldbcommands() if hasattr(module, 'lldbcommands') else []
+
+    module._loadedFunctions = {}
+    for command in commands:
+      key = filename + '_' + command.name()
+      module._loadedFunctions[key] = makeRunCommand(command, path)
+
+    _lazyModules[path] = module
+    _lazyLoadStatistics['loadTimes'][path] = time.time() - startTime
+
+    manifestCache = manifestCacheForDirectory(directory)
+    manifestCache.recordLoadTime(path, _lazyLoadStatistics['loadTimes'][path])
+    manifestCache.save()
+  return module
+
+def lazyLoadReport():
+  stats = _lazyLoadStatistics
+  deferred = stats['deferredModules']
+  if not deferred:
+    print 'Lazy loading is not enabled; all commands were loaded at startup.'
+    return
+
+  loadTimes = stats['loadTimes']
+  print 'Registered {} lazy commands from {} modules in {:.1f}ms.'.format(stats['commandCount'], len(deferred), stats['registrationTime'] * 1000)
+
+  loaded = [(loadTimes[path], path) for path in deferred if path in loadTimes]
+  if loaded:
+    print '{} of {} modules were loaded on first use, taking {:.1f}ms off the startup path:'.format(len(loaded), len(deferred), sum(t for t, _ in loaded) * 1000)
+    for loadTime, path in sorted(loaded, reverse=True):
+      print '  {:8.1f}ms  {}'.format(loadTime * 1000, os.path.basename(path))
+
+  notLoaded = [path for path in deferred if path not in loadTimes]
+  if notLoaded:
+    estimates = [stats['estimatedLoadTimes'].get(path) for path in notLoaded]
+    estimates = [estimate for estimate in estimates if estimate is not None]
+    if estimates:
+      print '{} modules have not been needed yet, saving an estimated {:.1f}ms (based on {} previous loads).'.format(len(notLoaded), sum(estimates) * 1000, len(estimates))
+    else:
+      print '{} modules have not been needed yet; their import cost was skipped entirely.'.format(len(notLoaded))
+
+def manifestEntryForCommand(command):
+  return {
+    'name': command.name(),
+    'className': command.__class__.__name__,
+    'description': command.description(),
+    'options': [_manifestEntryForArgument(option) for option in command.options()],
+    'args': [_manifestEntryForArgument(arg) for arg in command.args()],
+  }
+
+def _manifestEntryForArgument(argument):
+  return {
+    'short': argument.shortName,
+    'long': argument.longName,
+    'arg': argument.argName,
+    'type': argument.argType,
+    'help': argument.help,
+    'default': argument.default,
+    'boolean': argument.boolean,
+  }
+
+# The manifest and bytecode caches live here. Override the location with:
+#   script os.environ['CHISEL_CACHE_PATH'] = '/path/to/cache'
+def chiselCacheDirectory():
+  return os.getenv('CHISEL_CACHE_PATH') or os.path.join(os.path.expanduser('~'), 'Library', 'Caches', 'Chisel')
+
+_manifestCaches = {}
+
+def manifestCacheForDirectory(directory):
+  directory = os.path.realpath(directory)
+  if directory not in _manifestCaches:
+    _manifestCaches[directory] = FBCommandManifestCache(directory)
+  return _manifestCaches[directory]
+
+# Persists the manifest of every module in a commands directory, so that the
+# commands of unchanged modules can be registered without importing or parsing
+# them. Entries are keyed on the file's mtime and size, falling back to a hash of
+# its contents when only the mtime changed (e.g. after a checkout).
+class FBCommandManifestCache:
+  version = 1
+
+  def __init__(self, directory):
+    self.directory = directory
+    self.path = os.path.join(chiselCacheDirectory(), 'manifest-' + _digest(directory) + '.json')
+    self.files = {}
+    self.dirty = False
+
+    try:
+      with open(self.path) as manifestFile:
+        contents = _utf8Strings(json.load(manifestFile))
+      if contents.get('version') == self.version:
+        self.files = contents['files']
+    except (IOError, ValueError, KeyError):
+      pass
+
+  def entryForFile(self, path):
+    entry = self.files.get(os.path.basename(path))
+    if entry is None:
+      return None
+
+    try:
+      stat = os.stat(path)
+    except OSError:
+      return None
+
+    if entry['size'] != stat.st_size:
+      return None
+    if entry['mtime'] != stat.st_mtime:
+      if entry['hash'] != _fileDigest(path):
+        return None
+      entry['mtime'] = stat.st_mtime
+      self.dirty = True
+    return entry
+
+  def update(self, path, commands, hasInit=False, loadTime=None):
+    stat = os.stat(path)
+    previousEntry = self.files.get(os.path.basename(path), {})
+
+    try:
+      json.dumps(commands)
+    except (TypeError, ValueError):
+      # A default value can't be persisted, so this module is always loaded eagerly.
+      commands = None
+
+    entry = {
+      'mtime': stat.st_mtime,
+      'size': stat.st_size,
+      'hash': _fileDigest(path),
+      'hasInit': hasInit,
+      'commands': commands,
+      'loadTime': loadTime if loadTime is not None else previousEntry.get('loadTime'),
+    }
+    self.files[os.path.basename(path)] = entry
+    self.dirty = True
+    return entry
+
+  def recordLoadTime(self, path, loadTime):
+    entry = self.files.get(os.path.basename(path))
+    if entry is not None:
+      entry['loadTime'] = loadTime
+      self.dirty = True
+
+  def save(self):
+    if not self.dirty:
+      return
+
+    for fileName in list(self.files):
+      if not os.path.exists(os.path.join(self.directory, fileName)):
+        del self.files[fileName]
+
+    _writeCacheFile(self.path, json.dumps({'version': self.version, 'directory': self.directory, 'files': self.files}))
+    self.dirty = False
+
+# Equivalent to imp.load_source, except that the compiled code is kept in the
+# cache directory so that unchanged modules aren't recompiled on every launch,
+# even when their directory isn't writable.
+def loadModuleFromSource(name, path):
+  code = compiledCodeForFile(path)
+
+  module = sys.modules.get(name)
+  isNewModule = module is None
+  if isNewModule:
+    module = imp.new_module(name)
+    sys.modules[name] = module
+  module.__file__ = path
+
+  try:
+    exec(code, module.__dict__)
+  except:
+    if isNewModule:
+      del sys.modules[name]
+    raise
+  return module
+
+def compiledCodeForFile(path):
+  path = os.path.realpath(path)
+  stat = os.stat(path)
+  header = imp.get_magic() + struct.pack('<dq', stat.st_mtime, stat.st_size)
+  cachePath = os.path.join(chiselCacheDirectory(), 'bytecode', os.path.splitext(os.path.basename(path))[0] + '-' + _digest(path) + '.pyc')
+
+  try:
+    with open(cachePath, 'rb') as cacheFile:
+      if cacheFile.read(len(header)) == header:
+        return marshal.load(cacheFile)
+  except (IOError, EOFError, ValueError, TypeError):
+    pass
+
+  with open(path, 'rb') as sourceFile:
+    code = compile(sourceFile.read(), path, 'exec', 0, True)
+  _writeCacheFile(cachePath, header + marshal.dumps(code))
+  return code
+
+def _writeCacheFile(path, data):
+  temporaryPath = '{}.{}.tmp'.format(path, os.getpid())
+  try:
+    if not os.path.isdir(os.path.dirname(path)):
+      os.makedirs(os.path.dirname(path))
+    with open(temporaryPath, 'wb') as cacheFile:
+      cacheFile.write(data)
+    os.rename(temporaryPath, path)
+  except (IOError, OSError):
+    pass
+
+def _digest(string):
+  return hashlib.sha1(string).hexdigest()[:16]
+
+def _fileDigest(path):
+  with open(path, 'rb') as sourceFile:
+    return hashlib.sha1(sourceFile.read()).hexdigest()
+
+# json hands back unicode strings, which don't mix with the str help text
+# and command strings everywhere else.
+def _utf8Strings(value):
+  if isinstance(value, dict):
+    return dict((_utf8Strings(key), _utf8Strings(item)) for key, item in value.items())
+  elif isinstance(value, list):
+    return [_utf8Strings(item) for item in value]
+  elif isinstance(value, unicode):
+    return value.encode('utf-8')
+  return value
+
+class FBManifestCommand(fb.FBCommand):
+  def __init__(self, entry):
+    self.entry = entry
+
+  def name(self):
+    return self.entry['name']
+
+  def options(self):
+    return [fb.FBCommandArgument(**option) for option in self.entry['options']]
+
+  def args(self):
+    return [fb.FBCommandArgument(**arg) for arg in self.entry['args']]
+
+  def description(self):
+    return self.entry['description']
+
+# Builds the manifest of the commands in a module by reading its source instead of
+# importing it. Returns None when the module can't be described statically (it has
+# an lldbinit() hook, or a command computes its name, help or arguments), in which
+# case it has to be loaded eagerly.
+def commandManifestForFile(path):
+  try:
+    with open(path) as sourceFile:
+      tree = ast.parse(sourceFile.read(), path)
+  except (IOError, SyntaxError):
+    return None
+
+  classes = {}
+  commandsNode = None
+  for node in tree.body:
+    if isinstance(node, ast.FunctionDef) and node.name == 'lldbinit':
+      return None
+    elif isinstance(node, ast.FunctionDef) and node.name == 'lldbcommands':
+      commandsNode = _returnedNode(node)
+    elif isinstance(node, ast.ClassDef):
+      classes[node.name] = node
+
+  if not isinstance(commandsNode, ast.List):
+    return None
+
+  manifest = []
+  for call in commandsNode.elts:
+    if not isinstance(call, ast.Call) or call.args or call.keywords or not isinstance(call.func, ast.Name):
+      return None
+    entry = _manifestEntryForClass(classes.get(call.func.id))
+    if entry is None:
+      return None
+    manifest.append(entry)
+  return manifest
+
+_commandArgumentParameters = ['short', 'long', 'arg', 'type', 'help', 'default', 'boolean']
+
+class _NotLiteral(Exception):
+  pass
+
+def _manifestEntryForClass(classNode):
+  if classNode is None or len(classNode.bases) != 1 or _nameOfNode(classNode.bases[0]) != 'FBCommand':
+    return None
+
+  methods = dict((node.name, node) for node in classNode.body if isinstance(node, ast.FunctionDef))
+  if 'name' not in methods:
+    return None
+
+  try:
+    name = _literal(_returnedNode(methods['name']))
+    description = _literal(_returnedNode(methods['description'])) if 'description' in methods else ''
+    options = _commandArguments(methods.get('options'))
+    args = _commandArguments(methods.get('args'))
+  except _NotLiteral:
+    return None
+
+  if not isinstance(name, basestring) or not isinstance(description, basestring):
+    return None
+
+  return {
+    'name': name,
+    'className': classNode.name,
+    'description': description,
+    'options': options,
+    'args': args,
+  }
+
+def _commandArguments(methodNode):
+  if methodNode is None:
+    return []
+
+  listNode = _returnedNode(methodNode)
+  if not isinstance(listNode, ast.List):
+    raise _NotLiteral()
+
+  arguments = []
+  for call in listNode.elts:
+    if not isinstance(call, ast.Call) or _nameOfNode(call.func) != 'FBCommandArgument':
+      raise _NotLiteral()
+    argument = {}
+    for index, value in enumerate(call.args):
+      argument[_commandArgumentParameters[index]] = _literal(value)
+    for keyword in call.keywords:
+      argument[keyword.arg] = _literal(keyword.value)
+    arguments.append(argument)
+  return arguments
+
+def _returnedNode(functionNode):
+  statements = [node for node in functionNode.body if not (isinstance(node, ast.Expr) and isinstance(node.value, ast.Str))]
+  if len(statements) != 1 or not isinstance(statements[0], ast.Return):
+    return None
+  return statements[0].value
+
+def _nameOfNode(node):
+  if isinstance(node, ast.Name):
+    return node.id
+  elif isinstance(node, ast.Attribute):
+    return node.attr
+  return None
+
+def _literal(node):
+  if node is None:
+    raise _NotLiteral()
+  try:
+    return ast.literal_eval(node)
+  except (ValueError, TypeError, SyntaxError):
+    raise _NotLiteral()
 
 def makeRunCommand(command, filename):
-  def runCommand(debugger, input, result, dict):
-    splitInput = shlex.split(input)
-
-    # OptionParser will throw in the case where you want just one big long argument and no
-    # options and you enter something that starts with '-' in the argument. e.g.:
-    #     somecommand -[SomeClass someSelector:]
-    # This solves that problem by prepending a '--' so that OptionParser does the right
-    # thing.
-    options = command.options()
-    if len(options) == 0:
-      if '--' not in splitInput:
-        splitInput.insert(0, '--')
-
-    parser = optionParserForCommand(command)
-    (options, args) = parser.parse_args(splitInput)
-
-    # When there are more args than the command has declared, assume
-    # the initial args form an expression and combine them into a single arg.
-    if len(args) > len(command.args()):
-      overhead = len(args) - len(command.args())
-      head = args[:overhead + 1] # Take N+1 and reduce to 1.
-      args = [' '.join(head)] + args[-overhead:]
-
-    if validateArgsForCommand(args, command):
-      command.run(args, options)
-
-  runCommand.__doc__ = helpForCommand(command, filename)
-  return runCommand
-
-def validateArgsForCommand(args, command):
-  if len(args) < len(command.args()):
-    defaultArgs = [arg.default for arg in command.args()]
+  return FBRunCommand(command, filename)
+
+# The function LLDB calls for a command. Its option parser and help text are
+# built the first time they are needed and then reused, so running a command
+# repeatedly (e.g. from a breakpoint action) only pays for parsing its input.
+class FBRunCommand(object):
+  def __init__(self, command, filename):
+    self.command = command
+    self.filename = filename
+    self._args = None
+    self._options = None
+    self._parser = None
+    self._help = None
+    self._lastInput = None
+    self._lastSplitInput = None
+
+  # LLDB reads this the first time `help <command>` is run.
+  @property
+  def __doc__(self):
+    if self._help is None:
+      self._help = helpForCommand(self.command, self.filename)
+    return self._help
+
+  def args(self):
+    if self._args is None:
+      self._args = self.command.args()
+    return self._args
+
+  def options(self):
+    if self._options is None:
+      self._options = self.command.options()
+    return self._options
+
+  def parser(self):
+    if self._parser is None:
+      self._parser = optionParserForCommand(self.command)
+    return self._parser
+
+  def splitInput(self, input):
+    if input != self._lastInput:
+      self._lastSplitInput = shlex.split(input)
+      self._lastInput = input
+    return list(self._lastSplitInput)
+
+  def __call__(self, debugger, input, result, dict):
+    command = self.command
+    with fb.allocationReport(command.name()), profiler.commandExecution(command.name()), fb.interruptibleExecution(command.name()):
+      with profiler.commandPhase('parse'):
+        splitInput = self.splitInput(input)
+
+        if not self.options() and '--' not in splitInput:
+          # Nothing for OptionParser to do, even if an argument starts with '-'
+          # (e.g. somecommand -[SomeClass someSelector:]).
+          (options, args) = (Values(), splitInput)
+        else:
+          # OptionParser will throw in the case where you want just one big long argument and no
+          # options and you enter something that starts with '-' in the argument. The '--' already
+          # in the input makes OptionParser do the right thing.
+          (options, args) = self.parser().parse_args(splitInput)
+
+        # When there are more args than the command has declared, assume
+        # the initial args form an expression and combine them into a single arg.
+        commandArgs = self.args()
+        if len(args) > len(commandArgs):
+          overhead = len(args) - len(commandArgs)
+          head = args[:overhead + 1] # Take N+1 and reduce to 1.
+          args = [' '.join(head)] + args[-overhead:]
+
+        isValid = validateArgsForCommand(args, command, commandArgs)
+
+      if isValid:
+        command.run(args, options)
+
+def validateArgsForCommand(args, command, commandArgs=None):
+  if commandArgs is None:
+    commandArgs = command.args()
+
+  if len(args) < len(commandArgs):
+    defaultArgs = [arg.default for arg in commandArgs]
     defaultArgsToAppend = defaultArgs[len(args):]
 
     index = len(args)
     for defaultArg in defaultArgsToAppend:
       if not defaultArg:
-        arg = command.args()[index]
+        arg = commandArgs[index]
         print 'Whoops! You are missing the <' + arg.argName + '> argument.'
         print '\nUsage: ' + usageForCommand(command)
         return
@@ -115,7 +680,7 @@ def optionParserForCommand(command):
 
   return parser
 
-def helpForCommand(command, filename):
+def helpForCommand(command, filename, className=None):
   help = command.description()
 
   argSyntax = ''
@@ -152,7 +717,7 @@ def helpForCommand(command, filename):
 
   help += '\n\nSyntax: ' + command.name() + optionSyntax + argSyntax
 
-  help += '\n\nThis command is implemented as %s in %s.' % (command.__class__.__name__, filename)
+  help += '\n\nThis command is implemented as %s in %s.' % (className or command.__class__.__name__, filename)
 
   help += '\n\n(LLDB adds the next line, sorry...)'
 
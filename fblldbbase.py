@@ -8,7 +8,17 @@
 # of patent rights can be found in the PATENTS file in the same directory.
 
 import lldb
+import hashlib
 import json
+import os
+import string
+import struct
+import sys
+import time
+
+from contextlib import contextmanager
+
+import fblldbprofiler as profiler
 
 class FBCommandArgument:
   def __init__(self, short='', long='', arg='', type='', help='', default='', boolean=False):
@@ -36,10 +46,204 @@ class FBCommand:
   def run(self, arguments, option):
     pass
 
+# Results of expressions that are marked cacheable are reused until the process
+# resumes: the cache is scoped to the process's stop ID, which doesn't change when
+# expressions are evaluated. Only pass cacheable=True for queries without side
+# effects, e.g. objc_getClass(). Set CHISEL_EXPRESSION_CACHE=0 to disable it.
+_expressionCacheEnabled = os.getenv('CHISEL_EXPRESSION_CACHE', '1') not in ('', '0')
+_expressionCache = {}
+_expressionCacheScope = None
+_expressionCacheStatistics = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+def isExpressionCacheEnabled():
+  return _expressionCacheEnabled
+
+def setExpressionCacheEnabled(enabled):
+  global _expressionCacheEnabled
+  _expressionCacheEnabled = enabled
+  invalidateExpressionCache()
+
+# Call this after changing the state of the process, e.g. via evaluateEffect().
+def invalidateExpressionCache():
+  if _expressionCache:
+    _expressionCache.clear()
+    _expressionCacheStatistics['invalidations'] += 1
+  for hook in _invalidationHooks:
+    hook()
+
+# Functions called whenever the expression cache is invalidated, so that other
+# caches of what was read from the process, such as view snapshots, are
+# discarded along with it.
+_invalidationHooks = []
+
+def addInvalidationHook(hook):
+  if hook not in _invalidationHooks:
+    _invalidationHooks.append(hook)
+
+def expressionCacheStatistics():
+  return dict(_expressionCacheStatistics, size=len(_expressionCache))
+
+def resetExpressionCacheStatistics():
+  for key in _expressionCacheStatistics:
+    _expressionCacheStatistics[key] = 0
+
+def _expressionCacheKey(frame, expression, language):
+  global _expressionCacheScope
+
+  thread = frame.GetThread()
+  process = thread.GetProcess()
+  scope = (process.GetUniqueID(), process.GetStopID())
+  if scope != _expressionCacheScope:
+    invalidateExpressionCache()
+    _expressionCacheScope = scope
+
+  return (thread.GetThreadID(), frame.GetFrameID(), expression, language)
+
+# Chisel's evaluations keep the process and LLDB from growing over a long
+# session: results aren't kept as $N persistent variables, code that returns
+# its result with RETURN runs in an @autoreleasepool, and transfer buffers are
+# freed once they've been read. Set CHISEL_ALLOCATION_HYGIENE=0 to turn this off.
+_allocationHygieneEnabled = os.getenv('CHISEL_ALLOCATION_HYGIENE', '1') not in ('', '0')
+
+def isAllocationHygieneEnabled():
+  return _allocationHygieneEnabled
+
+def setAllocationHygieneEnabled(enabled):
+  global _allocationHygieneEnabled
+  _allocationHygieneEnabled = enabled
+
+# Long running commands can be stopped: they check for an LLDB interrupt request
+# (Ctrl-C) before each expression evaluation, and at each node a traversal
+# visits (see visitedNodes()). They also stop once they've run for longer than
+# their time budget, if they have one. While they run, they report their
+# progress every few seconds. When a command is stopped, what it printed so far
+# stands, and a summary of what it covered is printed after it.
+class FBCommandInterrupted(Exception):
+  def __init__(self, reason, partialResult=None):
+    Exception.__init__(self, reason)
+    self.reason = reason
+    self.partialResult = partialResult
+
+class FBCommandExecution:
+  def __init__(self, name, budget):
+    self.name = name
+    self.budget = budget
+    self.startTime = time.time()
+    self.lastProgressTime = self.startTime
+    self.nodes = 0
+    self.evaluations = 0
+    self.stopReason = None
+
+  def elapsed(self):
+    return time.time() - self.startTime
+
+_executions = []
+_progressInterval = 2.0
+
+def _defaultTimeBudget():
+  value = os.getenv('CHISEL_TIME_BUDGET', '0')
+  try:
+    seconds = float(value)
+  except ValueError:
+    print 'Ignoring CHISEL_TIME_BUDGET={}: it should be a number of seconds.'.format(value)
+    return None
+  return seconds if seconds > 0 else None
+
+# Time budgets in seconds, by command name; None applies to every command. The
+# default comes from CHISEL_TIME_BUDGET.
+_timeBudgets = {None: _defaultTimeBudget()}
+
+def timeBudget(name):
+  return _timeBudgets.get(name, _timeBudgets[None])
+
+def timeBudgets():
+  return dict(_timeBudgets)
+
+def setTimeBudget(seconds, name=None):
+  if seconds is None and name is not None:
+    _timeBudgets.pop(name, None)
+  else:
+    _timeBudgets[name] = seconds
+
+def currentExecution():
+  return _executions[0] if _executions else None
+
+@contextmanager
+def interruptibleExecution(name):
+  if _executions:
+    # A command run by another command shares its budget, and is stopped with
+    # it. The outermost command prints the summary.
+    try:
+      yield
+    except FBCommandInterrupted:
+      pass
+    return
+
+  execution = FBCommandExecution(name, timeBudget(name))
+  _executions.append(execution)
+  try:
+    yield
+  except (FBCommandInterrupted, KeyboardInterrupt) as exception:
+    execution.stopReason = execution.stopReason or getattr(exception, 'reason', 'interrupted')
+  finally:
+    _executions.pop()
+
+  if execution.stopReason:
+    print '{} stopped after {:.1f}s ({}): visited {} nodes with {} evaluations. The output above is partial.'.format(
+      name, execution.elapsed(), execution.stopReason, execution.nodes, execution.evaluations)
+
+def _interruptRequested():
+  debugger = lldb.debugger
+  if hasattr(debugger, 'InterruptRequested'):
+    return debugger.InterruptRequested()
+  interpreter = debugger.GetCommandInterpreter()
+  if hasattr(interpreter, 'WasInterrupted'):
+    return interpreter.WasInterrupted()
+  return False
+
+# Raises FBCommandInterrupted if the running command should stop, and reports
+# its progress when it's due.
+def checkInterrupted():
+  execution = currentExecution()
+  if execution is None:
+    return
+
+  if execution.stopReason is None:
+    if _interruptRequested():
+      execution.stopReason = 'interrupted'
+    elif execution.budget and execution.elapsed() > execution.budget:
+      execution.stopReason = 'time budget of {:g}s exceeded'.format(execution.budget)
+  if execution.stopReason:
+    raise FBCommandInterrupted(execution.stopReason)
+
+  now = time.time()
+  if now - execution.lastProgressTime >= _progressInterval:
+    execution.lastProgressTime = now
+    sys.stderr.write('{}: visited {} nodes with {} evaluations in {:.1f}s...\n'.format(
+      execution.name, execution.nodes, execution.evaluations, now - execution.startTime))
+
+# Traversals call this for each node they visit, so it's counted in the
+# progress reports, and so they can be stopped between nodes.
+def visitedNodes(count=1):
+  execution = currentExecution()
+  if execution is not None:
+    execution.nodes += count
+  checkInterrupted()
+
 # evaluates expression in Objective-C++ context, so it will work even for
 # Swift projects
-def evaluateExpressionValue(expression, printErrors=True, language=lldb.eLanguageTypeObjC_plus_plus):
+def evaluateExpressionValue(expression, printErrors=True, language=lldb.eLanguageTypeObjC_plus_plus, cacheable=False):
   frame = lldb.debugger.GetSelectedTarget().GetProcess().GetSelectedThread().GetSelectedFrame()
+
+  cacheKey = None
+  if cacheable and _expressionCacheEnabled:
+    cacheKey = _expressionCacheKey(frame, expression, language)
+    value = _expressionCache.get(cacheKey)
+    if value is not None:
+      _expressionCacheStatistics['hits'] += 1
+      return value
+    _expressionCacheStatistics['misses'] += 1
+
   options = lldb.SBExpressionOptions()
   options.SetLanguage(language)
 
@@ -55,19 +259,40 @@ def evaluateExpressionValue(expression, printErrors=True, language=lldb.eLanguag
   # Chisel commands are not multithreaded.
   options.SetTryAllThreads(False)
 
-  value = frame.EvaluateExpression(expression, options)
+  # Nothing refers to a result as $N later.
+  options.SetSuppressPersistentResult(_allocationHygieneEnabled)
+
+  value = evaluateExpressionInFrame(frame, expression, options)
   error = value.GetError()
 
+  if cacheKey is not None and error.Success():
+    _expressionCache[cacheKey] = value
+
   if printErrors and error.Fail():
-    # When evaluating a `void` expression, the returned value has an error code named kNoResult.
-    # This is not an error that should be printed. This follows what the built in `expression` command does.
-    # See: https://git.io/vwpjl (UserExpression.h)
-    kNoResult = 0x1001
     if error.GetError() != kNoResult:
       print error
 
   return value
 
+def _traceName(expression):
+  name = ' '.join(expression.split())
+  return name if len(name) <= 80 else name[:77] + '...'
+
+# Runs an LLDB command, like `lldb.debugger.HandleCommand`, and traces it.
+def handleCommand(command):
+  with profiler.traceSpan(command, 'lldb'):
+    lldb.debugger.HandleCommand(command)
+
+# Reads memory from the process, like `SBProcess.ReadMemory`, and traces it.
+def readMemory(process, address, size, error):
+  with profiler.traceSpan('ReadMemory', 'memory', address=hex(address), size=size):
+    return process.ReadMemory(address, size, error)
+
+# When evaluating a `void` expression, the returned value has an error code named kNoResult.
+# This is not an error that should be printed. This follows what the built in `expression` command does.
+# See: https://git.io/vwpjl (UserExpression.h)
+kNoResult = 0x1001
+
 def evaluateInputExpression(expression, printErrors=True):
   # HACK
   if expression.startswith('(id)'):
@@ -76,7 +301,7 @@ def evaluateInputExpression(expression, printErrors=True):
   frame = lldb.debugger.GetSelectedTarget().GetProcess().GetSelectedThread().GetSelectedFrame()
   options = lldb.SBExpressionOptions()
   options.SetTrapExceptions(False)
-  value = frame.EvaluateExpression(expression, options)
+  value = evaluateExpressionInFrame(frame, expression, options)
   error = value.GetError()
 
   if printErrors and error.Fail():
@@ -84,35 +309,115 @@ def evaluateInputExpression(expression, printErrors=True):
 
   return value.GetValue()
 
-def evaluateIntegerExpression(expression, printErrors=True):
-  output = evaluateExpression('(int)(' + expression + ')', printErrors).replace('\'', '')
-  if output.startswith('\\x'): # Booleans may display as \x01 (Hex)
-    output = output[2:]
-  elif output.startswith('\\'): # Or as \0 (Dec)
-    output = output[1:]
-  return int(output, 16)
+# All of Chisel's expression evaluations go through here, so they are counted by
+# `chiselstats`. Use it instead of calling frame.EvaluateExpression directly.
+def evaluateExpressionInFrame(frame, expression, options=None):
+  checkInterrupted()
+  execution = currentExecution()
+  if execution is not None:
+    execution.evaluations += 1
+
+  with profiler.commandPhase('evaluate'), profiler.traceSpan(_traceName(expression), 'evaluate', expression=expression) as traceArgs:
+    startTime = time.time()
+    if options is None:
+      value = frame.EvaluateExpression(expression)
+    else:
+      value = frame.EvaluateExpression(expression, options)
+    seconds = time.time() - startTime
+    if profiler.isTracing():
+      traceArgs['resultSize'] = value.GetByteSize()
+
+  error = value.GetError()
+  failed = error.Fail() and error.GetError() != kNoResult
+  profiler.recordEvaluation(expression, seconds, failed, failed and error.GetError() == lldb.eExpressionTimedOut)
+  return value
+
+# The typed accessors below read results with GetValueAsUnsigned() and GetData(),
+# instead of parsing the text LLDB formats them as. They return None if the
+# expression fails.
+def _evaluateTypedValue(cast, expression, printErrors, cacheable):
+  value = evaluateExpressionValue(cast + '(' + expression + ')', printErrors, cacheable=cacheable)
+  return value if value.GetError().Success() else None
+
+def evaluateUnsigned(expression, printErrors=True, cacheable=False):
+  value = _evaluateTypedValue('(unsigned long long)', expression, printErrors, cacheable)
+  return value.GetValueAsUnsigned() if value is not None else None
+
+def evaluateSigned(expression, printErrors=True, cacheable=False):
+  value = _evaluateTypedValue('(long long)', expression, printErrors, cacheable)
+  return value.GetValueAsSigned() if value is not None else None
+
+# Returns the address as an integer, 0 for nil.
+def evaluatePointer(expression, printErrors=True, cacheable=False):
+  value = _evaluateTypedValue('(uintptr_t)', expression, printErrors, cacheable)
+  return value.GetValueAsUnsigned() if value is not None else None
+
+def evaluateBool(expression, printErrors=True, cacheable=False):
+  value = _evaluateTypedValue('(BOOL)', expression, printErrors, cacheable)
+  return value.GetValueAsUnsigned() != 0 if value is not None else None
+
+def evaluateDouble(expression, printErrors=True, cacheable=False):
+  value = _evaluateTypedValue('(double)', expression, printErrors, cacheable)
+  return _readFloats(value, 1)[0] if value is not None else None
+
+# Returns an (x, y) tuple.
+def evaluatePoint(expression, printErrors=True, cacheable=False):
+  value = _evaluateTypedValue('(CGPoint)', expression, printErrors, cacheable)
+  return _readFloats(value, 2) if value is not None else None
+
+# Returns an (x, y, width, height) tuple.
+def evaluateRect(expression, printErrors=True, cacheable=False):
+  value = _evaluateTypedValue('(CGRect)', expression, printErrors, cacheable)
+  return _readFloats(value, 4) if value is not None else None
+
+# Reads count floating point numbers from a value's bytes, e.g. the fields of a
+# CGRect. CGFloat is a float on 32-bit architectures.
+def _readFloats(value, count):
+  data = value.GetData()
+  size = value.GetByteSize() / count
+  error = lldb.SBError()
+  if size == 4:
+    return tuple(data.GetFloat(error, index * size) for index in range(count))
+  return tuple(data.GetDouble(error, index * size) for index in range(count))
 
-def evaluateBooleanExpression(expression, printErrors=True):
-  return (int(evaluateIntegerExpression('(BOOL)(' + expression + ')', printErrors)) != 0)
+def evaluateIntegerExpression(expression, printErrors=True, cacheable=False):
+  return evaluateSigned(expression, printErrors, cacheable)
 
-def evaluateExpression(expression, printErrors=True):
-  return evaluateExpressionValue(expression, printErrors=printErrors).GetValue()
+def evaluateBooleanExpression(expression, printErrors=True, cacheable=False):
+  return evaluateBool(expression, printErrors, cacheable)
 
-def describeObject(expression, printErrors=True):
-  return evaluateExpressionValue('(id)(' + expression + ')', printErrors).GetObjectDescription()
+def evaluateExpression(expression, printErrors=True, cacheable=False):
+  return evaluateExpressionValue(expression, printErrors=printErrors, cacheable=cacheable).GetValue()
 
+def describeObject(expression, printErrors=True, cacheable=False):
+  return evaluateExpressionValue('(id)(' + expression + ')', printErrors, cacheable=cacheable).GetObjectDescription()
+
+# Effects are never cached, and may change what cached queries would return.
 def evaluateEffect(expression, printErrors=True):
   evaluateExpressionValue('(void)(' + expression + ')', printErrors=printErrors)
+  invalidateExpressionCache()
+
+# Applies many effects with few evaluations: the statements are compiled and run
+# in batches of up to batchSize, each batch as a single expression.
+def evaluateEffects(statements, printErrors=True, batchSize=256):
+  statements = list(statements)
+  for start in xrange(0, len(statements), batchSize):
+    batch = statements[start:start + batchSize]
+    evaluateExpressionValue(''.join('(void)(' + statement + ');\n' for statement in batch), printErrors=printErrors)
+  if statements:
+    invalidateExpressionCache()
 
-def evaluateObjectExpression(expression, printErrors=True):
-  return evaluateExpression('(id)(' + expression + ')', printErrors)
+def evaluateObjectExpression(expression, printErrors=True, cacheable=False):
+  return evaluateExpression('(id)(' + expression + ')', printErrors, cacheable)
 
 def evaluateCStringExpression(expression, printErrors=True):
-  ret = evaluateExpression(expression, printErrors)
+  address = evaluatePointer(expression, printErrors)
+  if address is None:
+    return None
 
   process = lldb.debugger.GetSelectedTarget().GetProcess()
   error = lldb.SBError()
-  ret = process.ReadCStringFromMemory(int(ret, 16), 256, error)
+  ret = _readCString(process, address, error)
   if error.Success():
     return ret
   else:
@@ -120,20 +425,46 @@ def evaluateCStringExpression(expression, printErrors=True):
       print error
     return None
 
+# Reads a C string of any length, in chunks that grow as long as there's more of it.
+def _readCString(process, address, error):
+  chunks = []
+  chunkSize = 256
+  while True:
+    with profiler.traceSpan('ReadCStringFromMemory', 'memory', address=hex(address), size=chunkSize):
+      chunk = process.ReadCStringFromMemory(address, chunkSize, error)
+    if not error.Success():
+      return None
+    chunks.append(chunk)
+    if len(chunk) < chunkSize - 1:
+      return ''.join(chunks)
+    address += len(chunk)
+    chunkSize = min(chunkSize * 4, _transferChunkSize)
+
 
+# RETURN serializes its argument as JSON, then copies it to a malloc'd buffer
+# that starts with the length of the JSON as a 64 bit integer, so the host knows
+# exactly how much to read.
 RETURN_MACRO = """
 #define IS_JSON_OBJ(obj)\
     (obj != nil && ((bool)[NSJSONSerialization isValidJSONObject:obj] ||\
     (bool)[obj isKindOfClass:[NSString class]] ||\
     (bool)[obj isKindOfClass:[NSNumber class]]))
+#define __CHISEL_TRANSFER(data) ({\
+    NSData *__transferData = (NSData *)(data);\
+    if (__transferData == nil) {\
+        (void)[NSException raise:@"Invalid RETURN argument" format:@"The result couldn't be serialized"];\
+    }\
+    unsigned long long __length = (unsigned long long)[__transferData length];\
+    char *__buffer = (char *)malloc((unsigned long)(8 + __length));\
+    (void)memcpy(__buffer, &__length, 8);\
+    (void)[__transferData getBytes:(void *)(__buffer + 8) length:(NSUInteger)__length];\
+    (char *)__buffer;})
 #define RETURN(ret) ({\
     if (!IS_JSON_OBJ(ret)) {\
         (void)[NSException raise:@"Invalid RETURN argument" format:@""];\
     }\
     NSDictionary *__dict = @{@"return":ret};\
-    NSData *__data = (id)[NSJSONSerialization dataWithJSONObject:__dict options:0 error:NULL];\
-    NSString *__str = (id)[[NSString alloc] initWithData:__data encoding:4];\
-    (char *)[__str UTF8String];})
+    __CHISEL_TRANSFER([NSJSONSerialization dataWithJSONObject:__dict options:0 error:NULL]);})
 #define RETURNCString(ret)\
     ({NSString *___cstring_ret = [NSString stringWithUTF8String:ret];\
     RETURN(___cstring_ret);})
@@ -151,21 +482,294 @@ def evaluate(expr):
   if not check_expr(expr):
     raise Exception("Invalid Expression, the last expression not include a RETURN family marco")
 
-  command = "({" + RETURN_MACRO + '\n' + expr + "})"
-  ret = evaluateExpressionValue(command, printErrors=True)
-  if not ret.GetError().Success():
-    print ret.GetError()
+  ret, error = _evaluateReturnedValue(expr)
+  if error:
+    print error
     return None
+  return ret
+
+def _evaluateReturnedValue(expr):
+  if _allocationHygieneEnabled:
+    # Objects autoreleased by expr, and by RETURN, are released before the
+    # expression returns, rather than when the process next drains its pool.
+    command = ("({" + _returnMacro() + '\n' + _takePendingStatements() +
+      "char *__chisel_buffer = NULL;\n@autoreleasepool {\n__chisel_buffer = ({" + expr + "});\n}\n__chisel_buffer;})")
   else:
-    process = lldb.debugger.GetSelectedTarget().GetProcess()
-    error = lldb.SBError()
-    ret = process.ReadCStringFromMemory(int(ret.GetValue(), 16), 2**20, error)
-    if not error.Success():
-      print error
-      return None
+    command = "({" + _returnMacro() + '\n' + _takePendingStatements() + expr + "})"
+  ret = evaluateExpressionValue(command, printErrors=False)
+  if not ret.GetError().Success():
+    return (None, ret.GetError())
+  else:
+    data, error = _readTransferBuffer(ret.GetValueAsUnsigned())
+    if error:
+      return (None, error)
     else:
-      ret = json.loads(ret)
-      return ret['return']
+      ret = json.loads(data)
+      return (ret['return'], None)
+
+# Once the transfer function has been injected, RETURN is a short call into it
+# rather than the whole of RETURN_MACRO.
+_transferFunction = """
+char *(^$name)(id) = ^char *(id ret) {
+  BOOL isValid = ret != nil && ((bool)[NSJSONSerialization isValidJSONObject:ret] ||
+    (bool)[ret isKindOfClass:[NSString class]] ||
+    (bool)[ret isKindOfClass:[NSNumber class]]);
+  if (!isValid) {
+    (void)[NSException raise:@"Invalid RETURN argument" format:@""];
+  }
+  char *buffer = NULL;
+  @autoreleasepool {
+    NSDictionary *dict = @{@"return":ret};
+    NSData *data = [NSJSONSerialization dataWithJSONObject:dict options:0 error:NULL];
+    if (data == nil) {
+      (void)[NSException raise:@"Invalid RETURN argument" format:@"The result couldn't be serialized"];
+    }
+    unsigned long long length = (unsigned long long)[data length];
+    buffer = (char *)malloc((unsigned long)(8 + length));
+    (void)memcpy(buffer, &length, 8);
+    (void)[data getBytes:(void *)(buffer + 8) length:(NSUInteger)length];
+  }
+  return buffer;
+};
+"""
+
+def _returnMacro():
+  function = injectedFunction('transfer', _transferFunction)
+  if function is None:
+    return RETURN_MACRO
+
+  return """
+#define RETURN(ret) ((char *){function}((id)(ret)))
+#define RETURNCString(ret) RETURN([NSString stringWithUTF8String:ret])
+""".format(function=function)
+
+_transferChunkSize = 1 << 20
+
+# Reads a buffer made by RETURN, however large it is.
+def _readTransferBuffer(address):
+  process = lldb.debugger.GetSelectedTarget().GetProcess()
+  error = lldb.SBError()
+  header = readMemory(process, address, 8, error)
+  if not error.Success():
+    return (None, error)
+  length = struct.unpack('<Q', header)[0]
+
+  chunks = []
+  offset = 8
+  while offset < 8 + length:
+    chunk = readMemory(process, address + offset, min(_transferChunkSize, 8 + length - offset), error)
+    if not error.Success():
+      return (None, error)
+    chunks.append(chunk)
+    offset += len(chunk)
+
+  _deferFree(process, address)
+  return (''.join(chunks), None)
+
+# Freeing a transfer buffer right away would take another expression
+# evaluation, so buffers are freed at the start of the next transfer instead,
+# along with anything else that's waiting to be released.
+_pendingStatements = []
+_pendingStatementsProcessID = None
+
+def _deferStatement(process, statement):
+  global _pendingStatementsProcessID
+  if process.GetUniqueID() != _pendingStatementsProcessID:
+    del _pendingStatements[:]
+    _pendingStatementsProcessID = process.GetUniqueID()
+  _pendingStatements.append(statement)
+
+def _deferFree(process, address):
+  _deferStatement(process, '(void)free((void *)0x%x);\n' % address)
+
+# Releases the object at the start of the next transfer, for objects the host
+# owns, e.g. the state of a walk it has abandoned.
+def deferRelease(address):
+  process = lldb.debugger.GetSelectedTarget().GetProcess()
+  _deferStatement(process, '(void)[(id)0x%x release];\n' % address)
+
+def _takePendingStatements():
+  if not _pendingStatements:
+    return ''
+  process = lldb.debugger.GetSelectedTarget().GetProcess()
+  statements = ''
+  if process.GetUniqueID() == _pendingStatementsProcessID:
+    statements = ''.join(_pendingStatements)
+  # If evaluation fails, it isn't known whether these ran, so they are never
+  # retried: a leak is better than a double free.
+  del _pendingStatements[:]
+  return statements
+
+# Leak reports show how much more memory the process's malloc zones hold after
+# each command than before it. They cost two evaluations per command, so they're
+# opt-in: use `chiselleaks --enable`, or set CHISEL_LEAK_REPORT=1.
+_leakReportEnabled = os.getenv('CHISEL_LEAK_REPORT', '0') not in ('', '0')
+_leakStatistics = {}
+_measuringAllocations = []
+
+def isLeakReportEnabled():
+  return _leakReportEnabled
+
+def setLeakReportEnabled(enabled):
+  global _leakReportEnabled
+  _leakReportEnabled = enabled
+
+class FBLeakStatistics:
+  def __init__(self):
+    self.count = 0
+    self.blocks = 0
+    self.bytes = 0
+
+def leakStatistics():
+  return dict(_leakStatistics)
+
+def resetLeakStatistics():
+  _leakStatistics.clear()
+
+_heapUsageFunction = """
+NSArray *(^$name)(void) = ^NSArray *(void) {
+  struct { unsigned int blocksInUse; size_t sizeInUse; size_t maxSizeInUse; size_t sizeAllocated; } statistics = {0, 0, 0, 0};
+  ((void (*)(void *, void *))malloc_zone_statistics)(NULL, &statistics);
+  return @[@(statistics.blocksInUse), @(statistics.sizeInUse)];
+};
+"""
+
+# Returns a (blocks, bytes) tuple for the memory allocated in all of the
+# process's malloc zones. Transfer buffers that are waiting to be freed are
+# freed first. Returns None, quietly, if there's no process to measure.
+def heapUsage():
+  function = injectedFunction('heapUsage', _heapUsageFunction)
+  if function is None:
+    return None
+  usage, error = _evaluateReturnedValue('RETURN({}());'.format(function))
+  return tuple(usage) if not error else None
+
+# Wraps a single execution of a command, and reports what it leaked. Only the
+# outermost command is measured.
+@contextmanager
+def allocationReport(name):
+  if not _leakReportEnabled or _measuringAllocations:
+    yield
+    return
+
+  before = heapUsage()
+  _measuringAllocations.append(name)
+  try:
+    yield
+  finally:
+    _measuringAllocations.pop()
+    after = heapUsage() if before else None
+    if after:
+      blocks, bytes = after[0] - before[0], after[1] - before[1]
+      statistics = _leakStatistics.get(name)
+      if statistics is None:
+        statistics = _leakStatistics[name] = FBLeakStatistics()
+      statistics.count += 1
+      statistics.blocks += blocks
+      statistics.bytes += bytes
+      print '{}: {:+d} bytes in {:+d} blocks still allocated in the process.'.format(name, bytes, blocks)
+
+# Helper functions are defined once per process, as persistent blocks, so that
+# later expressions are short calls into code that has already been compiled.
+# A declaration defines a block named $name, e.g.
+#   int (^$name)(int) = ^int (int x) { return x * 2; };
+# injectedFunction() returns the name the block was given in the current
+# process, or None if it couldn't be defined. The name includes a digest of the
+# declaration, so a changed declaration is injected again, and the process's
+# ID, so everything is injected again after a relaunch.
+_injectedFunctions = {}
+
+def injectedFunction(name, declaration):
+  process = lldb.debugger.GetSelectedTarget().GetProcess()
+  digest = hashlib.sha1(declaration).hexdigest()[:8]
+  persistentName = '$chisel_{}_{}_{}'.format(name, digest, process.GetUniqueID())
+
+  key = (process.GetUniqueID(), persistentName)
+  if key not in _injectedFunctions:
+    value = evaluateExpressionValue(string.Template(declaration).safe_substitute(name=persistentName), printErrors=False)
+    error = value.GetError()
+    # It's already defined if fblldb.py was imported again while the process ran.
+    _injectedFunctions[key] = (error.Success() or error.GetError() == kNoResult or 'redefinition' in str(error))
+  return persistentName if _injectedFunctions[key] else None
+
+# Calls the injected function with the given arguments (an Objective-C argument
+# list) and returns its result, which must be a valid argument to RETURN. If the
+# function couldn't be injected, it's defined and called inline instead.
+# Example:
+#       >>> fblldbbase.evaluateFunction('count', 'id (^$name)(id) = ^id (id array) { return @([array count]); };', '(id)$array')
+#       3
+def evaluateFunction(name, declaration, arguments=''):
+  ret, error = evaluateFunctionWithError(name, declaration, arguments)
+  if error:
+    print error
+    return None
+  return ret
+
+# Like evaluateFunction(), but returns a (value, error) tuple rather than
+# printing the error, for callers that handle it themselves.
+def evaluateFunctionWithError(name, declaration, arguments=''):
+  function = injectedFunction(name, declaration)
+  if function is None:
+    function = '__chisel_' + name
+    return _evaluateReturnedValue(string.Template(declaration).safe_substitute(name=function) + '\nRETURN({}({}));'.format(function, arguments))
+  return _evaluateReturnedValue('RETURN({}({}));'.format(function, arguments))
+
+# How evaluateMany() boxes the value of each type of expression, and converts it back.
+_boxedValueTypes = {
+  'int': ('[NSNumber numberWithLongLong:(long long)({})]', int),
+  'unsigned': ('[NSNumber numberWithUnsignedLongLong:(unsigned long long)({})]', int),
+  'pointer': ('[NSNumber numberWithUnsignedLongLong:(unsigned long long)(uintptr_t)({})]', lambda value: '0x%x' % value),
+  'double': ('[NSNumber numberWithDouble:(double)({})]', float),
+  'bool': ('[NSNumber numberWithBool:(BOOL)({})]', bool),
+  'string': ('(id)[NSString stringWithUTF8String:(const char *)({})]', lambda value: value.encode('utf-8')),
+  'object': ('(id)[(id)({}) debugDescription]', lambda value: value.encode('utf-8')),
+  'json': ('(id)({})', lambda value: value),
+}
+
+# Evaluates several independent expressions with a single round trip to the
+# process, instead of compiling each of them separately. Each item is an
+# (expression, type) tuple, where type is one of 'int', 'unsigned', 'pointer'
+# (returned as a hex string), 'double', 'bool', 'string' (a C string), 'object'
+# (its description, like `po`) or 'json' (any JSON compatible object).
+#
+# Returns a (value, error) tuple for each item. value is None for nil results,
+# and error is None unless evaluating that item failed, e.g. it threw. If the
+# batch doesn't compile, each item is evaluated on its own.
+# Example:
+#       >>> fblldbbase.evaluateMany([('[view subviews]', 'pointer'), ('[[view subviews] count]', 'int')])
+#       [('0x7f8e4bd13c40', None), (3, None)]
+def evaluateMany(items):
+  if not items:
+    return []
+
+  results, error = _evaluateReturnedValue(_batchExpression(items))
+  if error:
+    if len(items) == 1:
+      return [(None, str(error).strip())]
+    return [evaluateMany([item])[0] for item in items]
+
+  return [_unboxedResult(result, valueType) for result, (expression, valueType) in zip(results, items)]
+
+def _batchExpression(items):
+  lines = ['NSMutableArray *__chisel_results = (NSMutableArray *)[NSMutableArray array];']
+  for expression, valueType in items:
+    boxedExpression = _boxedValueTypes[valueType][0].format(expression)
+    lines.append(
+      '@try { id __chisel_value = ' + boxedExpression + '; '
+      '[__chisel_results addObject:@{@"value": __chisel_value ?: (id)[NSNull null]}]; } '
+      '@catch (NSException *__chisel_exception) { '
+      '[__chisel_results addObject:@{@"error": (id)[__chisel_exception reason] ?: (id)[__chisel_exception name]}]; }')
+  lines.append('RETURN(__chisel_results);')
+  return '\n'.join(lines)
+
+def _unboxedResult(result, valueType):
+  if 'error' in result:
+    return (None, result['error'].encode('utf-8'))
+
+  value = result['value']
+  if value is None:
+    return (None, None)
+  return (_boxedValueTypes[valueType][1](value), None)
 
 def currentLanguage():
   return lldb.debugger.GetSelectedTarget().GetProcess().GetSelectedThread().GetSelectedFrame().GetCompileUnit().GetLanguage()
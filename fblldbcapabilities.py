@@ -0,0 +1,78 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# What the process being debugged is and what it supports: whether it's a Mac
+# app or runs in the simulator, and which of the private methods commands rely
+# on it has. These don't change while the process runs, so they're probed once
+# per launch, with a single batched evaluation, and helpers consult the profile
+# instead of asking the process again.
+
+import lldb
+import fblldbbase as fb
+import fblldbobjcruntimehelpers as runtimeHelpers
+
+class FBCapabilities(object):
+  def __init__(self, arch, values):
+    self.arch = arch
+    hasAppKit, model, name, printHierarchy, ivarDescription, accessibilityElements, base64Encoding = values
+    # Like before there were arm64 Macs, only x86_64 processes that have
+    # NSApplication are Mac apps.
+    self.isMac = arch == 'x86_64' and bool(hasAppKit)
+    self.model = model
+    self.isSimulator = not self.isMac and any('simulator' in (value or '').lower() for value in (model, name))
+    self.isDevice = not self.isMac and not self.isSimulator
+    # +[UIViewController _printHierarchy]
+    self.hasPrintHierarchy = bool(printHierarchy)
+    # -[NSObject _ivarDescription]
+    self.hasIvarDescription = bool(ivarDescription)
+    # -[UIView _accessibilityElementsInContainer:], which is only there once the
+    # accessibility server has started.
+    self.hasAccessibilityElements = bool(accessibilityElements)
+    # -[NSData base64EncodedStringWithOptions:]
+    self.hasBase64Encoding = bool(base64Encoding)
+
+  def __repr__(self):
+    return '<FBCapabilities %s>' % ', '.join('%s=%r' % item for item in sorted(self.__dict__.items()))
+
+# Each probe uses the runtime functions, so that the batch compiles in any
+# process, whether it links UIKit or AppKit.
+_probes = [
+  ('objc_getClass("NSApplication") != nil', 'bool'),
+  ('(id)[(id)[(id)objc_getClass("UIDevice") performSelector:@selector(currentDevice)] performSelector:@selector(model)]', 'object'),
+  ('(id)[(id)[(id)objc_getClass("UIDevice") performSelector:@selector(currentDevice)] performSelector:@selector(name)]', 'object'),
+  ('class_respondsToSelector((Class)object_getClass((id)objc_getClass("UIViewController")), @selector(_printHierarchy))', 'bool'),
+  ('class_respondsToSelector((Class)objc_getClass("NSObject"), @selector(_ivarDescription))', 'bool'),
+  ('class_respondsToSelector((Class)objc_getClass("UIView"), @selector(_accessibilityElementsInContainer:))', 'bool'),
+  ('class_respondsToSelector((Class)objc_getClass("NSData"), @selector(base64EncodedStringWithOptions:))', 'bool'),
+]
+
+# Profiles are kept per process launch, by the process's unique ID, along with
+# the stop ID they're limited to, or None if they're kept for the whole launch.
+_profiles = {}
+
+# Returns the FBCapabilities of the selected target's process, probing it the
+# first time it's asked for after a launch. A profile whose probes failed, e.g.
+# because expressions can't run in the selected frame, or UIKit isn't loaded
+# yet, is only kept until the process resumes, and is probed again after that.
+def capabilities():
+  process = lldb.debugger.GetSelectedTarget().GetProcess()
+  key = process.GetUniqueID()
+  stopID = process.GetStopID()
+  profileStopID, profile = _profiles.get(key, (None, None))
+  if profile is None or (profileStopID is not None and profileStopID != stopID):
+    results = fb.evaluateMany(_probes)
+    profile = FBCapabilities(runtimeHelpers.currentArch(), [value for value, error in results])
+    failed = any(error for value, error in results)
+    _profiles[key] = (stopID if failed else None, profile)
+  return profile
+
+# Probes the process again, e.g. after loading a framework that adds methods.
+def refreshCapabilities():
+  _profiles.pop(lldb.debugger.GetSelectedTarget().GetProcess().GetUniqueID(), None)
+  return capabilities()
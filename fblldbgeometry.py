@@ -0,0 +1,262 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# Where the views of a snapshot are on screen, computed on the host. Snapshots
+# capture the layer geometry of each view (position, anchor point and affine
+# transform, along with its bounds), which is enough to compose the transform
+# from every view to the root of the snapshot without asking the process for a
+# single convertPoint:. If NumPy is installed, a level of the tree is composed
+# at a time; otherwise each view is composed in turn, in Python. Hit testing,
+# like UIKit's, runs on the same geometry.
+#
+# Transforms are (a, b, c, d, tx, ty) tuples, like CGAffineTransform, and map
+# (x, y) to (a * x + c * y + tx, b * x + d * y + ty).
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+identity = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# Like CGAffineTransformConcat, the transform that applies first, then second.
+def concat(first, second):
+  a1, b1, c1, d1, tx1, ty1 = first
+  a2, b2, c2, d2, tx2, ty2 = second
+  return (a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+    c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+    tx1 * a2 + ty1 * c2 + tx2, tx1 * b2 + ty1 * d2 + ty2)
+
+def applyToPoint(transform, x, y):
+  a, b, c, d, tx, ty = transform
+  return (a * x + c * y + tx, b * x + d * y + ty)
+
+# Returns None if the transform can't be inverted, e.g. it scales to 0.
+def invert(transform):
+  a, b, c, d, tx, ty = transform
+  determinant = a * d - b * c
+  if determinant == 0:
+    return None
+  return (d / determinant, -b / determinant, -c / determinant, a / determinant,
+    (c * ty - d * tx) / determinant, (b * tx - a * ty) / determinant)
+
+# Returns the (x, y, width, height) bounding box of the rect once transformed,
+# like CGRectApplyAffineTransform.
+def applyToRect(transform, rect):
+  x, y, width, height = rect
+  points = [applyToPoint(transform, px, py) for px, py in ((x, y), (x + width, y), (x, y + height), (x + width, y + height))]
+  xs = [px for px, py in points]
+  ys = [py for px, py in points]
+  return (min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+
+# The transform from the node's bounds to its superview's, or None if some of
+# the geometry isn't known. Like Core Animation, the anchor point of the bounds
+# is at position in the superlayer, and transform applies around it. A view
+# without a layer, e.g. an NSView that isn't layer backed, is placed by its
+# frame instead.
+def localTransform(node):
+  if None in node.bounds:
+    return None
+  x, y, width, height = node.bounds
+  geometry = (node.position, node.anchorPoint, node.transform)
+  if None not in geometry and not any(None in value for value in geometry):
+    (px, py), (ax, ay), (a, b, c, d, tx, ty) = geometry
+    originX = x + ax * width
+    originY = y + ay * height
+    return (a, b, c, d, px + tx - a * originX - c * originY, py + ty - b * originX - d * originY)
+  if None in node.frame:
+    return None
+  return (1.0, 0.0, 0.0, 1.0, node.frame[0] - x, node.frame[1] - y)
+
+class FBViewGeometry(object):
+  def __init__(self, snapshot):
+    self.snapshot = snapshot
+    # For each node, by index, the transform from its bounds to the bounds of
+    # the root, and the rect it covers there, or None if it isn't known.
+    if numpy is not None:
+      self.transforms, self.rects = _composeArrays(snapshot.nodes)
+    else:
+      self.transforms, self.rects = _compose(snapshot.nodes)
+
+  def transform(self, node):
+    return self.transforms[node.index]
+
+  # Returns the (x, y, width, height) bounding box of the node's bounds in the
+  # coordinates of the root.
+  def rect(self, node):
+    return self.rects[node.index]
+
+  # Converts a point from the bounds of one node to another, like
+  # convertPoint:toView:. None stands for the root. Returns None if either
+  # transform isn't known.
+  def convertPoint(self, x, y, fromNode=None, toNode=None):
+    if fromNode is not None:
+      transform = self.transform(fromNode)
+      if transform is None:
+        return None
+      x, y = applyToPoint(transform, x, y)
+    if toNode is not None:
+      transform = self.transform(toNode)
+      inverse = invert(transform) if transform is not None else None
+      if inverse is None:
+        return None
+      x, y = applyToPoint(inverse, x, y)
+    return (x, y)
+
+  # Whether the point, in the coordinates of the root, is in the node's bounds,
+  # like pointInside:withEvent:.
+  def containsPoint(self, node, x, y):
+    point = self.convertPoint(x, y, None, node)
+    if point is None or None in node.bounds:
+      return False
+    bx, by, width, height = node.bounds
+    return bx <= point[0] < bx + width and by <= point[1] < by + height
+
+  # Returns the node that would receive a touch at the point, in the
+  # coordinates of the root, or None. Like -[UIView hitTest:withEvent:], a view
+  # that's hidden, almost transparent or has user interaction disabled isn't
+  # hit, and neither is anything in it, and a view only looks at its subviews
+  # if the point is in its own bounds, whether or not it clips to them. Of the
+  # subviews that can be hit, the frontmost, i.e. the last, wins.
+  def hitTest(self, x, y):
+    return _hitTest(self, x, y)[0]
+
+  # Returns every node whose bounds contain the point, front to back, each
+  # with the reason it does or doesn't receive the touch.
+  def hitTestCandidates(self, x, y):
+    hit, reachable, contains = _hitTest(self, x, y)
+    hitAncestors = set()
+    ancestor = hit.parent if hit is not None else None
+    while ancestor is not None:
+      hitAncestors.add(ancestor.index)
+      ancestor = ancestor.parent
+
+    candidates = []
+    for node in reversed(self.snapshot.nodes):
+      if not contains[node.index]:
+        continue
+      ignored = _ignoresTouches(node)
+      if node is hit:
+        reason = 'receives the touch'
+      elif ignored is not None:
+        reason = ignored
+      elif not reachable[node.index]:
+        reason = _blockedBy(node, contains)
+      elif node.index in hitAncestors:
+        reason = 'contains 0x%x' % hit.address
+      else:
+        reason = 'behind 0x%x' % hit.address
+      candidates.append((node, reason))
+    return candidates
+
+# Returns why touches don't go to the node itself, or None if they can.
+def _ignoresTouches(node):
+  if node.hidden:
+    return 'is hidden'
+  if node.alpha is not None and node.alpha < 0.01:
+    return 'has alpha < 0.01'
+  if not node.userInteractionEnabled:
+    return 'has userInteractionEnabled = NO'
+  return None
+
+# Returns why hit testing doesn't reach the node, from its nearest superview
+# that stops it.
+def _blockedBy(node, contains):
+  ancestor = node.parent
+  while ancestor is not None:
+    reason = _ignoresTouches(ancestor)
+    if reason is not None:
+      return 'in 0x%x, which %s' % (ancestor.address, reason)
+    if not contains[ancestor.index]:
+      if ancestor.clipsToBounds:
+        return 'clipped by 0x%x' % ancestor.address
+      return 'outside the bounds of 0x%x' % ancestor.address
+    ancestor = ancestor.parent
+  return None
+
+# Hit testing visits subviews last first, before the view itself, so the node
+# that's hit is the last node, depth first, that hit testing reaches. Returns
+# it, and for each node whether hit testing reaches it and whether its bounds
+# contain the point.
+def _hitTest(geometry, x, y):
+  nodes = geometry.snapshot.nodes
+  contains = [geometry.containsPoint(node, x, y) for node in nodes]
+  reachable = []
+  hit = None
+  for node in nodes:
+    isReachable = (contains[node.index] and _ignoresTouches(node) is None and
+      (node.parent is None or reachable[node.parent.index]))
+    reachable.append(isReachable)
+    if isReachable:
+      hit = node
+  return hit, reachable, contains
+
+# The root's bounds are the coordinate space, and nodes are depth first, so a
+# node's superview is always composed before it.
+def _compose(nodes):
+  transforms = []
+  rects = []
+  for node in nodes:
+    if node.parent is None:
+      transform = identity if None not in node.bounds else None
+    else:
+      local = localTransform(node)
+      parentTransform = transforms[node.parent.index]
+      transform = concat(local, parentTransform) if local is not None and parentTransform is not None else None
+    transforms.append(transform)
+    rects.append(applyToRect(transform, node.bounds) if transform is not None else None)
+  return transforms, rects
+
+def _composeArrays(nodes):
+  count = len(nodes)
+  nan = float('nan')
+  local = numpy.array([localTransform(node) or (nan,) * 6 for node in nodes], dtype=float).reshape(count, 6)
+  bounds = numpy.array([[nan if value is None else value for value in node.bounds] for node in nodes], dtype=float).reshape(count, 4)
+  parents = numpy.array([node.parent.index if node.parent is not None else -1 for node in nodes], dtype=int)
+  depths = numpy.array([node.depth - nodes[0].depth for node in nodes], dtype=int)
+
+  transforms = numpy.empty((count, 6))
+  roots = parents < 0
+  transforms[roots] = identity
+  transforms[roots & numpy.isnan(bounds).any(axis=1)] = nan
+
+  # Each level of the tree is composed with the level above it at once.
+  order = numpy.argsort(depths, kind='mergesort')
+  levels = numpy.split(order, numpy.flatnonzero(numpy.diff(depths[order])) + 1)
+  for level in levels:
+    level = level[parents[level] >= 0]
+    if not len(level):
+      continue
+    a1, b1, c1, d1, tx1, ty1 = local[level].T
+    a2, b2, c2, d2, tx2, ty2 = transforms[parents[level]].T
+    transforms[level] = numpy.column_stack((a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+      c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+      tx1 * a2 + ty1 * c2 + tx2, tx1 * b2 + ty1 * d2 + ty2))
+
+  # The corners of every node's bounds, transformed.
+  x, y, width, height = bounds.T
+  xs = numpy.column_stack((x, x + width, x, x + width))
+  ys = numpy.column_stack((y, y, y + height, y + height))
+  a, b, c, d, tx, ty = [column[:, None] for column in transforms.T]
+  cornersX = a * xs + c * ys + tx
+  cornersY = b * xs + d * ys + ty
+  minX, minY = cornersX.min(axis=1), cornersY.min(axis=1)
+  rects = numpy.column_stack((minX, minY, cornersX.max(axis=1) - minX, cornersY.max(axis=1) - minY))
+
+  known = ~numpy.isnan(transforms).any(axis=1)
+  knownRects = ~numpy.isnan(rects).any(axis=1)
+  return ([tuple(values) if isKnown else None for values, isKnown in zip(transforms.tolist(), known)],
+    [tuple(values) if isKnown else None for values, isKnown in zip(rects.tolist(), knownRects)])
+
+# Returns the FBViewGeometry of the snapshot, computing it the first time it's
+# asked for.
+def geometry(snapshot):
+  if snapshot.geometry is None:
+    snapshot.geometry = FBViewGeometry(snapshot)
+  return snapshot.geometry
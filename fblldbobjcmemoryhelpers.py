@@ -0,0 +1,195 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# Reads Objective-C runtime structures straight from the process's memory,
+# which is much faster than evaluating an expression. Only 64 bit processes are
+# supported. Every function returns None when it can't answer, e.g. for tagged
+# pointers or an unexpected layout, so callers can evaluate an expression instead.
+
+import re
+
+import lldb
+import fblldbprofiler as profiler
+
+# From objc-runtime-new.h.
+_FAST_DATA_MASK = 0x00007ffffffffff8
+_RW_REALIZED = 1 << 31
+_RO_META = 1 << 0
+
+# Strips pointer authentication bits.
+_ADDRESS_MASK = 0x00007fffffffffff
+
+_defaultISAMasks = {
+  'x86_64': 0x00007ffffffffff8,
+  'arm64': 0x0000000ffffffff8,
+}
+
+_processInfos = {}
+
+class _FBProcessInfo:
+  def __init__(self, target, process):
+    triple = target.GetTriple()
+    arch = triple.split('-')[0]
+    if arch == 'x86_64h':
+      arch = 'x86_64'
+    elif arch.startswith('arm64'):
+      arch = 'arm64'
+
+    self.isSupported = arch in _defaultISAMasks and process.GetAddressByteSize() == 8
+    self.isaMask = None
+    self.taggedPointerMask = None
+    if not self.isSupported:
+      return
+
+    self.isaMask = _readGlobal(target, process, 'objc_debug_isa_class_mask') or _defaultISAMasks[arch]
+
+    # Tagged pointers have their low bit set on macOS on Intel, and their high
+    # bit set everywhere else.
+    defaultTaggedPointerMask = 1 if arch == 'x86_64' and 'macosx' in triple else 1 << 63
+    self.taggedPointerMask = _readGlobal(target, process, 'objc_debug_taggedpointer_mask') or defaultTaggedPointerMask
+
+def _readGlobal(target, process, name):
+  symbols = target.FindSymbols(name)
+  for index in range(symbols.GetSize()):
+    address = symbols.GetContextAtIndex(index).GetSymbol().GetStartAddress().GetLoadAddress(target)
+    if address != lldb.LLDB_INVALID_ADDRESS:
+      error = lldb.SBError()
+      value = process.ReadUnsignedFromMemory(address, 8, error)
+      if error.Success():
+        return value
+  return None
+
+def _process():
+  target = lldb.debugger.GetSelectedTarget()
+  process = target.GetProcess()
+  info = _processInfos.get(process.GetUniqueID())
+  if info is None:
+    info = _processInfos[process.GetUniqueID()] = _FBProcessInfo(target, process)
+  return (process, info) if info.isSupported else (None, None)
+
+def _readPointer(process, address):
+  error = lldb.SBError()
+  with profiler.traceSpan('ReadPointerFromMemory', 'memory', address=hex(address), size=8):
+    value = process.ReadPointerFromMemory(address, error)
+  return value if error.Success() else None
+
+def _readUInt32(process, address):
+  error = lldb.SBError()
+  with profiler.traceSpan('ReadUnsignedFromMemory', 'memory', address=hex(address), size=4):
+    value = process.ReadUnsignedFromMemory(address, 4, error)
+  return value if error.Success() else None
+
+# Accepts the kind of strings the other helpers return and take, e.g.
+# '0x0000000100e4d0a8' or '(Class)0x100e4d0a8'. Anything else, such as a
+# variable name, has to be evaluated.
+_addressPattern = re.compile(r'^\s*(?:\(\s*[A-Za-z_][\w\s]*\**\s*\))?\s*(0x[0-9a-fA-F]+|[0-9]+)\s*$')
+
+def addressOf(expression):
+  if isinstance(expression, (int, long)):
+    return expression
+  match = _addressPattern.match(expression)
+  return int(match.group(1), 0) if match else None
+
+def isTaggedPointer(address):
+  process, info = _process()
+  if process is None:
+    return None
+  return (address & info.taggedPointerMask) != 0
+
+def object_getClass(object):
+  process, info = _process()
+  address = addressOf(object)
+  if process is None or not address or address & info.taggedPointerMask:
+    return None
+
+  isa = _readPointer(process, address)
+  if not isa:
+    return None
+  return isa & info.isaMask
+
+def class_getSuperclass(klass):
+  process, info = _process()
+  address = addressOf(klass)
+  if process is None or not address:
+    return None
+
+  superclass = _readPointer(process, address + 8)
+  if superclass is None:
+    return None
+  return superclass & _FAST_DATA_MASK
+
+def _class_ro(process, klass):
+  bits = _readPointer(process, klass + 32)
+  if not bits:
+    return None
+
+  data = bits & _FAST_DATA_MASK
+  flags = _readUInt32(process, data)
+  if flags is None:
+    return None
+  if not flags & _RW_REALIZED:
+    # Until a class is realized, its data is the class_ro_t.
+    return data
+
+  ro = _readPointer(process, data + 8)
+  if ro and ro & 1:
+    # The ro is in a class_rw_ext_t, whose first member points to it.
+    ro = _readPointer(process, ro & ~1 & _ADDRESS_MASK)
+  return ro & _ADDRESS_MASK if ro else None
+
+def class_getName(klass):
+  process, info = _process()
+  address = addressOf(klass)
+  if process is None or not address:
+    return None
+
+  ro = _class_ro(process, address)
+  if not ro:
+    return None
+
+  # Swift classes may have no name in their class_ro_t until the runtime asks for it.
+  name = _readPointer(process, ro + 24)
+  if not name:
+    return None
+
+  error = lldb.SBError()
+  with profiler.traceSpan('ReadCStringFromMemory', 'memory', address=hex(name), size=1024):
+    name = process.ReadCStringFromMemory(name & _ADDRESS_MASK, 1024, error)
+  if not error.Success() or not name:
+    return None
+  # Swift classes have their mangled name here, e.g. _TtC5MyApp6MyView, but the
+  # runtime demangles it, to MyApp.MyView, so let the runtime answer.
+  if name.startswith('_Tt'):
+    return None
+  return name
+
+def class_isMetaClass(klass):
+  process, info = _process()
+  address = addressOf(klass)
+  if process is None or not address:
+    return None
+
+  ro = _class_ro(process, address)
+  flags = _readUInt32(process, ro) if ro else None
+  if flags is None:
+    return None
+  return (flags & _RO_META) != 0
+
+# The name of the object's class, as -[NSObject class] would return it.
+def className(object):
+  klass = object_getClass(object)
+  if not klass:
+    return None
+
+  name = class_getName(klass)
+  # Key-value observing swaps the isa for a subclass that hides itself by
+  # overriding -class.
+  if name is None or name.startswith('NSKVONotifying_'):
+    return None
+  return name
@@ -11,34 +11,59 @@ import re
 
 import lldb
 import fblldbbase as fb
+import fblldbcapabilities as capabilities
+import fblldbobjcmemoryhelpers as memoryHelpers
 
 def objc_getClass(className):
   command = '(void*)objc_getClass("{}")'.format(className)
-  value = fb.evaluateExpression(command)
+  value = fb.evaluateExpression(command, cacheable=True)
   return value
 
+# object_getClass, class_getName, class_getSuperclass and class_isMetaClass read
+# the runtime's data structures from memory when they can, and only evaluate an
+# expression when that fails.
 def object_getClass(object):
+  klass = memoryHelpers.object_getClass(object)
+  if klass is not None:
+    return _pointerValue(klass)
+
   command = '(void*)object_getClass({})'.format(object)
-  value = fb.evaluateExpression(command)
+  value = fb.evaluateExpression(command, cacheable=True)
   return value
 
 def class_getName(klass):
+  name = memoryHelpers.class_getName(klass)
+  if name is not None:
+    return name
+
   command = '(const char*)class_getName((Class){})'.format(klass)
-  value = fb.evaluateExpressionValue(command).GetSummary().strip('"')
+  value = fb.evaluateExpressionValue(command, cacheable=True).GetSummary().strip('"')
   return value
 
 def class_getSuperclass(klass):
+  superclass = memoryHelpers.class_getSuperclass(klass)
+  if superclass is not None:
+    return _pointerValue(superclass)
+
   command = '(void*)class_getSuperclass((Class){})'.format(klass)
-  value = fb.evaluateExpression(command)
+  value = fb.evaluateExpression(command, cacheable=True)
   return value
 
 def class_isMetaClass(klass):
+    isMetaClass = memoryHelpers.class_isMetaClass(klass)
+    if isMetaClass is not None:
+      return isMetaClass
+
     command = 'class_isMetaClass((Class){})'.format(klass)
-    return fb.evaluateBooleanExpression(command)
+    return fb.evaluateBool(command, cacheable=True)
+
+# Formats an address the way LLDB formats a (void *).
+def _pointerValue(address):
+  return '0x%016x' % address
 
 def class_getInstanceMethod(klass, selector):
   command = '(void*)class_getInstanceMethod((Class){}, @selector({}))'.format(klass, selector)
-  value = fb.evaluateExpression(command)
+  value = fb.evaluateExpression(command, cacheable=True)
   return value
 
 def currentArch():
@@ -83,18 +108,15 @@ def functionPreambleExpressionForObjectParameterAtIndex(parameterIndex):
     expresssion = '(id)$r' + str(parameterIndex + 2)
   return expresssion
 
+# These are answered from the process's capability profile, which is probed
+# once per launch.
 def isMacintoshArch():
-  arch = currentArch()
-  if not arch == 'x86_64':
+  if currentArch() != 'x86_64':
     return False
-
-  nsClassName = 'NSApplication'
-  command = '(void*)objc_getClass("{}")'.format(nsClassName)
-
-  return (fb.evaluateBooleanExpression(command + '!= nil'))
+  return capabilities.capabilities().isMac
 
 def isIOSSimulator():
-  return fb.evaluateExpressionValue('(id)[[UIDevice currentDevice] model]').GetObjectDescription().lower().find('simulator') >= 0
+  return capabilities.capabilities().isSimulator
 
 def isIOSDevice():
-  return not isMacintoshArch() and not isIOSSimulator()
+  return capabilities.capabilities().isDevice
@@ -9,10 +9,15 @@
 
 import lldb
 import fblldbbase as fb
+import fblldbobjcmemoryhelpers as memoryHelpers
 
 def isKindOfClass(obj, className):
   isKindOfClassStr = '[(id)' + obj + ' isKindOfClass:[{} class]]'
-  return fb.evaluateBooleanExpression(isKindOfClassStr.format(className))
+  return fb.evaluateBooleanExpression(isKindOfClassStr.format(className), cacheable=True)
 
 def className(obj):
+  name = memoryHelpers.className(obj)
+  if name is not None:
+    return name
+
   return fb.evaluateExpressionValue('(id)[(' + obj + ') class]').GetObjectDescription()
@@ -0,0 +1,289 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+
+# Profiling is opt-in. To also profile startup, enable it before importing fblldb.py:
+#   script os.environ['CHISEL_PROFILE'] = '1'
+# Otherwise use `chiselprofile --enable`.
+_enabled = os.getenv('CHISEL_PROFILE', '0') not in ('', '0')
+
+_startupSamples = []
+_commandSamples = {}
+_activeCommands = []
+
+# The names of the commands that are running, maintained even when profiling is
+# disabled, so expression statistics can be attributed to them.
+_runningCommands = []
+
+def isEnabled():
+  return _enabled
+
+def setEnabled(enabled):
+  global _enabled
+  _enabled = enabled
+
+def reset():
+  del _startupSamples[:]
+  _commandSamples.clear()
+
+# Records how long a step of loading Chisel took, e.g. startupPhase('import', 'FBPrintCommands').
+@contextmanager
+def startupPhase(phase, label):
+  if not _enabled:
+    yield
+    return
+
+  startTime = time.time()
+  try:
+    yield
+  finally:
+    _startupSamples.append((phase, label, time.time() - startTime))
+
+def startupSamples():
+  return list(_startupSamples)
+
+class FBCommandSample:
+  def __init__(self, name):
+    self.name = name
+    self.count = 0
+    self.total = 0.0
+    self.phases = {'parse': 0.0, 'evaluate': 0.0, 'output': 0.0}
+
+  def other(self):
+    return max(0.0, self.total - sum(self.phases.values()))
+
+class _FBTimedOutput:
+  def __init__(self, output):
+    self.output = output
+
+  def write(self, string):
+    startTime = time.time()
+    try:
+      self.output.write(string)
+    finally:
+      _recordCommandPhase('output', time.time() - startTime)
+
+  def __getattr__(self, name):
+    return getattr(self.output, name)
+
+# Wraps a single execution of a command. Expression evaluations and writes to
+# stdout made while it runs are attributed to the innermost running command.
+@contextmanager
+def commandExecution(name):
+  _runningCommands.append(name)
+  try:
+    with traceSpan(name, 'command'):
+      with _profiledCommandExecution(name):
+        yield
+  finally:
+    _runningCommands.pop()
+
+@contextmanager
+def _profiledCommandExecution(name):
+  if not _enabled:
+    yield
+    return
+
+  sample = _commandSamples.get(name)
+  if sample is None:
+    sample = _commandSamples[name] = FBCommandSample(name)
+
+  isOutermost = not _activeCommands
+  if isOutermost:
+    sys.stdout = _FBTimedOutput(sys.stdout)
+
+  _activeCommands.append(sample)
+  startTime = time.time()
+  try:
+    yield
+  finally:
+    sample.count += 1
+    sample.total += time.time() - startTime
+    _activeCommands.pop()
+    if isOutermost and isinstance(sys.stdout, _FBTimedOutput):
+      sys.stdout = sys.stdout.output
+
+@contextmanager
+def commandPhase(phase):
+  if not _enabled or not _activeCommands:
+    yield
+    return
+
+  startTime = time.time()
+  try:
+    yield
+  finally:
+    _recordCommandPhase(phase, time.time() - startTime)
+
+def _recordCommandPhase(phase, seconds):
+  if _activeCommands:
+    _activeCommands[-1].phases[phase] += seconds
+
+def commandSamples():
+  return list(_commandSamples.values())
+
+# While tracing, spans for commands, expression evaluations, memory reads and
+# LLDB commands are recorded in the Trace Event Format, which chrome://tracing
+# and https://ui.perfetto.dev can open.
+_traceEvents = None
+_tracePath = None
+_traceStartTime = 0.0
+
+def isTracing():
+  return _traceEvents is not None
+
+def startTracing(path):
+  global _traceEvents, _tracePath, _traceStartTime
+  _traceEvents = []
+  _tracePath = path
+  _traceStartTime = time.time()
+
+# Writes the trace, and returns its path and the number of spans in it.
+def stopTracing():
+  global _traceEvents
+  events, path = _traceEvents, _tracePath
+  _traceEvents = None
+
+  with open(path, 'w') as traceFile:
+    json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, traceFile)
+  return (path, len(events))
+
+# Records a span, e.g. traceSpan('pviews', 'command'). The dictionary it yields
+# is added to the span's arguments, so details that are only known at the end,
+# like the size of a result, can be included.
+@contextmanager
+def traceSpan(name, category, **args):
+  if _traceEvents is None:
+    yield args
+    return
+
+  startTime = time.time()
+  try:
+    yield args
+  finally:
+    endTime = time.time()
+    if _traceEvents is not None:
+      _traceEvents.append({
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': (startTime - _traceStartTime) * 1000000,
+        'dur': (endTime - startTime) * 1000000,
+        'pid': os.getpid(),
+        'tid': threading.current_thread().ident,
+        'args': args,
+      })
+
+# Expression statistics are always collected: their cost is negligible next to
+# evaluating an expression.
+class FBExpressionStatistics:
+  def __init__(self):
+    self.count = 0
+    self.total = 0.0
+    self.failures = 0
+    self.timeouts = 0
+
+  def add(self, seconds, failed, timedOut):
+    self.count += 1
+    self.total += seconds
+    self.failures += int(failed)
+    self.timeouts += int(timedOut)
+
+_expressionStatisticsByCommand = {}
+_expressionStatisticsByExpression = {}
+
+# Addresses and numbers are replaced, so that e.g. [0x7f8e... objectAtIndex:3]
+# is counted with the same expression for every other object and index.
+_literalPattern = re.compile(r'\b0x[0-9a-fA-F]+\b|\b\d+\b')
+
+def recordEvaluation(expression, seconds, failed, timedOut):
+  command = _runningCommands[-1] if _runningCommands else '(script)'
+
+  statistics = _expressionStatisticsByCommand.get(command)
+  if statistics is None:
+    statistics = _expressionStatisticsByCommand[command] = FBExpressionStatistics()
+  statistics.add(seconds, failed, timedOut)
+
+  key = (command, _literalPattern.sub('N', expression))
+  statistics = _expressionStatisticsByExpression.get(key)
+  if statistics is None:
+    statistics = _expressionStatisticsByExpression[key] = FBExpressionStatistics()
+  statistics.add(seconds, failed, timedOut)
+
+def resetExpressionStatistics():
+  _expressionStatisticsByCommand.clear()
+  _expressionStatisticsByExpression.clear()
+
+def printExpressionStatistics(topCount=10):
+  if not _expressionStatisticsByCommand:
+    print 'No expressions have been evaluated yet.'
+    return
+
+  print 'Expression evaluations by command (sorted by total time, in ms):'
+  print '  {:<16} {:>8} {:>10} {:>10} {:>9} {:>9}'.format('command', 'count', 'total', 'average', 'failures', 'timeouts')
+  for command, statistics in sorted(_expressionStatisticsByCommand.items(), key=lambda item: item[1].total, reverse=True):
+    print '  {:<16} {:>8} {:>10.1f} {:>10.1f} {:>9} {:>9}'.format(
+      command,
+      statistics.count,
+      statistics.total * 1000,
+      statistics.total * 1000 / statistics.count,
+      statistics.failures,
+      statistics.timeouts)
+
+  print '\nTop {} expressions by total time (addresses and numbers shown as N):'.format(topCount)
+  expressions = sorted(_expressionStatisticsByExpression.items(), key=lambda item: item[1].total, reverse=True)
+  for (command, expression), statistics in expressions[:topCount]:
+    expression = ' '.join(expression.split())
+    if len(expression) > 100:
+      expression = expression[:97] + '...'
+    print '  {:>10.1f}ms {:>6}x  {:<16} {}'.format(statistics.total * 1000, statistics.count, command, expression)
+
+def printReport():
+  if not _startupSamples and not _commandSamples:
+    if _enabled:
+      print 'Nothing has been profiled yet.'
+    else:
+      print 'Profiling is disabled. Enable it with `chiselprofile --enable`, or set CHISEL_PROFILE=1 before importing fblldb.py to also profile startup.'
+    return
+
+  if _startupSamples:
+    totals = {}
+    for phase, label, seconds in _startupSamples:
+      totals[phase] = totals.get(phase, 0.0) + seconds
+
+    print 'Loading ({:.1f}ms in total):'.format(sum(totals.values()) * 1000)
+    for phase, seconds in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+      print '  {:>10.1f}ms  {}'.format(seconds * 1000, phase)
+
+    print '\nSlowest loading steps:'
+    for phase, label, seconds in sorted(_startupSamples, key=lambda sample: sample[2], reverse=True)[:15]:
+      print '  {:>10.1f}ms  {:<12} {}'.format(seconds * 1000, phase, label)
+
+  if _commandSamples:
+    if _startupSamples:
+      print ''
+    print 'Commands (sorted by total time, in ms):'
+    print '  {:<16} {:>6} {:>10} {:>10} {:>10} {:>10} {:>10}'.format('command', 'calls', 'total', 'parse', 'evaluate', 'output', 'other')
+    for sample in sorted(_commandSamples.values(), key=lambda sample: sample.total, reverse=True):
+      print '  {:<16} {:>6} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+        sample.name,
+        sample.count,
+        sample.total * 1000,
+        sample.phases['parse'] * 1000,
+        sample.phases['evaluate'] * 1000,
+        sample.phases['output'] * 1000,
+        sample.other() * 1000)
@@ -0,0 +1,204 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# Walks trees in the process a chunk at a time. A single expression that walks
+# a screen of tens of thousands of views can run into the evaluation timeout,
+# or return more than can be transferred at once, so walkers visit at most
+# `limit` nodes per call and return them with a token to continue from. The
+# host calls again with the token until the walk is done, and sizes the chunks
+# so that each call takes about a second. Set CHISEL_TRAVERSAL_CHUNK_SIZE to
+# use chunks of a fixed size instead.
+
+import json
+import os
+import re
+import string
+import time
+
+import fblldbbase as fb
+
+def _chunkSizeFromEnvironment():
+  value = os.getenv('CHISEL_TRAVERSAL_CHUNK_SIZE')
+  if not value:
+    return 0
+  try:
+    size = int(value)
+  except ValueError:
+    size = 0
+  if size <= 0:
+    print 'Ignoring CHISEL_TRAVERSAL_CHUNK_SIZE={}: it should be a number of nodes above 0.'.format(value)
+    return 0
+  return size
+
+_fixedChunkSize = _chunkSizeFromEnvironment()
+_initialChunkSize = 5000
+_minimumChunkSize = 64
+_maximumChunkSize = 100000
+_targetChunkSeconds = 1.0
+# Expressions time out after 5 seconds.
+_retrySeconds = 2.5
+
+# A walker visits the tree under root depth first, in the order of children,
+# down to maxDepth levels below root, or all of it if maxDepth is negative.
+# Each call visits at most limit nodes.
+#
+# The state of an unfinished walk is retained between calls, and its address is
+# the token. A call works on a copy of the stack, and only updates the state
+# once it's done, so a call that fails, e.g. times out, leaves the walk where it
+# was and can be retried. The state is released when the walk is done.
+#
+# $prologue runs once per call, and $visit once per node, with node, depth,
+# index (the position of the node in the walk), parent (the index of its
+# parent, or -1 for root) and arguments (the walk's arguments, or nil) in
+# scope. It appends a record for the node to nodes, unless it filters the node
+# out, can add anything else to return to extras, and sets children to the
+# node's children, or leaves it nil if there's nothing below the node. index
+# and parent count every node visited, so they only match positions in nodes
+# if the walker records every node.
+_walkerTemplate = """
+NSDictionary *(^$name)(id, id, NSInteger, NSInteger, NSString *) = ^NSDictionary *(id root, id token, NSInteger limit, NSInteger maxDepth, NSString *argumentsJSON) {
+  NSMutableDictionary *state = (NSMutableDictionary *)token;
+  if (state == nil) {
+    state = (NSMutableDictionary *)[[[NSMutableDictionary alloc] init] autorelease];
+    [state setObject:(id)[NSMutableArray arrayWithObject:@[root, @(-1), @0]] forKey:@"stack"];
+    [state setObject:@0 forKey:@"count"];
+  }
+  NSMutableArray *stack = (NSMutableArray *)[[(id)[state objectForKey:@"stack"] mutableCopy] autorelease];
+  NSInteger index = (NSInteger)[(id)[state objectForKey:@"count"] integerValue];
+  NSMutableArray *nodes = (NSMutableArray *)[NSMutableArray array];
+  NSMutableDictionary *extras = (NSMutableDictionary *)[NSMutableDictionary dictionary];
+  NSDictionary *arguments = argumentsJSON == nil ? nil :
+    (NSDictionary *)[NSJSONSerialization JSONObjectWithData:(NSData *)[argumentsJSON dataUsingEncoding:4] options:0 error:NULL];
+  $prologue
+  NSInteger visited = 0;
+  while ((NSUInteger)[stack count] > 0 && visited < limit) {
+    NSArray *entry = (NSArray *)[[(id)[stack lastObject] retain] autorelease];
+    [stack removeLastObject];
+    id node = (id)[entry objectAtIndex:0];
+    NSInteger parent = (NSInteger)[(id)[entry objectAtIndex:1] integerValue];
+    NSInteger depth = (NSInteger)[(id)[entry objectAtIndex:2] integerValue];
+    NSArray *children = nil;
+    $visit
+    if (children != nil && (maxDepth < 0 || depth < maxDepth)) {
+      for (NSInteger i = (NSInteger)[children count] - 1; i >= 0; i--) {
+        [stack addObject:@[(id)[children objectAtIndex:i], @(index), @(depth + 1)]];
+      }
+    }
+    index++;
+    visited++;
+  }
+  [state setObject:stack forKey:@"stack"];
+  [state setObject:@(index) forKey:@"count"];
+
+  BOOL done = (NSUInteger)[stack count] == 0;
+  if (!done && token == nil) {
+    [state retain];
+  } else if (done && token != nil) {
+    [state release];
+  }
+  id next = done ? (id)[NSNull null] : (id)@((unsigned long long)(uintptr_t)state);
+  return @{@"nodes": nodes, @"extras": extras, @"visited": @(visited), @"token": next};
+};
+"""
+
+_addressPattern = re.compile(r'^\s*(\(\s*\w+\s*\*?\s*\))?\s*(0x[0-9a-fA-F]+)\s*$')
+
+# Returns the address of the root of a walk, without an evaluation if it's given
+# as one, e.g. '(id)0x7f9c3a40c2d0'.
+def rootAddress(expression):
+  match = _addressPattern.match(expression)
+  if match:
+    return int(match.group(2), 16)
+  return fb.evaluatePointer(expression)
+
+# Returns the declaration of a walker, for evaluateFunction(), with the code
+# that visits each node, and runs at the start of each call.
+def walkerDeclaration(visit, prologue=''):
+  return string.Template(_walkerTemplate).safe_substitute(visit=visit, prologue=prologue)
+
+class FBTraversalChunk(object):
+  def __init__(self, nodes, extras, visited, start, done):
+    # The records the walker appended, and the index of the first of them in
+    # the walk.
+    self.nodes = nodes
+    self.extras = extras
+    # The number of nodes visited, which is more than the number of records if
+    # the walker filtered some out.
+    self.visited = visited
+    self.start = start
+    # Whether this is the last chunk of a walk that finished.
+    self.done = done
+
+# Yields the chunks of a walk of the tree under root, which is an address, with
+# the walker defined by declaration. arguments, if given, is a dictionary that
+# can be converted to JSON, for the walker, e.g. the filters to apply. An
+# abandoned walk, e.g. one that's interrupted, releases its state in the
+# process at the next transfer.
+def walk(name, declaration, root, maxDepth=None, arguments=None, chunkSize=None):
+  maxDepth = -1 if maxDepth is None else int(maxDepth)
+  # Encoding the JSON text as JSON again gives a valid string literal.
+  argumentsJSON = '@' + json.dumps(json.dumps(arguments)) if arguments is not None else 'nil'
+
+  def fetch(token, limit):
+    result, error = fb.evaluateFunctionWithError(name, declaration, '(id)0x{:x}, (id)0x{:x}, (NSInteger){}, (NSInteger){}, (NSString *){}'.format(
+      root, token or 0, limit, maxDepth, argumentsJSON))
+    if error:
+      return (None, error)
+    return ((result['nodes'], result['extras'], result['visited'], result['token']), None)
+
+  return walkChunks(fetch, fb.deferRelease, chunkSize)
+
+# The host side of the protocol, for walkers that don't use the template.
+# fetch(token, limit) returns a ((nodes, extras, visited, token), error) tuple,
+# where token is None once the walk is done. release, if given, is called with the
+# token of a walk that's abandoned.
+#
+# A call that fails after running for a while most likely timed out, so it's
+# retried with a smaller chunk. Otherwise the error is printed, and the walk
+# ends early: its last chunk isn't done.
+def walkChunks(fetch, release=None, chunkSize=None):
+  limit = chunkSize or _fixedChunkSize or _initialChunkSize
+  token = None
+  start = 0
+  try:
+    while True:
+      startTime = time.time()
+      result, error = fetch(token, limit)
+      seconds = time.time() - startTime
+      if error:
+        if seconds >= _retrySeconds and limit > _minimumChunkSize:
+          limit = max(limit // 4, _minimumChunkSize)
+          continue
+        print error
+        return
+
+      nodes, extras, visited, token = result
+      chunk = FBTraversalChunk(nodes, extras, visited, start, token is None)
+      start += len(nodes)
+      fb.visitedNodes(visited)
+      yield chunk
+      if token is None:
+        return
+      if not _fixedChunkSize:
+        limit = _nextChunkSize(limit, seconds)
+  finally:
+    if token is not None and release is not None:
+      release(token)
+
+def _nextChunkSize(limit, seconds):
+  if seconds <= 0:
+    return min(limit * 2, _maximumChunkSize)
+  size = int(limit * _targetChunkSeconds / seconds)
+  return max(_minimumChunkSize, min(size, limit * 2, _maximumChunkSize))
+
+# Yields the records of a walk one by one.
+def walkNodes(name, declaration, root, maxDepth=None, arguments=None, chunkSize=None):
+  for chunk in walk(name, declaration, root, maxDepth, arguments, chunkSize):
+    for node in chunk.nodes:
+      yield node
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# Writes trees line by line, as their nodes are read from the process, rather
+# than building the whole text first. A long walk shows its output right away,
+# and what it printed stands if it's stopped.
+
+import os
+import sys
+
+from contextlib import contextmanager
+from StringIO import StringIO
+
+class FBTreeRenderer:
+  # output is a file-like object, or None for the current sys.stdout. indent is
+  # repeated once per level in front of each node.
+  def __init__(self, output=None, indent='   | '):
+    self.output = output
+    self.indent = indent
+    self.lineCount = 0
+
+  def write(self, line):
+    (self.output or sys.stdout).write(line + '\n')
+    self.lineCount += 1
+
+  # Writes a node at the given depth, or after a prefix of its own.
+  def node(self, text, depth=0, prefix=None):
+    if prefix is None:
+      prefix = self.indent * depth
+    self.write(prefix + text)
+
+  # Walks the tree depth first. visit(node) returns a (text, children) tuple:
+  # the text of the node, or None to skip it, and an iterable of its children,
+  # which is only iterated once the node has been written, so it can be a
+  # generator that reads them from the process.
+  def render(self, root, visit, depth=0):
+    stack = [iter([root])]
+    while stack:
+      child = next(stack[-1], _end)
+      if child is _end:
+        stack.pop()
+        continue
+
+      text, children = visit(child)
+      if text is not None:
+        self.node(text, depth + len(stack) - 1)
+      stack.append(iter(children or ()))
+
+_end = object()
+
+# Yields a renderer that writes to the file at path, or to the console if path
+# is empty, e.g. for a command's --output option.
+@contextmanager
+def openRenderer(path=None, indent='   | '):
+  if not path:
+    yield FBTreeRenderer(indent=indent)
+    return
+
+  with open(os.path.abspath(os.path.expanduser(path)), 'w') as output:
+    renderer = FBTreeRenderer(output, indent)
+    try:
+      yield renderer
+    finally:
+      print 'Wrote {} lines to {}'.format(renderer.lineCount, output.name)
+
+# For callers that need the whole text, e.g. to search it.
+def renderToString(render, indent='   | '):
+  output = StringIO()
+  render(FBTreeRenderer(output, indent))
+  return output.getvalue()
@@ -11,6 +11,8 @@ import lldb
 
 import fblldbbase as fb
 import fblldbobjcruntimehelpers as runtimeHelpers
+import fblldbtreerenderer as treeRenderer
+import fblldbviewsnapshot as viewSnapshot
 
 def presentViewController(viewController):
   vc = '(%s)' % (viewController)
@@ -20,6 +22,7 @@ def presentViewController(viewController):
     
     if notPresented:
       fb.evaluateEffect('[[[[UIApplication sharedApplication] keyWindow] rootViewController] presentViewController:%s animated:YES completion:nil]' % vc)
+      viewSnapshot.invalidateSnapshots()
     else:
       raise Exception('Argument is already presented')
   else:
@@ -33,21 +36,26 @@ def dismissViewController(viewController):
     
     if isPresented:
       fb.evaluateEffect('[(UIViewController *)%s dismissViewControllerAnimated:YES completion:nil]' % vc)
+      viewSnapshot.invalidateSnapshots()
     else:
       raise Exception('Argument must be presented')
   else:
     raise Exception('Argument must be a UIViewController')
 
 def viewControllerRecursiveDescription(vc):
-  return _recursiveViewControllerDescriptionWithPrefixAndChildPrefix(fb.evaluateObjectExpression(vc), '', '', '')
+  return treeRenderer.renderToString(lambda renderer: printViewControllerRecursiveDescription(vc, renderer))
+
+# Writes the description of each view controller as soon as it's read.
+def printViewControllerRecursiveDescription(vc, renderer):
+  _printRecursiveViewControllerDescriptionWithPrefixAndChildPrefix(fb.evaluateObjectExpression(vc), renderer, '', '')
 
 def _viewControllerDescription(viewController):
   vc = '(%s)' % (viewController)
 
   if fb.evaluateBooleanExpression('[(id)%s isViewLoaded]' % (vc)):
-    result = fb.evaluateExpressionValue('(id)[[NSString alloc] initWithFormat:@"<%%@: %%p; view = <%%@; %%p>; frame = (%%g, %%g; %%g, %%g)>", (id)NSStringFromClass((id)[(id)%s class]), %s, (id)[(id)[(id)%s view] class], (id)[(id)%s view], ((CGRect)[(id)[(id)%s view] frame]).origin.x, ((CGRect)[(id)[(id)%s view] frame]).origin.y, ((CGRect)[(id)[(id)%s view] frame]).size.width, ((CGRect)[(id)[(id)%s view] frame]).size.height]' % (vc, vc, vc, vc, vc, vc, vc, vc))
+    result = fb.evaluateExpressionValue('(id)[NSString stringWithFormat:@"<%%@: %%p; view = <%%@; %%p>; frame = (%%g, %%g; %%g, %%g)>", (id)NSStringFromClass((id)[(id)%s class]), %s, (id)[(id)[(id)%s view] class], (id)[(id)%s view], ((CGRect)[(id)[(id)%s view] frame]).origin.x, ((CGRect)[(id)[(id)%s view] frame]).origin.y, ((CGRect)[(id)[(id)%s view] frame]).size.width, ((CGRect)[(id)[(id)%s view] frame]).size.height]' % (vc, vc, vc, vc, vc, vc, vc, vc))
   else:
-    result = fb.evaluateExpressionValue('(id)[[NSString alloc] initWithFormat:@"<%%@: %%p; view not loaded>", (id)NSStringFromClass((id)[(id)%s class]), %s]' % (vc, vc))
+    result = fb.evaluateExpressionValue('(id)[NSString stringWithFormat:@"<%%@: %%p; view not loaded>", (id)NSStringFromClass((id)[(id)%s class]), %s]' % (vc, vc))
 
   if result.GetError() is not None and str(result.GetError()) != 'success':
     return '[Error getting description.]'
@@ -55,25 +63,25 @@ def _viewControllerDescription(viewController):
     return result.GetObjectDescription()
 
 
-def _recursiveViewControllerDescriptionWithPrefixAndChildPrefix(vc, string, prefix, childPrefix):
+def _printRecursiveViewControllerDescriptionWithPrefixAndChildPrefix(vc, renderer, prefix, childPrefix):
+  fb.visitedNodes()
   isMac = runtimeHelpers.isMacintoshArch()
 
-  s = '%s%s%s\n' % (prefix, '' if prefix == '' else ' ', _viewControllerDescription(vc))
+  renderer.node(_viewControllerDescription(vc), prefix='' if prefix == '' else prefix + ' ')
 
   nextPrefix = childPrefix + '   |'
 
-  numChildViewControllers = fb.evaluateIntegerExpression('(int)[(id)[%s childViewControllers] count]' % (vc))
+  numChildViewControllers = fb.evaluateUnsigned('[(id)[%s childViewControllers] count]' % (vc))
 
   for i in range(0, numChildViewControllers):
     viewController = fb.evaluateExpression('(id)[(id)[%s childViewControllers] objectAtIndex:%d]' % (vc, i))
-    s += _recursiveViewControllerDescriptionWithPrefixAndChildPrefix(viewController, string, nextPrefix, nextPrefix)
+    _printRecursiveViewControllerDescriptionWithPrefixAndChildPrefix(viewController, renderer, nextPrefix, nextPrefix)
 
   if not isMac:
     isModal = fb.evaluateBooleanExpression('%s != nil && ((id)[(id)[(id)%s presentedViewController] presentingViewController]) == %s' % (vc, vc, vc))
 
     if isModal:
       modalVC = fb.evaluateObjectExpression('(id)[(id)%s presentedViewController]' % (vc))
-      s += _recursiveViewControllerDescriptionWithPrefixAndChildPrefix(modalVC, string, childPrefix + '  *M', nextPrefix)
-      s += '\n// \'*M\' means the view controller is presented modally.'
-
-  return string + s
+      _printRecursiveViewControllerDescriptionWithPrefixAndChildPrefix(modalVC, renderer, childPrefix + '  *M', nextPrefix)
+      renderer.write('')
+      renderer.write('// \'*M\' means the view controller is presented modally.')
@@ -10,43 +10,89 @@
 import lldb
 
 import fblldbbase as fb
+import fblldbgeometry as geometry
 import fblldbobjcruntimehelpers as runtimeHelpers
+import fblldbtraversal as traversal
+import fblldbtreerenderer as treeRenderer
+import fblldbviewsnapshot as viewSnapshot
 
 def flushCoreAnimationTransaction():
   fb.evaluateEffect('[CATransaction flush]')
 
 def setViewHidden(object, hidden):
   fb.evaluateEffect('[{} setHidden:{}]'.format(object, int(hidden)))
+  viewSnapshot.invalidateSnapshots()
   flushCoreAnimationTransaction()
 
+def keyWindow():
+  return fb.evaluateObjectExpression('[[UIApplication sharedApplication] keyWindow]', cacheable=True)
+
 def maskView(viewOrLayer, color, alpha):
+  window = keyWindow()
+  # The mask goes on top of the window's subviews, so the rect of the view
+  # doesn't depend on whether it's masked already.
+  rect = _windowRect(viewOrLayer, window)
   unmaskView(viewOrLayer)
-  window = fb.evaluateExpression('(UIWindow *)[[UIApplication sharedApplication] keyWindow]')
-  origin = convertPoint(0, 0, viewOrLayer, window)
-  size = fb.evaluateExpressionValue('(CGSize)((CGRect)[(id)%s frame]).size' % viewOrLayer)
+  if rect is None:
+    x, y = convertPoint(0, 0, viewOrLayer, window)
+    _, _, width, height = fb.evaluateRect('[(id)%s frame]' % viewOrLayer)
+    rect = (x, y, width, height)
 
-  rectExpr = '(CGRect){{%s, %s}, {%s, %s}}' % (origin.GetChildMemberWithName('x').GetValue(),
-                                               origin.GetChildMemberWithName('y').GetValue(),
-                                               size.GetChildMemberWithName('width').GetValue(),
-                                               size.GetChildMemberWithName('height').GetValue())
-  mask = fb.evaluateExpression('(id)[[UIView alloc] initWithFrame:%s]' % rectExpr)
+  rectExpr = '(CGRect){{%r, %r}, {%r, %r}}' % rect
+  mask = fb.evaluateExpression('(id)[[[UIView alloc] initWithFrame:%s] autorelease]' % rectExpr)
 
   fb.evaluateEffect('[%s setTag:(NSInteger)%s]' % (mask, viewOrLayer))
   fb.evaluateEffect('[%s setBackgroundColor:[UIColor %sColor]]' % (mask, color))
   fb.evaluateEffect('[%s setAlpha:(CGFloat)%s]' % (mask, alpha))
   fb.evaluateEffect('[%s addSubview:%s]' % (window, mask))
+  viewSnapshot.invalidateSnapshots()
   flushCoreAnimationTransaction()
 
 def unmaskView(viewOrLayer):
-  window = fb.evaluateExpression('(UIWindow *)[[UIApplication sharedApplication] keyWindow]')
+  window = keyWindow()
   mask = fb.evaluateExpression('(UIView *)[%s viewWithTag:(NSInteger)%s]' % (window, viewOrLayer))
   fb.evaluateEffect('[%s removeFromSuperview]' % mask)
+  viewSnapshot.invalidateSnapshots()
   flushCoreAnimationTransaction()
 
+# Views and layers in the key window are converted on the host, with the
+# geometry of a snapshot of the window. Others, e.g. layers that aren't a
+# view's, are converted by the process.
 def convertPoint(x, y, fromViewOrLayer, toViewOrLayer):
+  snapshot, nodes = _snapshotNodes(keyWindow(), fromViewOrLayer, toViewOrLayer)
+  if snapshot is not None:
+    point = geometry.geometry(snapshot).convertPoint(x, y, *nodes)
+    if point is not None:
+      return point
+
   fromLayer = convertToLayer(fromViewOrLayer)
   toLayer = convertToLayer(toViewOrLayer)
-  return fb.evaluateExpressionValue('(CGPoint)[%s convertPoint:(CGPoint){ .x = %s, .y = %s } toLayer:(CALayer *)%s]' % (fromLayer, x, y, toLayer))
+  return fb.evaluatePoint('[%s convertPoint:(CGPoint){ .x = %s, .y = %s } toLayer:(CALayer *)%s]' % (fromLayer, x, y, toLayer))
+
+# Returns the (x, y, width, height) rect the view or layer covers in the key
+# window, or None if it isn't in the window's snapshot.
+def _windowRect(viewOrLayer, window):
+  snapshot, nodes = _snapshotNodes(window, viewOrLayer)
+  if snapshot is None:
+    return None
+  return geometry.geometry(snapshot).rect(nodes[0])
+
+# Returns a snapshot of window and the nodes of the views or layers in it, or
+# (None, None) if any of them isn't in it.
+def _snapshotNodes(window, *viewsOrLayers):
+  if not window:
+    return (None, None)
+  snapshot = viewSnapshot.snapshotView(window)
+  if snapshot is None:
+    return (None, None)
+  nodes = []
+  for viewOrLayer in viewsOrLayers:
+    address = traversal.rootAddress(viewOrLayer)
+    node = snapshot.node(address) or snapshot.nodeForLayer(address) if address else None
+    if node is None:
+      return (None, None)
+    nodes.append(node)
+  return (snapshot, nodes)
 
 def convertToLayer(viewOrLayer):
   if fb.evaluateBooleanExpression('[(id)%s isKindOfClass:(Class)[CALayer class]]' % viewOrLayer):
@@ -57,10 +103,10 @@ def convertToLayer(viewOrLayer):
     raise Exception('Argument must be a CALayer, UIView, or NSView.')
 
 def isUIView(obj):
-    return not runtimeHelpers.isMacintoshArch() and fb.evaluateBooleanExpression('[(id)%s isKindOfClass:(Class)[UIView class]]' % obj)
+    return not runtimeHelpers.isMacintoshArch() and fb.evaluateBooleanExpression('[(id)%s isKindOfClass:(Class)[UIView class]]' % obj, cacheable=True)
 
 def isNSView(obj):
-    return runtimeHelpers.isMacintoshArch() and fb.evaluateBooleanExpression('[(id)%s isKindOfClass:(Class)[NSView class]]' % obj)
+    return runtimeHelpers.isMacintoshArch() and fb.evaluateBooleanExpression('[(id)%s isKindOfClass:(Class)[NSView class]]' % obj, cacheable=True)
 
 def isView(obj):
     return isUIView(obj) or isNSView(obj)
@@ -69,48 +115,114 @@ def isView(obj):
 # Yields a tuple of the current view in the tree and its level (view, level)
 def subviewsOfView(view):
   views = [(view, 0)]
+  fb.visitedNodes()
   yield views[0]
   while views:
     (view, level) = views.pop(0)
     subviews = fb.evaluateExpression('(id)[%s subviews]' % view)
-    subviewsCount = int(fb.evaluateExpression('(int)[(id)%s count]' % subviews))
+    subviewsCount = fb.evaluateUnsigned('[(id)%s count]' % subviews)
     for i in xrange(subviewsCount):
       subview = fb.evaluateExpression('(id)[%s objectAtIndex:%i]' % (subviews, i))
       views.append((subview, level+1))
+      fb.visitedNodes()
       yield (subview, level+1)
 
 def upwardsRecursiveDescription(view, maxDepth=0):
+  description = treeRenderer.renderToString(lambda renderer: printUpwardsRecursiveDescription(view, renderer, maxDepth))
+  return description or None
+
+# Prints the view's superviews from the top down, and the view last. The chain
+# is found first, so each description can be written as soon as it's read.
+# Returns False if view isn't a view.
+def printUpwardsRecursiveDescription(view, renderer, maxDepth=0):
   if not fb.evaluateBooleanExpression('[(id)%s isKindOfClass:(Class)[UIView class]]' % view) and not fb.evaluateBooleanExpression('[(id)%s isKindOfClass:(Class)[NSView class]]' % view):
-    return None
+    return False
 
   currentView = view
-  recursiveDescription = []
-  depth = 0
+  views = []
 
-  while currentView and (maxDepth <= 0 or depth <= maxDepth):
-    depth += 1
+  while currentView and (maxDepth <= 0 or len(views) <= maxDepth):
+    fb.visitedNodes()
+    views.insert(0, currentView)
+    superview = fb.evaluatePointer('[%s superview]' % (currentView))
+    currentView = '0x%x' % superview if superview else None
 
+  depth = 0
+  for currentView in views:
     viewDescription = fb.evaluateExpressionValue('(id)[%s debugDescription]' % (currentView)).GetObjectDescription()
-    currentView = fb.evaluateExpression('(void*)[%s superview]' % (currentView))
-    try:
-      if int(currentView, 0) == 0:
-        currentView = None
-    except:
-      currentView = None
-
     if viewDescription:
-      recursiveDescription.insert(0, viewDescription)
-
-  if not len(viewDescription):
-    return None
-
-  currentPrefix = ""
-  builder = ""
-  for viewDescription in recursiveDescription:
-    builder += currentPrefix + viewDescription + "\n"
-    currentPrefix += "   | "
-
-  return builder
+      renderer.node(viewDescription, depth)
+      depth += 1
+
+  return True
+
+# Each record is [depth, description]. Only the views that match all of the
+# filters in arguments are recorded, but the walk goes on below those that
+# don't.
+_descriptionWalker = traversal.walkerDeclaration(prologue="""
+  NSString *classPattern = (NSString *)[arguments objectForKey:@"class"];
+  NSRegularExpression *classExpression = nil;
+  if (classPattern != nil) {
+    classExpression = (NSRegularExpression *)[NSRegularExpression regularExpressionWithPattern:classPattern options:1 error:NULL];
+    if (classExpression == nil) {
+      (void)[NSException raise:@"Invalid class pattern" format:@"%@", classPattern];
+    }
+  }
+  BOOL hiddenOnly = (BOOL)[(id)[arguments objectForKey:@"hidden"] boolValue];
+  BOOL zeroSizeOnly = (BOOL)[(id)[arguments objectForKey:@"zeroSize"] boolValue];
+  BOOL offscreenOnly = (BOOL)[(id)[arguments objectForKey:@"offscreen"] boolValue];
+""", visit="""
+    BOOL matches = YES;
+    if (classExpression != nil) {
+      NSString *className = (NSString *)NSStringFromClass((Class)[node class]);
+      matches = (NSUInteger)[classExpression numberOfMatchesInString:className options:0 range:NSMakeRange(0, (NSUInteger)[className length])] > 0;
+    }
+    if (matches && hiddenOnly) {
+      matches = (BOOL)[node isHidden];
+    }
+    if (matches && zeroSizeOnly) {
+      CGRect bounds = (CGRect)[node bounds];
+      matches = bounds.size.width == 0 || bounds.size.height == 0;
+    }
+    if (matches && offscreenOnly) {
+      id window = (id)[node window];
+      if (window != nil) {
+        CGRect visibleRect = (BOOL)[window respondsToSelector:@selector(bounds)] ? (CGRect)[window bounds] : (CGRect)[(id)[window contentView] frame];
+        matches = !CGRectIntersectsRect((CGRect)[node convertRect:(CGRect)[node bounds] toView:nil], visibleRect);
+      }
+    }
+    if (matches) {
+      [nodes addObject:@[@(depth), (id)[node description] ?: @""]];
+    }
+    children = (NSArray *)[node subviews];
+""")
+
+# Prints the view and its subviews like recursiveDescription, down to maxDepth
+# levels below the view, or all of them if maxDepth is 0. The tree is read a
+# chunk at a time, and each chunk is written as soon as it's read.
+#
+# The filters run in the process, so only the views they match are read: those
+# whose class matches the classPattern regex (case insensitively), that are
+# hidden, that have no width or height, or that are outside their window. A
+# view that's printed is still indented by its depth below view.
+def printRecursiveDescription(view, renderer, maxDepth=0, classPattern=None, hidden=False, zeroSize=False, offscreen=False):
+  address = traversal.rootAddress(view)
+  if not address:
+    return
+
+  filters = {}
+  if classPattern is not None:
+    filters['class'] = classPattern
+  if hidden:
+    filters['hidden'] = True
+  if zeroSize:
+    filters['zeroSize'] = True
+  if offscreen:
+    filters['offscreen'] = True
+
+  for chunk in traversal.walk('viewDescriptions', _descriptionWalker, address, maxDepth if maxDepth > 0 else None, filters or None):
+    for depth, description in chunk.nodes:
+      renderer.node(description.encode('utf-8'), depth)
 
 def slowAnimation(speed=1):
   fb.evaluateEffect('[[[UIApplication sharedApplication] windows] setValue:@(%s) forKeyPath:@"layer.speed"]' % speed)
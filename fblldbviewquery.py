@@ -0,0 +1,139 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# Finds views in a snapshot without going back to the process. A snapshot is
+# indexed by class (and superclasses), accessibility identifier and label, tag
+# and visibility the first time it's queried, and queries combine these
+# indexes with predicates that run on the host, e.g.
+#
+#   query(snapshot).kindOf('UIButton').visible().intersects((0, 0, 320, 44)).all()
+
+import re
+
+from collections import defaultdict
+
+import fblldbgeometry as geometry
+
+class FBViewIndex:
+  def __init__(self, snapshot):
+    self.snapshot = snapshot
+    self.byClass = defaultdict(list)
+    self.byIdentifier = defaultdict(list)
+    self.byLabel = defaultdict(list)
+    self.byTag = defaultdict(list)
+    self.visible = []
+    self.hidden = []
+
+    # Nodes are depth first, so a view's superview is always indexed before it.
+    visible = {}
+    for node in snapshot.nodes:
+      self.byClass[node.className].append(node)
+      for superclass in node.superclasses:
+        self.byClass[superclass].append(node)
+      if node.accessibilityIdentifier is not None:
+        self.byIdentifier[node.accessibilityIdentifier].append(node)
+      if node.accessibilityLabel is not None:
+        self.byLabel[node.accessibilityLabel].append(node)
+      self.byTag[node.tag].append(node)
+
+      # Like UIKit, a view that's hidden or almost transparent hides its subviews.
+      isVisible = not node.hidden and (node.alpha is None or node.alpha >= 0.01)
+      if node.parent is not None:
+        isVisible = isVisible and visible[node.parent.index]
+      visible[node.index] = isVisible
+      (self.visible if isVisible else self.hidden).append(node)
+
+  # Returns an (x, y, width, height) tuple for the frame of the node in the
+  # coordinates of the root of the snapshot, or None if it isn't known.
+  def windowFrame(self, node):
+    return geometry.geometry(self.snapshot).rect(node)
+
+def _intersects(rect, other):
+  return (rect[0] < other[0] + other[2] and other[0] < rect[0] + rect[2] and
+    rect[1] < other[1] + other[3] and other[1] < rect[1] + rect[3])
+
+class FBViewQuery:
+  def __init__(self, index):
+    self.index = index
+    # The indexes narrow down the candidates, and the predicates then run on
+    # each of them.
+    self._candidates = None
+    self._predicates = []
+
+  def _narrow(self, nodes):
+    indexes = set(node.index for node in nodes)
+    self._candidates = indexes if self._candidates is None else self._candidates & indexes
+    return self
+
+  def _where(self, predicate):
+    self._predicates.append(predicate)
+    return self
+
+  # Views of the class, or of one of its subclasses.
+  def kindOf(self, className):
+    return self._narrow(self.index.byClass.get(className, ()))
+
+  def classMatches(self, regex, flags=re.IGNORECASE):
+    pattern = re.compile(regex, flags)
+    return self._where(lambda node: pattern.search(node.className) is not None)
+
+  def identifier(self, identifier):
+    return self._narrow(self.index.byIdentifier.get(identifier, ()))
+
+  def label(self, label):
+    return self._narrow(self.index.byLabel.get(label, ()))
+
+  def labelMatches(self, regex, flags=re.IGNORECASE):
+    pattern = re.compile(regex, flags)
+    return self._where(lambda node: node.accessibilityLabel is not None and pattern.search(node.accessibilityLabel) is not None)
+
+  def tag(self, tag):
+    return self._narrow(self.index.byTag.get(tag, ()))
+
+  # Views that are on screen, as far as their own and their superviews' hidden
+  # and alpha go, or, if visible is False, views that aren't.
+  def visible(self, visible=True):
+    return self._narrow(self.index.visible if visible else self.index.hidden)
+
+  def firstResponder(self):
+    return self._where(lambda node: node.firstResponder)
+
+  # Views whose frame, in the coordinates of the root of the snapshot,
+  # intersects the (x, y, width, height) rect.
+  def intersects(self, rect):
+    def predicate(node):
+      frame = self.index.windowFrame(node)
+      return frame is not None and _intersects(frame, rect)
+    return self._where(predicate)
+
+  # Views for which predicate(node) is True.
+  def where(self, predicate):
+    return self._where(predicate)
+
+  # Yields the matching views, depth first.
+  def __iter__(self):
+    nodes = self.index.snapshot.nodes
+    if self._candidates is not None:
+      nodes = [nodes[index] for index in sorted(self._candidates)]
+    for node in nodes:
+      if all(predicate(node) for predicate in self._predicates):
+        yield node
+
+  def all(self):
+    return list(self)
+
+  def first(self):
+    return next(iter(self), None)
+
+# Starts a query over the snapshot. The snapshot is indexed the first time it's
+# queried.
+def query(snapshot):
+  if snapshot.index is None:
+    snapshot.index = FBViewIndex(snapshot)
+  return FBViewQuery(snapshot.index)
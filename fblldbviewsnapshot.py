@@ -0,0 +1,273 @@
+#!/usr/bin/python
+
+# Copyright (c) 2017, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree. An additional grant
+# of patent rights can be found in the PATENTS file in the same directory.
+
+# Walking a view tree with an expression per subview, count and objectAtIndex:
+# takes thousands of evaluations on a real screen. A snapshot captures the whole
+# tree with an injected walker instead, a few thousand views per call, and
+# returns it as FBViewNode objects that commands can walk without going back to
+# the process.
+
+import os
+
+import lldb
+import fblldbbase as fb
+import fblldbtraversal as traversal
+
+class FBViewNode(object):
+  __slots__ = ('index', 'address', 'className', 'superclasses', 'frame', 'bounds', 'hidden', 'alpha',
+    'layer', 'ambiguous', 'tag', 'accessibilityIdentifier', 'accessibilityLabel', 'firstResponder',
+    'center', 'position', 'anchorPoint', 'transform', 'userInteractionEnabled', 'clipsToBounds',
+    'depth', 'parent', 'children')
+
+  def __init__(self, index, address, className, superclasses, frame, bounds, hidden, alpha, layer, ambiguous,
+      tag, accessibilityIdentifier, accessibilityLabel, firstResponder, center, position, anchorPoint, transform,
+      userInteractionEnabled, clipsToBounds, depth, parent):
+    # The position of the node in FBViewSnapshot.nodes.
+    self.index = index
+    self.address = address
+    self.className = className
+    # The names of the superclasses, nearest first.
+    self.superclasses = superclasses
+    # frame and bounds are (x, y, width, height) tuples. Values that aren't
+    # finite, e.g. NaN, are None.
+    self.frame = frame
+    self.bounds = bounds
+    self.hidden = hidden
+    self.alpha = alpha
+    self.layer = layer
+    self.ambiguous = ambiguous
+    self.tag = tag
+    # The accessibility identifier and label are None if they're nil.
+    self.accessibilityIdentifier = accessibilityIdentifier
+    self.accessibilityLabel = accessibilityLabel
+    self.firstResponder = firstResponder
+    # The geometry of the view's layer, which fblldbgeometry places it with:
+    # position and anchorPoint are (x, y) tuples, and transform is the layer's
+    # affine transform, an (a, b, c, d, tx, ty) tuple. They're None if the view
+    # has no layer, and center is None if the view has no center, e.g. an
+    # NSView.
+    self.center = center
+    self.position = position
+    self.anchorPoint = anchorPoint
+    self.transform = transform
+    # Views that don't have these, e.g. NSViews, receive events and don't clip.
+    self.userInteractionEnabled = userInteractionEnabled
+    self.clipsToBounds = clipsToBounds
+    # The depth below the root of the snapshot, which is at depth 0.
+    self.depth = depth
+    self.parent = parent
+    self.children = []
+
+  # An expression for the view, e.g. '(id)0x7f9c3a40c2d0'.
+  def expression(self):
+    return '(id)0x%x' % self.address
+
+  def layerExpression(self):
+    return '(CALayer *)0x%x' % self.layer
+
+  def isKindOfClass(self, className):
+    return className == self.className or className in self.superclasses
+
+  # Yields the node and its descendants depth first, in the order of subviews,
+  # down to maxDepth levels below the node if it's given.
+  def walk(self, maxDepth=None):
+    stack = [self]
+    while stack:
+      node = stack.pop()
+      yield node
+      if maxDepth is None or node.depth - self.depth < maxDepth:
+        stack.extend(reversed(node.children))
+
+  def __repr__(self):
+    return '<FBViewNode %s: 0x%x>' % (self.className, self.address)
+
+class FBViewSnapshot(object):
+  def __init__(self, root, nodes):
+    self.root = root
+    # Every node, depth first.
+    self.nodes = nodes
+    self._nodesByAddress = dict((node.address, node) for node in nodes)
+    self._nodesByLayer = dict((node.layer, node) for node in nodes if node.layer)
+    # The fblldbviewquery.FBViewIndex of the snapshot, once it's been queried,
+    # and its fblldbgeometry.FBViewGeometry, once it's been computed.
+    self.index = None
+    self.geometry = None
+
+  def __len__(self):
+    return len(self.nodes)
+
+  def node(self, address):
+    return self._nodesByAddress.get(address)
+
+  # The node of the view whose layer is at address.
+  def nodeForLayer(self, address):
+    return self._nodesByLayer.get(address)
+
+  def nodesUpToDepth(self, depth):
+    return [node for node in self.nodes if node.depth <= depth]
+
+# Each node is a flat array, so that the result is small and quick to
+# serialize: [address, class, parent index, depth, frame (4), bounds (4),
+# hidden, alpha, layer, ambiguous layout, tag, accessibility identifier and
+# label, first responder, center, layer geometry, user interaction enabled,
+# clips to bounds]. center is [x, y], and the layer geometry is [position (2),
+# anchor point (2), affine transform (6)], or null if the view has no center or
+# layer. The superclasses of each class are
+# listed once per chunk, in classes.
+_snapshotFunction = traversal.walkerDeclaration(prologue="""
+  NSMutableDictionary *classes = (NSMutableDictionary *)[NSMutableDictionary dictionary];
+  [extras setObject:classes forKey:@"classes"];
+  id (^number)(CGFloat) = ^id (CGFloat value) {
+    return __builtin_isfinite(value) ? (id)[NSNumber numberWithDouble:(double)value] : (id)[NSNull null];
+  };
+""", visit="""
+    id view = node;
+    NSString *className = (NSString *)NSStringFromClass((Class)[view class]);
+    if ([classes objectForKey:className] == nil) {
+      NSMutableArray *superclasses = (NSMutableArray *)[NSMutableArray array];
+      for (Class cls = (Class)class_getSuperclass((Class)[view class]); cls != nil; cls = (Class)class_getSuperclass(cls)) {
+        [superclasses addObject:(NSString *)NSStringFromClass(cls)];
+      }
+      [classes setObject:superclasses forKey:className];
+    }
+
+    CGRect frame = (CGRect)[view frame];
+    CGRect bounds = (CGRect)[view bounds];
+    CGFloat alpha = (BOOL)[view respondsToSelector:@selector(alpha)] ? (CGFloat)[view alpha] : (CGFloat)[view alphaValue];
+    BOOL ambiguous = (BOOL)[view respondsToSelector:@selector(hasAmbiguousLayout)] && (BOOL)[view hasAmbiguousLayout];
+    NSInteger tag = (BOOL)[view respondsToSelector:@selector(tag)] ? (NSInteger)[view tag] : 0;
+    id identifier = (BOOL)[view respondsToSelector:@selector(accessibilityIdentifier)] ? (id)[view accessibilityIdentifier] : nil;
+    id label = (BOOL)[view respondsToSelector:@selector(accessibilityLabel)] ? (id)[view accessibilityLabel] : nil;
+    BOOL firstResponder = (BOOL)[view respondsToSelector:@selector(isFirstResponder)] && (BOOL)[view isFirstResponder];
+    id center = (id)[NSNull null];
+    if ((BOOL)[view respondsToSelector:@selector(center)]) {
+      CGPoint point = (CGPoint)[view center];
+      center = @[number(point.x), number(point.y)];
+    }
+    CALayer *layer = (CALayer *)[view layer];
+    id geometry = (id)[NSNull null];
+    if (layer != nil) {
+      CGPoint position = (CGPoint)[layer position];
+      CGPoint anchorPoint = (CGPoint)[layer anchorPoint];
+      CGAffineTransform transform = (CGAffineTransform)[layer affineTransform];
+      geometry = @[number(position.x), number(position.y), number(anchorPoint.x), number(anchorPoint.y),
+        number(transform.a), number(transform.b), number(transform.c), number(transform.d), number(transform.tx), number(transform.ty)];
+    }
+    BOOL userInteractionEnabled = !(BOOL)[view respondsToSelector:@selector(isUserInteractionEnabled)] || (BOOL)[view isUserInteractionEnabled];
+    BOOL clipsToBounds = (BOOL)[view respondsToSelector:@selector(clipsToBounds)] && (BOOL)[view clipsToBounds];
+    [nodes addObject:@[
+      @((unsigned long long)(uintptr_t)view), className, @(parent), @(depth),
+      number(frame.origin.x), number(frame.origin.y), number(frame.size.width), number(frame.size.height),
+      number(bounds.origin.x), number(bounds.origin.y), number(bounds.size.width), number(bounds.size.height),
+      @((BOOL)[view isHidden]), number(alpha), @((unsigned long long)(uintptr_t)layer), @(ambiguous),
+      @(tag), identifier ?: (id)[NSNull null], label ?: (id)[NSNull null], @(firstResponder), center, geometry,
+      @(userInteractionEnabled), @(clipsToBounds)
+    ]];
+    children = (NSArray *)[view subviews];
+""")
+
+# Snapshots are reused by later commands until the process resumes: like the
+# expression cache, they're scoped to the process's stop ID, and they're
+# discarded whenever it is invalidated, e.g. by fb.evaluateEffect(). Commands
+# that change views some other way, e.g. settext, call invalidateSnapshots().
+# Set CHISEL_SNAPSHOT_CACHE=0 to disable it.
+_snapshotCacheEnabled = os.getenv('CHISEL_SNAPSHOT_CACHE', '1') not in ('', '0')
+_snapshots = {}
+_snapshotScope = None
+_snapshotCacheStatistics = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+def isSnapshotCacheEnabled():
+  return _snapshotCacheEnabled
+
+def setSnapshotCacheEnabled(enabled):
+  global _snapshotCacheEnabled
+  _snapshotCacheEnabled = enabled
+  invalidateSnapshots()
+
+def invalidateSnapshots():
+  if _snapshots:
+    _snapshots.clear()
+    _snapshotCacheStatistics['invalidations'] += 1
+
+fb.addInvalidationHook(invalidateSnapshots)
+
+def snapshotCacheStatistics():
+  return dict(_snapshotCacheStatistics, size=len(_snapshots))
+
+def resetSnapshotCacheStatistics():
+  for key in _snapshotCacheStatistics:
+    _snapshotCacheStatistics[key] = 0
+
+def _snapshotCacheKey(address, maxDepth):
+  global _snapshotScope
+
+  process = lldb.debugger.GetSelectedTarget().GetProcess()
+  scope = (process.GetUniqueID(), process.GetStopID())
+  if scope != _snapshotScope:
+    invalidateSnapshots()
+    _snapshotScope = scope
+
+  return (address, maxDepth)
+
+# Captures the tree of view in a few evaluations, down to maxDepth levels
+# below it, or all of it if maxDepth is None. A snapshot of the same view taken
+# since the process stopped is reused, unless refresh is True. Returns an
+# FBViewSnapshot, which must not be modified, or None if the tree couldn't be
+# read.
+def snapshotView(view, maxDepth=None, refresh=False):
+  address = traversal.rootAddress(view)
+  if not address:
+    return None
+
+  maxDepth = -1 if maxDepth is None else int(maxDepth)
+  cacheKey = None
+  if _snapshotCacheEnabled:
+    cacheKey = _snapshotCacheKey(address, maxDepth)
+    snapshot = None if refresh else _snapshots.get(cacheKey)
+    if snapshot is not None:
+      _snapshotCacheStatistics['hits'] += 1
+      return snapshot
+    _snapshotCacheStatistics['misses'] += 1
+
+  snapshot = _takeSnapshot(address, maxDepth)
+  if cacheKey is not None and snapshot is not None:
+    _snapshots[cacheKey] = snapshot
+  return snapshot
+
+def _string(value):
+  return value.encode('utf-8') if value is not None else None
+
+def _takeSnapshot(address, maxDepth):
+  classes = {}
+  nodes = []
+  done = False
+  for chunk in traversal.walk('viewSnapshot', _snapshotFunction, address, maxDepth):
+    for className, superclasses in chunk.extras['classes'].iteritems():
+      classes[className.encode('utf-8')] = tuple(superclass.encode('utf-8') for superclass in superclasses)
+    for values in chunk.nodes:
+      address, className, parentIndex, depth = values[0:4]
+      className = className.encode('utf-8')
+      parent = nodes[parentIndex] if parentIndex >= 0 else None
+      center, geometry = values[20:22]
+      if geometry is not None:
+        position, anchorPoint, transform = tuple(geometry[0:2]), tuple(geometry[2:4]), tuple(geometry[4:10])
+      else:
+        position = anchorPoint = transform = None
+      node = FBViewNode(len(nodes), address, className, classes[className], tuple(values[4:8]), tuple(values[8:12]),
+        bool(values[12]), values[13], values[14], bool(values[15]), values[16], _string(values[17]), _string(values[18]),
+        bool(values[19]), tuple(center) if center is not None else None, position, anchorPoint, transform,
+        bool(values[22]), bool(values[23]), depth, parent)
+      if parent is not None:
+        parent.children.append(node)
+      nodes.append(node)
+    done = chunk.done
+
+  if not done or not nodes:
+    return None
+  return FBViewSnapshot(nodes[0], nodes)